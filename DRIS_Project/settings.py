@@ -14,6 +14,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,6 +47,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'disaster_response_information_system.middleware.QueryMetricsMiddleware',
+    'disaster_response_information_system.routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -78,13 +82,86 @@ WSGI_APPLICATION = 'DRIS_Project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Pragmas run on every new SQLite connection. WAL lets readers carry on
+# while a report or status change is being written, and NORMAL sync is safe
+# with WAL (only a power loss can drop the last commits).
+DRIS_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # KiB, per connection
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in DRIS_SQLITE_PRAGMAS.items()),
+            # Seconds a write waits for the lock before "database is locked"
+            'timeout': 20,
+            # Take the write lock when a transaction starts rather than at its
+            # first write, so waiting writers queue on the busy timeout instead
+            # of failing at once when a read transaction tries to upgrade
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # Read replica: a file copy of the primary kept current by
+    # `manage.py sync_replica`; list it in DRIS_DB_REPLICAS to route reads to it
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db-replica.sqlite3',
+        'OPTIONS': {
+            'init_command': ';'.join(
+                ['PRAGMA query_only=ON'] + [f'PRAGMA {name}={value}' for name, value in DRIS_SQLITE_PRAGMAS.items()
+                                            if name != 'journal_mode']
+            ),
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['disaster_response_information_system.routers.PrimaryReplicaRouter']
+# e.g. ['replica']; reads of GET requests go to one of these. Needs a shared
+# cache (DRIS_SHARED_CACHE below): replica syncs run in their own process
+DRIS_DB_REPLICAS = []
+# A browser that wrote reads from the primary for this long; keep it above
+# the replica sync interval
+DRIS_REPLICA_STICKY_SECONDS = 30
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per-process; point this at a shared backend (e.g. Redis or
+# Memcached) in production so every worker sees the same invalidations.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dris-default',
     }
 }
 
+# With a cache shared by every worker (Redis, Memcached, ...), sessions are
+# read from the cache and written through to the database, and the
+# authentication backend caches request.user the same way, so authenticated
+# pages run no auth queries. A per-process cache would keep serving a
+# session or user to the other workers after a logout, deactivation or
+# password change, so then both stay in the database.
+DRIS_SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+if DRIS_SHARED_CACHE:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    AUTHENTICATION_BACKENDS = ['disaster_response_information_system.backends.CachedModelBackend']
+# A replica sync only reaches the workers' page caches and validators
+# through a shared cache
+if DRIS_DB_REPLICAS and not DRIS_SHARED_CACHE:
+    raise ImproperlyConfigured('DRIS_DB_REPLICAS requires a shared cache; see DRIS_SHARED_CACHE.')
+DRIS_USER_CACHE_TIMEOUT = 300  # seconds
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -125,6 +202,60 @@ STATICFILES_DIRS = [
     BASE_DIR / "disaster_response_information_system" / "static",
 ]
 
+# Performance instrumentation
+# Maximum SQL queries per request, keyed by URL name. Budgets include the
+# session and user queries of authenticated requests, which a shared cache
+# (DRIS_SHARED_CACHE) mostly saves.
+
+DRIS_QUERY_BUDGETS = {
+    'home': 5,
+    'disaster_reports': 6,
+    'disaster_report_detail': 5,
+    'shelters': 6,
+    'my_aid_requests': 5,
+    'my_assignments': 5,
+    'admin_dashboard': 14,
+    'api_aid_request_detail': 5,
+    'api_available_volunteers': 8,
+    'api_triage_queue': 4,
+    'api_volunteer_profile': 7,
+    'api_user_profile': 5,
+}
+DRIS_QUERY_BUDGET_DEFAULT = None  # no limit for views without a budget
+DRIS_QUERY_BUDGET_ACTION = 'log'  # 'log' or 'raise'; the test runner switches to 'raise'
+DRIS_PERF_TRACE_MEMORY = False  # tracemalloc peak per request; development only
+DRIS_PERF_SERVER_TIMING = DEBUG  # add a Server-Timing response header
+
+# Near-duplicate disaster reports of the same type within this distance and
+# time of each other are grouped into one incident
+DRIS_DUPLICATE_RADIUS_KM = 0.5
+DRIS_DUPLICATE_WINDOW_HOURS = 6
+
+# Run write views in one short transaction each, retried this many times
+# if the database is still locked after the busy timeout, backing off from
+# DRIS_DB_LOCK_RETRY_DELAY seconds, doubled each time
+DRIS_DB_WRITE_TRANSACTIONS = True
+DRIS_DB_LOCK_RETRIES = 3
+DRIS_DB_LOCK_RETRY_DELAY = 0.05
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        # INFO logs the query count and latency of every request; WARNING
+        # only the requests over their budget
+        'dris.performance': {
+            'handlers': ['console'],
+            'level': 'INFO' if DEBUG else 'WARNING',
+        },
+    },
+}
+
 # Authentication settings
 LOGIN_REDIRECT_URL = '/'  # Redirect to home page after login
 LOGIN_URL = 'login'  # URL name of the login page
@@ -132,6 +263,8 @@ LOGIN_URL = 'login'  # URL name of the login page
 # Custom user model
 AUTH_USER_MODEL = 'disaster_response_information_system.User'
 
+TEST_RUNNER = 'disaster_response_information_system.test_runner.QueryBudgetTestRunner'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -1,7 +1,23 @@
 # Liew Qian Hui 22063182
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.db.models import Q
 from .models import User, DisasterReport, AidRequest, Shelter, Skill, VolunteerProfile, VolunteerAssignment
+from .search import get_search_backend
+
+
+class FullTextSearchMixin:
+    """Search indexed text fields through the full-text backend, other search_fields with icontains"""
+    full_text_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        condition = get_search_backend().match(queryset.model, search_term, fields=list(self.full_text_fields))
+        for field in self.get_search_fields(request):
+            if field not in self.full_text_fields:
+                condition |= Q(**{f'{field}__icontains': search_term})
+        return queryset.filter(condition), False
 
 class CustomUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name', 'user_role', 'is_staff')
@@ -19,29 +35,32 @@ admin.site.register(User, CustomUserAdmin)
 
 # Disaster Report admin
 @admin.register(DisasterReport)
-class DisasterReportAdmin(admin.ModelAdmin):
+class DisasterReportAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('disaster_type', 'location', 'severity', 'reporter', 'reported_at', 'is_active')
     list_filter = ('disaster_type', 'severity', 'is_active', 'reported_at')
     search_fields = ('location', 'description', 'reporter__username')
+    full_text_fields = ('location', 'description')
     date_hierarchy = 'reported_at'
     ordering = ('-reported_at',)
 
 # Aid Request admin
 @admin.register(AidRequest)
-class AidRequestAdmin(admin.ModelAdmin):
+class AidRequestAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('aid_type', 'requester', 'location', 'status', 'requested_at')
     list_filter = ('aid_type', 'status', 'requested_at')
     search_fields = ('location', 'description', 'requester__username')
+    full_text_fields = ('location', 'description')
     date_hierarchy = 'requested_at'
     raw_id_fields = ('requester', 'shelter', 'approved_by')
     ordering = ('-requested_at',)
 
 # Shelter admin
 @admin.register(Shelter)
-class ShelterAdmin(admin.ModelAdmin):
+class ShelterAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('name', 'address', 'capacity', 'current_occupancy', 'is_active')
     list_filter = ('is_active',)
     search_fields = ('name', 'address', 'contact_info')
+    full_text_fields = ('name', 'address')
     ordering = ('name',)
 
 # Skill admin
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DisasterResponseInformationSystemConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'disaster_response_information_system'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,47 @@
+# Liew Qian Hui 22063182
+"""
+Authentication backend that loads ``request.user`` from the cache.
+
+Together with cache-backed sessions this makes an authenticated page view
+cost no auth queries. The cached user is dropped whenever the User row is
+saved or deleted (status toggles, password and role changes; see
+signals.py), which only reaches every worker through a shared cache, so
+settings enable the backend only with one (DRIS_SHARED_CACHE).
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import User
+
+USER_CACHE_KEY = 'dris:user:{}'
+
+
+def forget_cached_user(user_id):
+    cache.delete(USER_CACHE_KEY.format(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = USER_CACHE_KEY.format(user_id)
+        user = cache.get(key)
+        if user is None:
+            # From the primary, so a lagging replica's copy is never cached
+            try:
+                user = User._default_manager.db_manager(DEFAULT_DB_ALIAS).get(pk=user_id)
+            except User.DoesNotExist:
+                return None
+            cache.set(key, user, getattr(settings, 'DRIS_USER_CACHE_TIMEOUT', 300))
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        key = USER_CACHE_KEY.format(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            try:
+                user = await User._default_manager.db_manager(DEFAULT_DB_ALIAS).aget(pk=user_id)
+            except User.DoesNotExist:
+                return None
+            await cache.aset(key, user, getattr(settings, 'DRIS_USER_CACHE_TIMEOUT', 300))
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,99 @@
+# Liew Qian Hui 22063182
+"""
+Conditional GET (ETag / Last-Modified) for listing pages and the JSON API.
+
+Validators come from the data-version counters in page_cache, which every
+write bumps, combined with the query string and, for HTML pages, the viewer.
+Checking them is a cache lookup, so an unchanged resource is answered with
+304 Not Modified before the view runs its queries or renders a template.
+Last-Modified is the newest ``updated_at`` of the listed table (looked up
+once per data version) or the last recorded write, which also covers
+deletions.
+"""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .page_cache import data_versions, data_version, data_changed_at
+
+LAST_MODIFIED_TIMEOUT = 600
+
+
+def table_last_modified(model, data_name):
+    """Newest ``updated_at`` of ``model`` or the last recorded write, whichever is later"""
+    key = f'dris:last_modified:{data_name}:{data_version(data_name)}'
+    latest = cache.get(key)
+    if latest is None:
+        latest = model.objects.aggregate(latest=Max('updated_at'))['latest']
+        latest = latest.timestamp() if latest else 0
+        cache.set(key, latest, LAST_MODIFIED_TIMEOUT)
+    return datetime.fromtimestamp(max(latest, data_changed_at(data_name)), tz=dt_timezone.utc)
+
+
+def _has_pending_messages(request):
+    storage = getattr(request, '_messages', None)
+    return storage is not None and len(storage) > 0
+
+
+def conditional_view(*data_names, model=None, per_user=False, time_dependent=None):
+    """
+    Answer conditional GETs for a view whose output depends only on
+    ``data_names``, the URL and query string, and (with ``per_user``) the
+    viewer, as HTML pages show the user's name and flash messages.
+
+    ``model`` adds Last-Modified from its ``updated_at`` column.
+    ``time_dependent(request)`` marks requests whose results also move with
+    the clock (e.g. "last 7 days"); their ETag changes every minute and no
+    Last-Modified is sent. Responses are marked private and must be
+    revalidated, so clients always ask and usually get a 304.
+    """
+    def decorator(view_func):
+        def skip(request):
+            return per_user and _has_pending_messages(request)
+
+        def etag_func(request, *args, **kwargs):
+            if skip(request):
+                return None
+            versions = data_versions(data_names)
+            parts = [
+                view_func.__name__,
+                repr(sorted(versions.items())),
+                repr(args), repr(sorted(kwargs.items())),
+                repr(sorted(request.GET.lists())),
+            ]
+            if per_user:
+                parts.append(f'{request.user.pk}:{getattr(request.user, "user_role", "")}')
+            if time_dependent and time_dependent(request):
+                parts.append(timezone.now().strftime('%Y%m%d%H%M'))
+            return 'W/"%s"' % hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+        def last_modified_func(request, *args, **kwargs):
+            if skip(request) or (time_dependent and time_dependent(request)):
+                return None
+            return table_last_modified(model, data_names[0])
+
+        conditional = condition(
+            etag_func=etag_func, last_modified_func=last_modified_func if model else None
+        )(view_func)
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def wrapper(request, *args, **kwargs):
+                response = await conditional(request, *args, **kwargs)
+                patch_cache_control(response, private=True, no_cache=True)
+                return response
+        else:
+            @wraps(view_func)
+            def wrapper(request, *args, **kwargs):
+                response = conditional(request, *args, **kwargs)
+                patch_cache_control(response, private=True, no_cache=True)
+                return response
+        return wrapper
+    return decorator
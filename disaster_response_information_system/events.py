@@ -0,0 +1,168 @@
+# Liew Qian Hui 22063182
+"""
+In-process publish/subscribe for live disaster report alerts.
+
+Views publish report activations, deactivations and new high-severity
+reports once their transaction commits; each server-sent events connection
+holds a Subscription (a small asyncio queue plus its filter) on the event
+loop, so an idle subscriber costs no thread and only a few kilobytes.
+Publishing is thread-safe and never blocks: events are handed to each
+subscriber's loop with ``call_soon_threadsafe``.
+
+The broker only reaches subscribers in the same process. Run a single ASGI
+worker process for the feed, or replace the broker with a shared channel
+(e.g. Redis pub/sub) when scaling out.
+"""
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+from django.db import transaction
+from django.urls import reverse
+
+from .spatial import split_bbox
+
+HIGH_SEVERITY = 3  # new reports at or above this level are announced to authorities
+SUBSCRIBER_QUEUE_SIZE = 100  # a subscriber this far behind is disconnected to resync
+EVENT_HISTORY_SIZE = 500  # recent events replayed to reconnecting clients (Last-Event-ID)
+
+REPORT_ACTIVATED = 'activated'
+REPORT_DEACTIVATED = 'deactivated'
+REPORT_SUBMITTED = 'submitted'
+
+
+class ReportEventFilter:
+    """Which report events a subscriber wants"""
+
+    def __init__(self, disaster_types=None, min_severity=None, bbox=None, include_unverified=False):
+        self.disaster_types = set(disaster_types or ())
+        self.min_severity = min_severity
+        self.bbox = bbox  # (min_lat, min_lon, max_lat, max_lon), over the antimeridian if min_lon > max_lon
+        self.boxes = split_bbox(*bbox) if bbox is not None else None
+        self.include_unverified = include_unverified
+
+    def matches(self, event):
+        data = event['data']
+        if not event['public'] and not self.include_unverified:
+            return False
+        if self.disaster_types and data['disaster_type'] not in self.disaster_types:
+            return False
+        if self.min_severity is not None and data['severity'] < self.min_severity:
+            return False
+        if self.boxes is not None and not any(
+            min_lat <= data['latitude'] <= max_lat and min_lon <= data['longitude'] <= max_lon
+            for min_lat, min_lon, max_lat, max_lon in self.boxes
+        ):
+            return False
+        return True
+
+
+class Subscription:
+    """One connected client: a bounded queue owned by its event loop"""
+
+    def __init__(self, event_filter, loop):
+        self.filter = event_filter
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def deliver(self, event):
+        """Schedule ``event`` on the subscriber's loop; False once that loop is gone"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            return False
+        return True
+
+
+class ReportEventBroker:
+    def __init__(self, history_size=EVENT_HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        # Millisecond-based ids keep Last-Event-ID values increasing across restarts
+        self._ids = itertools.count(int(time.time() * 1000))
+
+    def subscribe(self, event_filter, last_event_id=None):
+        """
+        Register a subscriber on the running loop and return
+        ``(subscription, missed events)``, the latter being the retained
+        events after ``last_event_id`` that match the filter.
+        """
+        subscription = Subscription(event_filter, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscription)
+            missed = []
+            if last_event_id is not None:
+                missed = [
+                    event for event in self._history
+                    if event['id'] > last_event_id and event_filter.matches(event)
+                ]
+        return subscription, missed
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, event_type, data, public=True):
+        with self._lock:
+            event = {'id': next(self._ids), 'type': event_type, 'data': data, 'public': public}
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+
+        closed = [
+            subscription for subscription in subscribers
+            if subscription.filter.matches(event) and not subscription.deliver(event)
+        ]
+        if closed:
+            with self._lock:
+                self._subscribers.difference_update(closed)
+        return event
+
+
+report_events = ReportEventBroker()
+
+
+def report_event_data(report):
+    return {
+        'report_id': report.pk,
+        'disaster_type': report.disaster_type,
+        'disaster_type_display': report.get_disaster_type_display(),
+        'severity': report.severity,
+        'severity_display': report.get_severity_display(),
+        'location': report.location,
+        'latitude': float(report.latitude),
+        'longitude': float(report.longitude),
+        'reported_at': report.reported_at.isoformat(),
+        'is_active': report.is_active,
+        'url': reverse('disaster_report_detail', args=[report.pk]),
+    }
+
+
+def publish_report_event(report, event_type):
+    """
+    Publish a report event after the current transaction commits.
+
+    Only activations and deactivations are public; a newly submitted report
+    is still awaiting verification, so it only reaches authority subscribers.
+    """
+    data = report_event_data(report)
+    public = event_type != REPORT_SUBMITTED
+    transaction.on_commit(lambda: report_events.publish(event_type, data, public=public))
+
+
+def format_sse(event):
+    """Serialize an event as a server-sent events message"""
+    return f'id: {event["id"]}\nevent: {event["type"]}\ndata: {json.dumps(event["data"], separators=(",", ":"))}\n\n'
@@ -0,0 +1,136 @@
+# Liew Qian Hui 22063182
+"""
+Streaming CSV/NDJSON export of disaster reports, aid requests and volunteer
+assignments.
+
+Rows are read with ``QuerySet.iterator()`` so only one chunk of model
+instances is alive at a time, and serialized output is yielded in ~64 KB
+pieces suitable for StreamingHttpResponse or a file. Report and aid request
+exports accept the same filter parameters as the listing pages, and their
+columns match the importer's, so an export can be re-imported.
+"""
+import csv
+import io
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .forms import DisasterReportFilterForm
+from .filters import REPORT_SORT_ORDERINGS, filter_disaster_reports, filter_dashboard_reports, filter_dashboard_aid_requests
+from .models import DisasterReport, AidRequest, VolunteerAssignment
+
+EXPORT_CHUNK_SIZE = 2000  # rows fetched from the database per round trip
+STREAM_BUFFER_SIZE = 64 * 1024  # bytes of output buffered before yielding
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _getter(path):
+    """Attribute getter for a dotted path that stops at a missing relation"""
+    names = path.split('.')
+
+    def get(obj):
+        for name in names:
+            obj = getattr(obj, name)
+            if obj is None:
+                return None
+        return obj
+    return get
+
+
+def export_disaster_reports(params):
+    reports = DisasterReport.objects.select_related('reporter')
+    filter_form = DisasterReportFilterForm(params or None)
+    sort_by = 'date_desc'
+    if filter_form.is_valid():
+        reports = filter_disaster_reports(reports, filter_form)
+        sort_by = filter_form.cleaned_data['sort_by'] or sort_by
+    return filter_dashboard_reports(reports, params).order_by(*REPORT_SORT_ORDERINGS[sort_by])
+
+
+def export_aid_requests(params):
+    aid_requests = AidRequest.objects.select_related('requester', 'approved_by')
+    return filter_dashboard_aid_requests(aid_requests, params).order_by('-requested_at', '-id')
+
+
+def export_assignments(params):
+    assignments = VolunteerAssignment.objects.select_related('volunteer', 'aid_request', 'assigned_by')
+    if params.get('assignment_status'):
+        assignments = assignments.filter(status=params['assignment_status'])
+    if params.get('aid_filter_type'):
+        assignments = assignments.filter(aid_request__aid_type=params['aid_filter_type'])
+    return assignments.order_by('id')
+
+
+# export kind -> (queryset builder taking filter params, [(column, attribute path)])
+EXPORT_SPECS = {
+    'disaster_reports': (export_disaster_reports, [
+        ('id', 'id'), ('disaster_type', 'disaster_type'), ('severity', 'severity'), ('location', 'location'),
+        ('latitude', 'latitude'), ('longitude', 'longitude'), ('description', 'description'),
+        ('reported_at', 'reported_at'), ('is_active', 'is_active'), ('people_affected', 'people_affected'),
+        ('area_affected', 'area_affected'), ('infrastructure_damage', 'infrastructure_damage'),
+        ('reporter', 'reporter.username'),
+    ]),
+    'aid_requests': (export_aid_requests, [
+        ('id', 'id'), ('aid_type', 'aid_type'), ('status', 'status'), ('location', 'location'),
+        ('latitude', 'latitude'), ('longitude', 'longitude'), ('num_people', 'num_people'),
+        ('description', 'description'), ('requested_at', 'requested_at'), ('shelter_id', 'shelter_id'),
+        ('requester', 'requester.username'), ('approved_by', 'approved_by.username'),
+    ]),
+    'assignments': (export_assignments, [
+        ('id', 'id'), ('status', 'status'), ('aid_request_id', 'aid_request_id'),
+        ('aid_type', 'aid_request.aid_type'), ('aid_location', 'aid_request.location'),
+        ('volunteer', 'volunteer.username'), ('assigned_by', 'assigned_by.username'),
+        ('assigned_at', 'assigned_at'), ('completed_at', 'completed_at'), ('notes', 'notes'),
+    ]),
+}
+
+
+def _csv_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _csv_chunks(headers, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        if buffer.tell() >= STREAM_BUFFER_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_chunks(headers, rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    lines = []
+    size = 0
+    for row in rows:
+        line = encoder.encode(dict(zip(headers, row)))
+        lines.append(line)
+        size += len(line) + 1
+        if size >= STREAM_BUFFER_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+            size = 0
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def export_records(kind, file_format, params=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Return an iterator of text chunks exporting ``kind`` records filtered by ``params``"""
+    build_queryset, columns = EXPORT_SPECS[kind]
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f'Unsupported format: {file_format}')
+
+    queryset = build_queryset(params or {})
+    headers = [column for column, _ in columns]
+    getters = [_getter(path) for _, path in columns]
+    rows = ([get(obj) for get in getters] for obj in queryset.iterator(chunk_size=chunk_size))
+    if file_format == 'csv':
+        return _csv_chunks(headers, rows)
+    return _ndjson_chunks(headers, rows)
@@ -0,0 +1,78 @@
+# Liew Qian Hui 22063182
+"""
+Listing filters shared by the report/aid request pages and the exports, so
+an export returns exactly the rows the matching listing would show.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .search import text_search
+
+# Keyset orderings for DisasterReportFilterForm.sort_by; each ends with the unique id
+REPORT_SORT_ORDERINGS = {
+    'date_desc': ['-reported_at', '-id'],
+    'date_asc': ['reported_at', 'id'],
+    'severity_desc': ['-severity', '-reported_at', '-id'],
+    'severity_asc': ['severity', 'reported_at', 'id'],
+}
+
+
+def filter_disaster_reports(reports, filter_form):
+    """Apply a valid DisasterReportFilterForm (public listing filters)"""
+    # Filter by disaster type
+    if filter_form.cleaned_data['disaster_type']:
+        reports = reports.filter(disaster_type=filter_form.cleaned_data['disaster_type'])
+
+    # Filter by severity
+    if filter_form.cleaned_data['severity']:
+        reports = reports.filter(severity=filter_form.cleaned_data['severity'])
+
+    # Filter by date range
+    # Range predicates on the raw column (not reported_at__date) so indexes apply
+    date_range = filter_form.cleaned_data['date_range']
+    if date_range == 'today':
+        start_of_today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        reports = reports.filter(reported_at__gte=start_of_today, reported_at__lt=start_of_today + timedelta(days=1))
+    elif date_range == 'week':
+        one_week_ago = timezone.now() - timedelta(days=7)
+        reports = reports.filter(reported_at__gte=one_week_ago)
+    elif date_range == 'month':
+        one_month_ago = timezone.now() - timedelta(days=30)
+        reports = reports.filter(reported_at__gte=one_month_ago)
+
+    # Filter by location (full-text, prefix match on each word)
+    if filter_form.cleaned_data['location']:
+        location_query = filter_form.cleaned_data['location']
+        reports = text_search(reports, location_query, fields=['location'])
+
+    return reports
+
+
+def filter_dashboard_reports(reports, params):
+    """Apply the authority dashboard's disaster report filters"""
+    filter_type = params.get('filter_type', '')
+    filter_severity = params.get('filter_severity', '')
+    filter_status = params.get('filter_status', '')
+
+    if filter_type:
+        reports = reports.filter(disaster_type=filter_type)
+    if filter_severity:
+        reports = reports.filter(severity=filter_severity)
+    if filter_status == 'active':
+        reports = reports.filter(is_active=True)
+    elif filter_status == 'inactive':
+        reports = reports.filter(is_active=False)
+    return reports
+
+
+def filter_dashboard_aid_requests(aid_requests, params):
+    """Apply the authority dashboard's aid request filters"""
+    aid_filter_type = params.get('aid_filter_type', '')
+    aid_filter_status = params.get('aid_filter_status', '')
+
+    if aid_filter_type:
+        aid_requests = aid_requests.filter(aid_type=aid_filter_type)
+    if aid_filter_status:
+        aid_requests = aid_requests.filter(status=aid_filter_status)
+    return aid_requests
@@ -83,9 +83,11 @@ class VolunteerProfileForm(forms.ModelForm):
 
     class Meta:
         model = VolunteerProfile
-        fields = ['availability', 'skills']
+        fields = ['availability', 'skills', 'latitude', 'longitude']
         widgets = {
-            'availability': forms.Select(attrs={'class': 'form-select'})
+            'availability': forms.Select(attrs={'class': 'form-select'}),
+            'latitude': forms.NumberInput(attrs={'class': 'form-control', 'step': 'any', 'placeholder': 'Latitude (e.g., 3.1390)'}),
+            'longitude': forms.NumberInput(attrs={'class': 'form-control', 'step': 'any', 'placeholder': 'Longitude (e.g., 101.6869)'}),
         }
 
 class UserRegistrationForm(forms.ModelForm):
@@ -150,10 +152,17 @@ class ShelterForm(forms.ModelForm):
             'is_active': 'Active Shelter'
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Occupancy of an existing shelter only moves through the check-in/out
+        # API, so a form loaded earlier cannot overwrite the desks' updates
+        if self.instance.pk:
+            del self.fields['current_occupancy']
+
     def clean(self):
         cleaned_data = super().clean()
         capacity = cleaned_data.get('capacity')
-        current_occupancy = cleaned_data.get('current_occupancy')
+        current_occupancy = cleaned_data.get('current_occupancy', self.instance.current_occupancy)
 
         if capacity and current_occupancy and current_occupancy > capacity:
             raise forms.ValidationError("Current occupancy cannot exceed capacity")
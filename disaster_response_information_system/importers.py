@@ -0,0 +1,212 @@
+# Liew Qian Hui 22063182
+"""
+Streaming bulk import of disaster reports and aid requests.
+
+Records are read one at a time from CSV or NDJSON, validated against the
+model field rules, and inserted with bulk_create in fixed-size chunks, each
+in its own transaction together with its map tile totals. Memory use is
+bounded by the chunk size whatever the file length, and invalid rows,
+including lines that are not UTF-8 or not valid CSV/JSON, are reported
+without aborting the import.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .models import User, DisasterReport, AidRequest
+from .stats import invalidate_dashboard_stats
+from .page_cache import REPORT_DATA, AID_REQUEST_DATA, bump_data_version
+from .tiles import apply_tile_changes, instance_contribution
+from .triage import score_aid_requests, rescore_requests_near
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 500  # later errors are only counted
+UNDECODABLE = '\ufffd'  # what bytes that are not UTF-8 are read as
+
+# import kind -> (model, importable fields, field naming the submitting user)
+IMPORT_SPECS = {
+    'disaster_reports': (
+        DisasterReport,
+        ['disaster_type', 'location', 'latitude', 'longitude', 'severity', 'description', 'reported_at',
+         'is_active', 'people_affected', 'area_affected', 'infrastructure_damage'],
+        'reporter',
+    ),
+    'aid_requests': (
+        AidRequest,
+        ['aid_type', 'description', 'location', 'latitude', 'longitude', 'num_people', 'status', 'requested_at'],
+        'requester',
+    ),
+}
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.errors = []  # (line number, message)
+        self.stopped = None  # why the import ended early, if it did
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def iter_records(stream, file_format):
+    """
+    Yield (line number, record) pairs from a text stream of CSV or NDJSON.
+    The record is a dict, or a message saying why the line cannot be read.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        while True:
+            try:
+                record = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield reader.line_num + 1, f'Malformed CSV: {e}.'  # the failing line is not counted
+                continue
+            if any(UNDECODABLE in value for value in record.values() if isinstance(value, str)):
+                yield reader.line_num, 'Text is not valid UTF-8.'
+                continue
+            yield reader.line_num, record
+    elif file_format == 'ndjson':
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if UNDECODABLE in line:
+                yield line_number, 'Text is not valid UTF-8.'
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_number, 'Malformed record.'
+                continue
+            yield line_number, record if isinstance(record, dict) else 'Malformed record.'
+    else:
+        raise ValueError(f'Unsupported format: {file_format}')
+
+
+def guess_format(filename):
+    return 'ndjson' if filename.lower().endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+
+def _format_errors(error):
+    if hasattr(error, 'message_dict'):
+        return '; '.join(f'{field}: {" ".join(messages)}' for field, messages in error.message_dict.items())
+    return ' '.join(error.messages)
+
+
+class RecordImporter:
+    """Validate records for one model and insert them in chunked transactions"""
+
+    def __init__(self, kind, default_user, batch_size=DEFAULT_BATCH_SIZE):
+        self.model, self.fields, self.user_field = IMPORT_SPECS[kind]
+        self.default_user = default_user
+        self.batch_size = batch_size
+        self.result = ImportResult()
+        self._user_ids = {}
+        self._model_fields = {name: self.model._meta.get_field(name) for name in self.fields}
+        self._excluded = [
+            field.name for field in self.model._meta.concrete_fields
+            if field.name not in self.fields
+        ]
+
+    def _user_id(self, username):
+        """Resolve a username column value, caching lookups across rows"""
+        if not username:
+            return self.default_user.pk
+        if username not in self._user_ids:
+            self._user_ids[username] = User.objects.filter(username=username).values_list('pk', flat=True).first()
+        return self._user_ids[username]
+
+    def build(self, record):
+        """Return an unsaved, validated model instance; raises ValidationError"""
+        values = {}
+        errors = {}
+        for name, field in self._model_fields.items():
+            raw = record.get(name)
+            if isinstance(raw, str):
+                raw = raw.strip()
+            elif isinstance(raw, float):
+                raw = repr(raw)  # keep JSON numbers' written precision for DecimalFields
+            if raw in (None, ''):
+                if field.has_default():
+                    continue
+                raw = None
+            try:
+                value = field.to_python(raw)
+            except ValidationError as e:
+                errors[name] = e.messages
+                continue
+            if isinstance(value, datetime) and timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            values[name] = value
+        if errors:
+            raise ValidationError(errors)
+
+        user_id = self._user_id(record.get(self.user_field))
+        if user_id is None:
+            raise ValidationError({self.user_field: [f'Unknown user "{record.get(self.user_field)}".']})
+
+        instance = self.model(**values, **{f'{self.user_field}_id': user_id})
+        instance.clean_fields(exclude=self._excluded)
+        instance.refresh_geohash()
+        return instance
+
+    def _flush(self, batch):
+        with transaction.atomic():
+            if self.model is AidRequest:
+                score_aid_requests([aid_request for aid_request in batch if aid_request.status == 'pending'])
+            self.model.objects.bulk_create(batch, batch_size=self.batch_size)
+            if self.model is DisasterReport:
+                contributions = [instance_contribution(report) for report in batch]
+                apply_tile_changes(added=contributions)
+                rescore_requests_near([
+                    (contribution.latitude, contribution.longitude)
+                    for contribution in contributions if contribution is not None
+                ])
+        self.result.created += len(batch)
+
+    def run(self, records):
+        batch = []
+        try:
+            for line_number, record in records:
+                if not isinstance(record, dict):
+                    self.result.add_error(line_number, record)
+                    continue
+                try:
+                    batch.append(self.build(record))
+                except ValidationError as e:
+                    self.result.add_error(line_number, _format_errors(e))
+                    continue
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+            if batch:
+                self._flush(batch)
+        except DatabaseError as e:
+            # Chunks already flushed stay imported; report how far the import got
+            self.result.stopped = f'{len(batch)} records before line {line_number} were not saved: {e}'
+
+        # bulk_create sends no post_save signals
+        if self.result.created:
+            invalidate_dashboard_stats()
+            bump_data_version(REPORT_DATA if self.model is DisasterReport else AID_REQUEST_DATA)
+        return self.result
+
+
+def import_records(kind, binary_stream, file_format, default_user, batch_size=DEFAULT_BATCH_SIZE):
+    """Import a CSV/NDJSON byte stream of ``kind`` records and return an ImportResult"""
+    stream = io.TextIOWrapper(binary_stream, encoding='utf-8-sig', errors='replace', newline='')
+    try:
+        return RecordImporter(kind, default_user, batch_size).run(iter_records(stream, file_format))
+    finally:
+        stream.detach()
@@ -0,0 +1,85 @@
+# Liew Qian Hui 22063182
+"""
+Near-duplicate detection and incident clusters for disaster reports.
+
+When a report is submitted, earlier reports of the same disaster type
+within DRIS_DUPLICATE_RADIUS_KM and DRIS_DUPLICATE_WINDOW_HOURS are looked
+up through the geohash index, and all of them are linked to one Incident,
+merging incidents that the new report bridges. Authorities can then
+activate or deactivate every report of an incident at once.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Func
+from django.utils import timezone
+
+from .models import DisasterReport, Incident
+from .page_cache import REPORT_DATA, bump_data_version
+from .transitions import set_reports_active
+
+DEFAULT_DUPLICATE_RADIUS_KM = 0.5
+DEFAULT_DUPLICATE_WINDOW_HOURS = 6
+DUPLICATE_MATCH_LIMIT = 50  # nearest matches linked per submission
+
+
+class Unindexed(Func):
+    """
+    An expression's value, hidden from SQLite's planner as ``+column`` so
+    that no index on it is chosen; plain SQL on other databases.
+    """
+    template = '%(expressions)s'
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='+%(expressions)s', **extra_context)
+
+
+def duplicate_window():
+    return timedelta(hours=getattr(settings, 'DRIS_DUPLICATE_WINDOW_HOURS', DEFAULT_DUPLICATE_WINDOW_HOURS))
+
+
+def duplicate_candidates(report, radius_km=None, window=None):
+    """Other reports of the same type near ``report`` in space and time, nearest first"""
+    radius_km = radius_km or getattr(settings, 'DRIS_DUPLICATE_RADIUS_KM', DEFAULT_DUPLICATE_RADIUS_KM)
+    window = window or duplicate_window()
+    # Search (disaster_type, geohash) ranges only: during a surge the time
+    # window holds thousands of same-type reports but few are this close
+    return DisasterReport.objects.alias(reported=Unindexed('reported_at')).filter(
+        reported__gte=report.reported_at - window,
+        reported__lte=report.reported_at + window,
+    ).exclude(pk=report.pk).nearest(
+        report.latitude, report.longitude, radius_km, cell_filters={'disaster_type': report.disaster_type}
+    )
+
+
+def link_duplicates(report):
+    """
+    Put ``report`` and its near-duplicates into one incident and return it,
+    or None when the report matches nothing.
+    """
+    matches = list(duplicate_candidates(report).values_list('pk', 'incident_id')[:DUPLICATE_MATCH_LIMIT])
+    if not matches:
+        return None
+
+    now = timezone.now()
+    incident_ids = sorted({incident_id for _, incident_id in matches if incident_id})
+    with transaction.atomic():
+        if incident_ids:
+            # Keep the oldest incident and fold the others the report bridges into it
+            incident = Incident.objects.get(pk=incident_ids[0])
+            if len(incident_ids) > 1:
+                DisasterReport.objects.filter(incident_id__in=incident_ids[1:]).update(incident=incident, updated_at=now)
+                Incident.objects.filter(pk__in=incident_ids[1:]).delete()
+        else:
+            incident = Incident.objects.create(disaster_type=report.disaster_type)
+        unlinked = [pk for pk, incident_id in matches if incident_id is None]
+        DisasterReport.objects.filter(pk__in=unlinked + [report.pk]).update(incident=incident, updated_at=now)
+        transaction.on_commit(lambda: bump_data_version(REPORT_DATA))
+    report.incident = incident
+    return incident
+
+
+def set_incident_active(incident, is_active):
+    """Activate or deactivate every report of ``incident``; returns how many changed"""
+    return set_reports_active(incident.reports.all(), is_active)
@@ -0,0 +1,72 @@
+# Liew Qian Hui 22063182
+"""
+Handling of SQLite write-lock contention.
+
+SQLite has one writer at a time. The connection settings (WAL, pragmas,
+busy timeout and ``BEGIN IMMEDIATE`` transactions) live in
+``DATABASES['default']['OPTIONS']``; this module covers what is left when
+the busy timeout runs out under a surge. ``retry_on_lock`` retries a
+function with exponential backoff on "database is locked", and
+``write_view`` runs a view's writes in one short transaction retried the
+same way. With ``BEGIN IMMEDIATE`` the lock is taken when the transaction
+starts, before the view has done anything, so retrying it is safe.
+"""
+import logging
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+from .routers import use_primary
+
+logger = logging.getLogger(__name__)
+
+LOCK_ERRORS = ('database is locked', 'database table is locked')
+
+
+def is_lock_error(exc):
+    return isinstance(exc, OperationalError) and any(message in str(exc) for message in LOCK_ERRORS)
+
+
+def retry_on_lock(func, *args, using=None, **kwargs):
+    """
+    Call ``func``, retrying with exponential backoff while the database is
+    locked. Inside an outer transaction the error is raised straight away,
+    since only the outermost transaction can be retried.
+    """
+    retries = getattr(settings, 'DRIS_DB_LOCK_RETRIES', 3)
+    delay = getattr(settings, 'DRIS_DB_LOCK_RETRY_DELAY', 0.05)
+    connection = transaction.get_connection(using)
+    for attempt in range(retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as e:
+            if not is_lock_error(e) or attempt == retries or connection.in_atomic_block:
+                raise
+            backoff = delay * 2 ** attempt * random.uniform(0.5, 1.5)
+            logger.warning('%s: %s; retrying in %.0fms', getattr(func, '__name__', func), e, backoff * 1000)
+            time.sleep(backoff)
+
+
+def write_view(view=None, *, methods=('POST',)):
+    """
+    Run a view in one transaction for the given request methods, retried
+    while the database is locked; ``DRIS_DB_WRITE_TRANSACTIONS = False``
+    turns this off. Keep slow reads (e.g. matching previews) out of such
+    views, as they would hold the write lock. The view reads from the
+    primary either way, never from a replica.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return view(request, *args, **kwargs)
+            use_primary()
+            if not getattr(settings, 'DRIS_DB_WRITE_TRANSACTIONS', True):
+                return view(request, *args, **kwargs)
+            return retry_on_lock(transaction.atomic(view), request, *args, **kwargs)
+        return wrapper
+
+    return decorator(view) if view is not None else decorator
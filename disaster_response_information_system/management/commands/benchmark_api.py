@@ -0,0 +1,126 @@
+# Liew Qian Hui 22063182
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, AsyncClient
+from django.urls import reverse
+
+from disaster_response_information_system.models import User, AidRequest, VolunteerProfile
+
+
+def _summary(latencies, elapsed):
+    latencies = sorted(latencies)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'throughput': len(latencies) / elapsed,
+        'p50': quantiles[49] * 1000,
+        'p95': quantiles[94] * 1000,
+        'p99': quantiles[98] * 1000,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare throughput of the dashboard JSON API under a threaded WSGI handler and the '
+        'ASGI handler at the same client concurrency, using the data in the current database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Authority username to authenticate as')
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per endpoint and mode')
+        parser.add_argument('--concurrency', type=int, default=100, help='Concurrent clients')
+        parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads (as in gunicorn --threads)')
+        parser.add_argument('--mode', choices=['wsgi', 'asgi', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'], user_role='authority')
+        except User.DoesNotExist:
+            raise CommandError(f'Authority user "{options["user"]}" does not exist.')
+
+        aid_request = AidRequest.objects.order_by('pk').first()
+        volunteer = VolunteerProfile.objects.order_by('pk').first()
+        if aid_request is None or volunteer is None:
+            raise CommandError('Benchmark needs at least one aid request and one volunteer profile.')
+
+        endpoints = {
+            'api_aid_request_detail': reverse('api_aid_request_detail', args=[aid_request.pk]),
+            'api_available_volunteers': reverse('api_available_volunteers', args=[aid_request.pk]),
+            'api_volunteer_profile': reverse('api_volunteer_profile', args=[volunteer.pk]),
+            'api_user_profile': reverse('api_user_profile', args=[user.pk]),
+        }
+
+        # One session shared by every simulated client
+        login_client = Client()
+        login_client.force_login(user)
+        self.cookies = login_client.cookies
+
+        modes = ['wsgi', 'asgi'] if options['mode'] == 'both' else [options['mode']]
+        self.stdout.write(
+            f'{options["requests"]} requests per endpoint, {options["concurrency"]} concurrent clients, '
+            f'{options["threads"]} WSGI threads'
+        )
+        self.stdout.write(f'{"endpoint":<28}{"mode":<6}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}')
+        for name, url in endpoints.items():
+            for mode in modes:
+                if mode == 'wsgi':
+                    result = self.run_wsgi(url, options['requests'], options['concurrency'], options['threads'])
+                else:
+                    result = asyncio.run(self.run_asgi(url, options['requests'], options['concurrency']))
+                self.stdout.write(
+                    f'{name:<28}{mode:<6}{result["throughput"]:>10.1f}{result["p50"]:>10.2f}'
+                    f'{result["p95"]:>10.2f}{result["p99"]:>10.2f}'
+                )
+
+    def run_wsgi(self, url, total, concurrency, threads):
+        """Clients queue for a fixed pool of worker threads, like a threaded WSGI server"""
+        remaining = iter(range(total))
+        lock = threading.Lock()
+        latencies = []
+
+        def client_loop(server):
+            client = Client()
+            client.cookies = self.cookies
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                start = time.perf_counter()
+                response = server.submit(client.get, url).result()
+                latency = time.perf_counter() - start
+                if response.status_code != 200:
+                    raise CommandError(f'{url} returned {response.status_code}')
+                with lock:
+                    latencies.append(latency)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as server, ThreadPoolExecutor(max_workers=concurrency) as clients:
+            for future in [clients.submit(client_loop, server) for _ in range(concurrency)]:
+                future.result()
+        return _summary(latencies, time.perf_counter() - start)
+
+    async def run_asgi(self, url, total, concurrency):
+        """Clients are coroutines on one event loop served by the ASGI handler"""
+        remaining = iter(range(total))
+        latencies = []
+
+        async def client_loop():
+            client = AsyncClient()
+            client.cookies = self.cookies
+            while next(remaining, None) is not None:
+                start = time.perf_counter()
+                # As ASGIHandler does, give each request its own thread for sync work
+                async with ThreadSensitiveContext():
+                    response = await client.get(url)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise CommandError(f'{url} returned {response.status_code}')
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        return _summary(latencies, time.perf_counter() - start)
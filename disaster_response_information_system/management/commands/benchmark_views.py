@@ -0,0 +1,238 @@
+# Liew Qian Hui 22063182
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone as dt_timezone
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from disaster_response_information_system import urls as app_urls
+from disaster_response_information_system.models import (
+    User, DisasterReport, Incident, AidRequest, Shelter, VolunteerProfile, VolunteerAssignment,
+)
+
+ROLES = ['anonymous', 'citizen', 'volunteer', 'authority']
+
+# URL name -> why it is not timed
+SKIPPED_URLS = {
+    'logout': 'ends the session',
+    'report_event_stream': 'streams until the client disconnects',
+    **{name: 'changes data' for name in [
+        'update_disaster_status', 'update_incident_status', 'toggle_disaster_report_status',
+        'update_aid_request_status', 'update_assignment_status', 'toggle_shelter_status', 'toggle_user_status',
+        'bulk_update_disaster_reports', 'bulk_update_aid_requests', 'assign_volunteer_to_request',
+        'api_shelter_check_in', 'api_shelter_check_out', 'api_shelter_occupancy_batch',
+    ]},
+}
+
+# URL name -> query string it is timed with
+SAMPLE_QUERIES = {
+    'disaster_reports': {'disaster_type': 'flood', 'sort_by': 'severity_desc'},
+    'shelters': {'availability': 'available'},
+    'admin_dashboard': {'aid_filter_status': 'pending'},
+    'api_search': {'q': 'flood road'},
+    'api_report_tiles': {'zoom': '7', 'bbox': '1,99,7,105'},
+    'api_triage_queue': {'limit': '20'},
+}
+
+
+def _percentile(latencies, percent):
+    if len(latencies) == 1:
+        return latencies[0]
+    return statistics.quantiles(latencies, n=100, method='inclusive')[percent - 1]
+
+
+def _request_host():
+    """A host name the site accepts; with DEBUG and no ALLOWED_HOSTS, localhost is"""
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'localhost'
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Time every page and API endpoint of the app for each role against the current database, '
+        'recording status, query count and p50/p95 latency, and write the results as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per URL and role')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per URL and role first')
+        parser.add_argument('--roles', nargs='+', choices=ROLES, default=ROLES)
+        parser.add_argument('--only', nargs='+', metavar='URL_NAME', help='Time only these URL names')
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request')
+        parser.add_argument('--output', help='JSON results file (default benchmark-views-<timestamp>.json)')
+        parser.add_argument('--baseline', help='Earlier JSON results to compare against')
+
+    def handle(self, *args, **options):
+        samples = self.sample_objects()
+        users = self.role_users(samples)
+        started_at = datetime.now(dt_timezone.utc)
+        baseline = self.load_baseline(options['baseline'])
+
+        targets, skipped = [], []
+        for pattern in app_urls.urlpatterns:
+            name = pattern.name
+            if options['only'] and name not in options['only']:
+                continue
+            if name in SKIPPED_URLS:
+                skipped.append({'url_name': name, 'reason': SKIPPED_URLS[name]})
+                continue
+            kwargs = {
+                key: samples[key] for key in pattern.pattern.converters if key not in pattern.default_args
+            }
+            if name == 'api_volunteer_profile':
+                kwargs['volunteer_id'] = samples['volunteer_profile_id']
+            url = reverse(name, kwargs=kwargs)
+            targets.append((name, url, SAMPLE_QUERIES.get(name, {})))
+
+        self.stdout.write(
+            f'{len(targets)} URLs x {len(options["roles"])} roles, {options["repeat"]} timed requests each'
+            f'{" (cold cache)" if options["cold"] else ""}'
+        )
+        self.stdout.write(f'{"url":<30}{"role":<11}{"status":>7}{"queries":>9}{"p50 ms":>10}{"p95 ms":>10}{"vs base":>9}')
+        results = []
+        # Server errors are reported in the status column rather than a traceback per request
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        for name, url, query in targets:
+            for role in options['roles']:
+                result = self.time_url(url, query, users[role], options)
+                result.update({'url_name': name, 'role': role})
+                results.append(result)
+                previous = baseline.get((name, role))
+                change = f'{(result["p50_ms"] / previous["p50_ms"] - 1) * 100:+.0f}%' if previous and previous['p50_ms'] else ''
+                self.stdout.write(
+                    f'{name:<30}{role:<11}{result["status"]:>7}{result["queries"]:>9}'
+                    f'{result["p50_ms"]:>10.2f}{result["p95_ms"]:>10.2f}{change:>9}'
+                )
+
+        output = options['output'] or f'benchmark-views-{started_at:%Y%m%d-%H%M%S}.json'
+        with open(output, 'w') as f:
+            json.dump({
+                'meta': {
+                    'started_at': started_at.isoformat(),
+                    'git_revision': _git_revision(),
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'database': connection.vendor,
+                    'debug': settings.DEBUG,
+                    'repeat': options['repeat'],
+                    'warmup': options['warmup'],
+                    'cold_cache': options['cold'],
+                    'rows': {model.__name__: model.objects.count() for model in (
+                        User, DisasterReport, Incident, AidRequest, Shelter, VolunteerProfile, VolunteerAssignment,
+                    )},
+                },
+                'results': results,
+                'skipped': skipped,
+            }, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(results)} results to {output}'))
+
+    def sample_objects(self):
+        """Representative rows for the URL arguments: busy ones, so pages show real data"""
+        report = (DisasterReport.objects.filter(is_active=True).exclude(incident=None).order_by('pk').first()
+                  or DisasterReport.objects.order_by('pk').first())
+        aid_request = AidRequest.objects.filter(status='pending').order_by('pk').first()
+        assignment = VolunteerAssignment.objects.order_by('pk').first()
+        shelter = Shelter.objects.filter(is_active=True).order_by('pk').first()
+        if None in (report, aid_request, assignment, shelter):
+            raise CommandError(
+                'Benchmark needs disaster reports, a pending aid request, a volunteer assignment and a shelter; '
+                'run generate_dataset first.'
+            )
+        volunteer_profile = VolunteerProfile.objects.get(user_id=assignment.volunteer_id)
+        return {
+            'report_id': report.pk,
+            'incident_id': report.incident_id or 0,
+            'request_id': aid_request.pk,
+            'shelter_id': shelter.pk,
+            'assignment_id': assignment.pk,
+            'volunteer_id': assignment.volunteer_id,
+            'volunteer_profile_id': volunteer_profile.pk,
+            'user_id': aid_request.requester_id,
+            'kind': 'disaster_reports',
+            'file_format': 'csv',
+            'aid_request': aid_request,
+            'assignment': assignment,
+        }
+
+    def role_users(self, samples):
+        """A user per role, chosen so their own pages have data"""
+        authority = User.objects.filter(user_role='authority', is_active=True).order_by('pk').first()
+        if authority is None:
+            raise CommandError('Benchmark needs an authority user.')
+        return {
+            'anonymous': None,
+            'citizen': samples['aid_request'].requester,
+            'volunteer': samples['assignment'].volunteer,
+            'authority': authority,
+        }
+
+    def load_baseline(self, path):
+        if not path:
+            return {}
+        try:
+            with open(path) as f:
+                return {(result['url_name'], result['role']): result for result in json.load(f)['results']}
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Cannot read baseline {path}: {e}')
+
+    def time_url(self, url, query, user, options):
+        client = Client(raise_request_exception=False, HTTP_HOST=_request_host())
+
+        def log_in():
+            if user is not None:
+                client.force_login(user)
+
+        def fetch():
+            # Flash messages from redirects would otherwise pile up in the cookie
+            client.cookies.pop('messages', None)
+            response = client.get(url, query)
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            return response, body
+
+        log_in()
+        for _ in range(options['warmup']):
+            fetch()
+
+        latencies, query_counts = [], []
+        for _ in range(options['repeat']):
+            if options['cold']:
+                cache.clear()
+                log_in()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response, body = fetch()
+                latencies.append(time.perf_counter() - start)
+            query_counts.append(len(queries))
+
+        return {
+            'path': url,
+            'query': query,
+            'status': response.status_code,
+            'bytes': len(body),
+            'queries': max(query_counts),
+            'p50_ms': round(_percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(_percentile(latencies, 95) * 1000, 3),
+            'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        }
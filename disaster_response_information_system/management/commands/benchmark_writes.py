@@ -0,0 +1,161 @@
+# Liew Qian Hui 22063182
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from disaster_response_information_system.models import User, DisasterReport, AidRequest
+from disaster_response_information_system.surge import ClientSession
+from disaster_response_information_system.synthetic import generate_dataset
+from disaster_response_information_system.management.commands.benchmark_views import _request_host, _percentile
+
+# Connection options and settings of each mode: 'baseline' is Django's SQLite
+# default with every statement committed on its own, 'tuned' the project's
+MODES = {
+    'baseline': {'options': {}, 'settings': {'DRIS_DB_WRITE_TRANSACTIONS': False, 'DRIS_DB_LOCK_RETRIES': 0}},
+    'tuned': {'options': None, 'settings': {}},
+}
+SETUP_SIZES = {'citizens': 200, 'volunteers': 20, 'authorities': 5, 'shelters': 20, 'reports': 2000, 'aid_requests': 1000}
+# (action, weight) of the write mix
+WRITE_MIX = [('report_create', 4), ('aid_request_create', 3), ('verify_report', 2), ('approve_aid_request', 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure concurrent write throughput through the report, aid request and status views on a fresh '
+        'SQLite database, with Django\'s default connection settings and with the tuned ones'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent writers')
+        parser.add_argument('--writes', type=int, default=1000, help='Write requests per mode')
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Also write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        original = connections.settings[DEFAULT_DB_ALIAS]
+        # Failed requests are counted per mode rather than logged with a traceback each
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        logging.getLogger('disaster_response_information_system.locking').setLevel(logging.ERROR)
+        results = {}
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                for mode in options['modes']:
+                    self.use_database(original, os.path.join(directory, f'{mode}.sqlite3'), MODES[mode]['options'])
+                    call_command('migrate', verbosity=0)
+                    generate_dataset(seed=options['seed'], prefix='bench', **SETUP_SIZES)
+                    with override_settings(**MODES[mode]['settings']):
+                        results[mode] = self.run_writes(options)
+                    self.report(mode, results[mode])
+                    connections.close_all()
+        finally:
+            self.use_database(original)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'threads': options['threads'], 'writes': options['writes'], 'results': results}, f, indent=2)
+        if 'baseline' in results and 'tuned' in results:
+            speedup = results['tuned']['throughput'] / results['baseline']['throughput']
+            self.stdout.write(self.style.SUCCESS(f'Tuned settings: {speedup:.1f}x the successful write throughput'))
+
+    def use_database(self, original, name=None, options=None):
+        """Point the default connection of every thread at another database file and options"""
+        connections[DEFAULT_DB_ALIAS].close()
+        del connections[DEFAULT_DB_ALIAS]
+        if name is None:
+            connections.settings[DEFAULT_DB_ALIAS] = original
+            return
+        database = deepcopy(original)
+        database['NAME'] = name
+        if options is not None:
+            database['OPTIONS'] = options
+        connections.settings[DEFAULT_DB_ALIAS] = database
+
+    def run_writes(self, options):
+        host = _request_host()
+        citizens = list(User.objects.filter(user_role='citizen'))
+        authorities = list(User.objects.filter(user_role='authority'))
+        report_ids = list(DisasterReport.objects.values_list('pk', flat=True))
+        aid_request_ids = list(AidRequest.objects.filter(status='pending').values_list('pk', flat=True))
+        rng = random.Random(options['seed'])
+        actions = rng.choices([action for action, _ in WRITE_MIX], [weight for _, weight in WRITE_MIX],
+                              k=options['writes'])
+        # Each writer logs in as a citizen and an authority before the clock starts
+        writers = []
+        for number in range(options['threads']):
+            citizen, authority = ClientSession(host), ClientSession(host)
+            citizen.client.force_login(citizens[number % len(citizens)])
+            authority.client.force_login(authorities[number % len(authorities)])
+            writers.append((citizen, authority))
+        connections.close_all()
+
+        def write(number, citizen, authority):
+            action = actions[number]
+            writer_rng = random.Random(number)
+            location = {
+                'location': f'Benchmark site {number}', 'latitude': round(writer_rng.uniform(1.5, 6.5), 6),
+                'longitude': round(writer_rng.uniform(100.5, 104), 6),
+            }
+            if action == 'report_create':
+                session, request = citizen, ('POST', reverse('disaster_report_create'), {
+                    'disaster_type': 'flood', 'severity': writer_rng.randint(1, 4),
+                    'description': 'Water rising quickly', **location,
+                })
+            elif action == 'aid_request_create':
+                session, request = citizen, ('POST', reverse('aid_request_create'), {
+                    'aid_type': 'food', 'description': 'Family needs food', 'num_people': 3, **location,
+                })
+            elif action == 'verify_report':
+                session, request = authority, ('POST', reverse(
+                    'update_disaster_status', args=[writer_rng.choice(report_ids)],
+                ), {'action': writer_rng.choice(['activate', 'deactivate'])})
+            else:
+                session, request = authority, ('GET', reverse(
+                    'update_aid_request_status', args=[writer_rng.choice(aid_request_ids), 'approved'],
+                ), None)
+            started = time.perf_counter()
+            status, _, _, error = session.request(*request)
+            return status, time.perf_counter() - started, error
+
+        def run_writer(number):
+            citizen, authority = writers[number]
+            return [write(index, citizen, authority) for index in range(number, options['writes'], options['threads'])]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            outcomes = [outcome for chunk in pool.map(run_writer, range(options['threads'])) for outcome in chunk]
+        elapsed = time.perf_counter() - start
+
+        latencies = [latency * 1000 for status, latency, _ in outcomes if status == 302]
+        errors = Counter(error or f'HTTP {status}' for status, _, error in outcomes if status != 302)
+        return {
+            'elapsed_s': elapsed,
+            'succeeded': len(latencies),
+            'failed': sum(errors.values()),
+            'throughput': len(latencies) / elapsed,
+            'p50_ms': _percentile(latencies, 50) if latencies else None,
+            'p95_ms': _percentile(latencies, 95) if latencies else None,
+            'errors': dict(errors.most_common(5)),
+            'journal_mode': connections[DEFAULT_DB_ALIAS].cursor().execute('PRAGMA journal_mode').fetchone()[0],
+        }
+
+    def report(self, mode, result):
+        self.stdout.write(
+            f'{mode:<10} {result["succeeded"]} ok, {result["failed"]} failed in {result["elapsed_s"]:.1f}s: '
+            f'{result["throughput"]:.1f} writes/s, p50 {result["p50_ms"] or 0:.0f}ms, '
+            f'p95 {result["p95_ms"] or 0:.0f}ms (journal {result["journal_mode"]})'
+        )
+        for error, count in result['errors'].items():
+            self.stdout.write(f'    {count:>5}  {error}')
@@ -0,0 +1,42 @@
+# Liew Qian Hui 22063182
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from disaster_response_information_system.exporters import (
+    EXPORT_SPECS, EXPORT_FORMATS, EXPORT_CHUNK_SIZE, export_records,
+)
+
+
+class Command(BaseCommand):
+    help = 'Stream disaster reports, aid requests or assignments to a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORT_SPECS))
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write; defaults to standard output')
+        parser.add_argument('--filter', action='append', default=[], metavar='NAME=VALUE',
+                            help='Listing filter, e.g. filter_type=flood or aid_filter_status=pending')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        params = {}
+        for item in options['filter']:
+            name, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f'Invalid filter "{item}", expected NAME=VALUE.')
+            params[name] = value
+
+        chunks = export_records(options['kind'], options['format'], params, options['chunk_size'])
+        if not options['output']:
+            for chunk in chunks:
+                sys.stdout.write(chunk)
+            return
+
+        try:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        except OSError as e:
+            raise CommandError(str(e))
+        self.stderr.write(self.style.SUCCESS(f'Exported {options["kind"]} to {options["output"]}.'))
@@ -0,0 +1,57 @@
+# Liew Qian Hui 22063182
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from disaster_response_information_system.models import User
+from disaster_response_information_system.synthetic import (
+    DEFAULT_SIZES, USERNAME_PREFIX, DEFAULT_PASSWORD, BATCH_SIZE, generate_dataset,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with a reproducible synthetic dataset (users, volunteers, shelters, '
+        'disaster reports, incidents, aid requests and assignments) for benchmarks'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiply every default size')
+        for name, size in DEFAULT_SIZES.items():
+            parser.add_argument(f'--{name.replace("_", "-")}', dest=name, type=int,
+                                help=f'Number of {name.replace("_", " ")} (default {size} x scale)')
+        parser.add_argument('--now', help='ISO timestamp the history ends at, to reproduce a dataset exactly')
+        parser.add_argument('--prefix', default=USERNAME_PREFIX, help='Username prefix of the generated users')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Password of every generated user')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        sizes = {
+            name: options[name] if options[name] is not None else round(size * options['scale'])
+            for name, size in DEFAULT_SIZES.items()
+        }
+        now = None
+        if options['now']:
+            try:
+                now = datetime.fromisoformat(options['now'])
+            except ValueError:
+                raise CommandError('--now must be an ISO timestamp, e.g. 2024-12-01T00:00:00+08:00.')
+            if timezone.is_naive(now):
+                now = timezone.make_aware(now)
+        if User.objects.filter(username__startswith=f'{options["prefix"]}_').exists():
+            raise CommandError(
+                f'Users named "{options["prefix"]}_*" already exist; use another --prefix or an empty database.'
+            )
+
+        start = time.perf_counter()
+        counts = generate_dataset(
+            seed=options['seed'], now=now, prefix=options['prefix'], password=options['password'],
+            batch_size=options['batch_size'], progress=lambda message: self.stdout.write(f'  {message}'), **sizes,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {sum(counts.values())} rows in {time.perf_counter() - start:.1f}s: '
+            + ', '.join(f'{count} {name.replace("_", " ")}' for name, count in counts.items())
+        ))
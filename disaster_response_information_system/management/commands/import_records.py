@@ -0,0 +1,40 @@
+# Liew Qian Hui 22063182
+from django.core.management.base import BaseCommand, CommandError
+
+from disaster_response_information_system.importers import (
+    IMPORT_SPECS, DEFAULT_BATCH_SIZE, guess_format, import_records,
+)
+from disaster_response_information_system.models import User
+
+
+class Command(BaseCommand):
+    help = 'Stream-import disaster reports or aid requests from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORT_SPECS))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension')
+        parser.add_argument('--user', required=True,
+                            help='Username recorded as reporter/requester when a row does not name one')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            default_user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" does not exist.')
+
+        file_format = options['format'] or guess_format(options['path'])
+        try:
+            with open(options['path'], 'rb') as f:
+                result = import_records(options['kind'], f, file_format, default_user, options['batch_size'])
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for line, message in result.errors:
+            self.stderr.write(f'Line {line}: {message}')
+        if result.failed > len(result.errors):
+            self.stderr.write(f'... and {result.failed - len(result.errors)} more errors')
+        if result.stopped:
+            raise CommandError(f'Import stopped after {result.created} records. {result.stopped}')
+        self.stdout.write(self.style.SUCCESS(f'Imported {result.created} records, {result.failed} failed.'))
@@ -0,0 +1,12 @@
+# Liew Qian Hui 22063182
+from django.core.management.base import BaseCommand
+
+from disaster_response_information_system.tiles import rebuild_report_tiles
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-zoom map tile aggregates of active disaster reports'
+
+    def handle(self, *args, **options):
+        total = rebuild_report_tiles()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} report tiles.'))
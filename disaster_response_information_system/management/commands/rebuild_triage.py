@@ -0,0 +1,12 @@
+# Liew Qian Hui 22063182
+from django.core.management.base import BaseCommand
+
+from disaster_response_information_system.triage import rebuild_triage
+
+
+class Command(BaseCommand):
+    help = 'Recompute the triage priority of every pending aid request'
+
+    def handle(self, *args, **options):
+        changed = rebuild_triage()
+        self.stdout.write(self.style.SUCCESS(f'Updated the priority of {changed} pending aid requests.'))
@@ -0,0 +1,101 @@
+# Liew Qian Hui 22063182
+import functools
+import json
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from disaster_response_information_system.models import User
+from disaster_response_information_system.surge import (
+    ClientSession, HttpSession, SurgeReplay, multi_state_flood, prepare_accounts, read_log, write_log,
+)
+from disaster_response_information_system.management.commands.benchmark_views import _request_host
+
+SCENARIOS = {'multi_state_flood': multi_state_flood}
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay a timestamped surge of registrations, reports, aid requests, status changes, assignments and '
+        'shelter edits against the site, and report throughput, error rate, lock wait and latency per action'
+    )
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group()
+        source.add_argument('--scenario', choices=SCENARIOS, default='multi_state_flood')
+        source.add_argument('--log', help='Replay this NDJSON event log instead of generating a scenario')
+        parser.add_argument('--write-log', help='Save the generated scenario as an NDJSON event log')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--citizens', type=int, default=20000, help='Citizens taking part in the scenario')
+        parser.add_argument('--duration', type=int, default=3600, help='Scenario length in seconds')
+        parser.add_argument('--authorities', type=int, default=40)
+        parser.add_argument('--volunteers', type=int, default=2000)
+        parser.add_argument('--shelters', type=int, default=300)
+        parser.add_argument('--speedup', type=float, default=60.0, help='Replay this many times faster than recorded')
+        parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight at once')
+        parser.add_argument('--base-url', help='Send requests to this running server instead of in-process')
+        parser.add_argument('--prefix', default='surge', help='Username prefix of the scenario accounts')
+        parser.add_argument('--output', help='JSON results file (default surge-<timestamp>.json)')
+
+    def handle(self, *args, **options):
+        if options['log']:
+            try:
+                header, events = read_log(options['log'])
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read event log {options["log"]}: {e}')
+        else:
+            header, events = SCENARIOS[options['scenario']](
+                seed=options['seed'], citizens=options['citizens'], duration=options['duration'],
+                authorities=options['authorities'], volunteers=options['volunteers'], shelters=options['shelters'],
+            )
+            if options['write_log']:
+                write_log(options['write_log'], header, events)
+        if User.objects.filter(username__startswith=f'{options["prefix"]}_').exists():
+            raise CommandError(
+                f'Users named "{options["prefix"]}_*" already exist; use another --prefix or an empty database.'
+            )
+
+        self.stdout.write(f'Creating {", ".join(f"{count} {name}" for name, count in header["setup"].items())}')
+        shelter_ids = prepare_accounts(header, options['prefix'], seed=options['seed'])
+        if options['base_url']:
+            session_factory = functools.partial(HttpSession, options['base_url'])
+        else:
+            session_factory = functools.partial(ClientSession, _request_host())
+            # Server errors are counted per action rather than logged with a traceback each
+            logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        self.stdout.write(
+            f'Replaying {len(events)} events of {header["scenario"]} at {options["speedup"]:g}x '
+            f'with {options["concurrency"]} concurrent requests'
+        )
+        started_at = datetime.now(dt_timezone.utc)
+        results = SurgeReplay(
+            header, events, options['prefix'], shelter_ids, session_factory,
+            speedup=options['speedup'], concurrency=options['concurrency'],
+        ).run()
+
+        self.stdout.write(
+            f'{"action":<22}{"requests":>9}{"errors":>8}{"req/s":>8}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+            f'{"lock p95":>10}{"skipped":>9}'
+        )
+        for action, result in results['actions'].items():
+            lock_wait = result['lock_wait_p95_ms']
+            self.stdout.write(
+                f'{action:<22}{result["requests"]:>9}{result["error_rate"]:>8.1%}{result["throughput"]:>8.1f}'
+                f'{result["p50_ms"] or 0:>9.1f}{result["p95_ms"] or 0:>9.1f}{result["p99_ms"] or 0:>9.1f}'
+                f'{"" if lock_wait is None else f"{lock_wait:.1f}":>10}{result["unresolved"]:>9}'
+            )
+        output = options['output'] or f'surge-{started_at:%Y%m%d-%H%M%S}.json'
+        with open(output, 'w') as f:
+            json.dump({
+                'meta': {
+                    'started_at': started_at.isoformat(), 'speedup': options['speedup'],
+                    'concurrency': options['concurrency'], 'base_url': options['base_url'], **header,
+                },
+                'results': results,
+            }, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f'{results["requests"]} requests in {results["elapsed_s"]:.1f}s '
+            f'({results["throughput"]:.1f}/s, {results["error_rate"]:.1%} errors); wrote {output}'
+        ))
@@ -0,0 +1,34 @@
+# Liew Qian Hui 22063182
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from disaster_response_information_system.routers import replica_aliases, sync_replica
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary database into its file-based read replicas, once or every --interval seconds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('aliases', nargs='*', help='Replica aliases (default DRIS_DB_REPLICAS)')
+        parser.add_argument('--interval', type=float, help='Keep syncing, this many seconds apart')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or replica_aliases()
+        if not aliases:
+            raise CommandError('No replicas configured in DRIS_DB_REPLICAS; name the aliases to sync.')
+        unknown = [alias for alias in aliases if alias not in settings.DATABASES]
+        if unknown:
+            raise CommandError(f'Unknown database aliases: {", ".join(unknown)}.')
+        while True:
+            for alias in aliases:
+                start = time.perf_counter()
+                try:
+                    sync_replica(alias)
+                except ValueError as e:
+                    raise CommandError(str(e))
+                self.stdout.write(f'Synced {alias} in {(time.perf_counter() - start) * 1000:.0f}ms')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,218 @@
+# Liew Qian Hui 22063182
+"""
+Batch matching of available volunteers to approved aid requests.
+
+The whole backlog is solved at once as a min-cost bipartite assignment
+(Hungarian method via SciPy) over a cost matrix built from skill fit,
+distance and current workload, then committed in a single transaction.
+The previewed plan travels to the commit as a signed token, so the commit
+creates exactly the assignments the authority reviewed, without solving
+again.
+"""
+from collections import namedtuple
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from django.core import signing
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import AidRequest, VolunteerProfile, VolunteerAssignment
+from .spatial import haversine_km_matrix
+from .stats import invalidate_dashboard_stats
+from .page_cache import AID_REQUEST_DATA, VOLUNTEER_DATA, ASSIGNMENT_DATA, bump_data_version
+
+# Keywords looked for in a volunteer's skill names for each aid type
+AID_SKILL_KEYWORDS = {
+    'food': ('food', 'cook', 'kitchen', 'logistic', 'driv', 'distribut'),
+    'shelter': ('shelter', 'construct', 'carpent', 'logistic', 'counsel'),
+    'rescue': ('rescue', 'swim', 'boat', 'search', 'climb', 'driv'),
+    'medical': ('medic', 'first aid', 'nurs', 'doctor', 'paramedic', 'health'),
+    'other': (),
+}
+
+SKILL_WEIGHT = 1.0
+DISTANCE_WEIGHT = 1.0
+WORKLOAD_WEIGHT = 0.5
+MAX_MATCH_DISTANCE_KM = 50.0
+# Cost given to pairs beyond the distance limit; such pairs are never committed
+FORBIDDEN_COST = 1e6
+ACTIVE_ASSIGNMENT_STATUSES = ['assigned', 'in_progress']
+PLAN_SALT = 'dris.matching.plan'
+PLAN_MAX_AGE = 60 * 60  # seconds a previewed plan can still be committed
+
+Match = namedtuple('Match', [
+    'aid_request_id', 'volunteer_id', 'volunteer_profile_id',
+    'skill_match', 'distance_km', 'active_assignments', 'cost',
+])
+
+
+class MatchingConflict(Exception):
+    """Raised when requests or volunteers changed between planning and commit"""
+
+
+def unassigned_approved_requests():
+    return AidRequest.objects.filter(status='approved').exclude(assignments__isnull=False)
+
+
+def available_volunteers():
+    return VolunteerProfile.objects.filter(availability='available').annotate(
+        active_assignments=Count(
+            'user__assignments',
+            filter=Q(user__assignments__status__in=ACTIVE_ASSIGNMENT_STATUSES),
+        )
+    )
+
+
+def _skill_fit(volunteer_ids):
+    """Boolean matrix (volunteers x aid types) of whether a skill suits the type"""
+    aid_types = [code for code, _ in AidRequest.AID_TYPES]
+    position = {volunteer_id: i for i, volunteer_id in enumerate(volunteer_ids)}
+    fit = np.zeros((len(volunteer_ids), len(aid_types)), dtype=bool)
+
+    # One query for every available volunteer's skills instead of one per profile
+    skill_rows = VolunteerProfile.skills.through.objects.filter(
+        volunteerprofile__availability='available'
+    ).values_list('volunteerprofile_id', 'skill__name')
+    for volunteer_id, skill_name in skill_rows:
+        row = position.get(volunteer_id)
+        if row is None:
+            continue
+        skill_name = skill_name.lower()
+        for col, aid_type in enumerate(aid_types):
+            if any(keyword in skill_name for keyword in AID_SKILL_KEYWORDS.get(aid_type, ())):
+                fit[row, col] = True
+    return fit, {aid_type: col for col, aid_type in enumerate(aid_types)}
+
+
+def plan_assignments(max_distance_km=MAX_MATCH_DISTANCE_KM):
+    """
+    Compute the min-cost assignment of available volunteers to approved,
+    unassigned aid requests without writing anything.
+
+    Returns a list of Match tuples ordered by aid request id.
+    """
+    requests = list(unassigned_approved_requests().values_list(
+        'id', 'aid_type', 'latitude', 'longitude'
+    ).order_by('id'))
+    volunteers = list(available_volunteers().values_list(
+        'id', 'user_id', 'latitude', 'longitude', 'active_assignments'
+    ).order_by('id'))
+    if not requests or not volunteers:
+        return []
+
+    request_ids = [row[0] for row in requests]
+    volunteer_ids = [row[0] for row in volunteers]
+    volunteer_user_ids = [row[1] for row in volunteers]
+
+    # Skill cost: 0 when the volunteer has a skill suited to the aid type
+    fit, type_column = _skill_fit(volunteer_ids)
+    request_types = np.array([type_column[row[1]] for row in requests])
+    skill_match = fit[:, request_types].T
+    skill_cost = (~skill_match).astype(np.float64)
+
+    # Distance cost: normalised to the limit; unknown volunteer locations cost half
+    request_coords = np.array([(row[2], row[3]) for row in requests], dtype=np.float64)
+    volunteer_coords = np.array(
+        [(row[2] if row[2] is not None else np.nan, row[3] if row[3] is not None else np.nan)
+         for row in volunteers],
+        dtype=np.float64,
+    )
+    distances = haversine_km_matrix(
+        request_coords[:, 0], request_coords[:, 1], volunteer_coords[:, 0], volunteer_coords[:, 1]
+    )
+    distance_cost = np.where(np.isnan(distances), 0.5, np.minimum(distances, max_distance_km) / max_distance_km)
+
+    # Workload cost: grows with active assignments but saturates
+    workload = np.array([row[4] for row in volunteers], dtype=np.float64)
+    workload_cost = (workload / (workload + 1))[np.newaxis, :]
+
+    cost = SKILL_WEIGHT * skill_cost + DISTANCE_WEIGHT * distance_cost + WORKLOAD_WEIGHT * workload_cost
+    cost[distances > max_distance_km] = FORBIDDEN_COST
+
+    rows, cols = linear_sum_assignment(cost)
+
+    matches = []
+    for row, col in zip(rows, cols):
+        if cost[row, col] >= FORBIDDEN_COST:
+            continue
+        distance = distances[row, col]
+        matches.append(Match(
+            aid_request_id=request_ids[row],
+            volunteer_id=volunteer_user_ids[col],
+            volunteer_profile_id=volunteer_ids[col],
+            skill_match=bool(skill_match[row, col]),
+            distance_km=None if np.isnan(distance) else round(float(distance), 1),
+            active_assignments=int(workload[col]),
+            cost=round(float(cost[row, col]), 3),
+        ))
+    return matches
+
+
+def sign_plan(matches):
+    """Signed token of the planned (aid request, volunteer) pairs, for the commit form"""
+    pairs = [[match.aid_request_id, match.volunteer_id, match.volunteer_profile_id] for match in matches]
+    return signing.dumps(pairs, salt=PLAN_SALT, compress=True)
+
+
+def load_plan(token, max_age=PLAN_MAX_AGE):
+    """
+    The matches of a token from sign_plan, carrying only their ids. Raises
+    MatchingConflict for a token that was altered or is too old.
+    """
+    try:
+        pairs = signing.loads(token, salt=PLAN_SALT, max_age=max_age)
+    except signing.SignatureExpired:
+        raise MatchingConflict('The previewed plan has expired.')
+    except signing.BadSignature:
+        raise MatchingConflict('The previewed plan is invalid.')
+    return [
+        Match(aid_request_id, volunteer_id, profile_id, None, None, None, None)
+        for aid_request_id, volunteer_id, profile_id in pairs
+    ]
+
+
+def commit_assignments(matches, assigned_by, notes=''):
+    """
+    Create the planned assignments and flip request/volunteer states in one
+    transaction. Raises MatchingConflict, rolling everything back, if any
+    request or volunteer is no longer eligible.
+    """
+    if not matches:
+        return []
+
+    request_ids = [match.aid_request_id for match in matches]
+    profile_ids = [match.volunteer_profile_id for match in matches]
+
+    with transaction.atomic():
+        if VolunteerAssignment.objects.filter(aid_request_id__in=request_ids).exists():
+            raise MatchingConflict('Some aid requests were assigned in the meantime.')
+
+        updated = AidRequest.objects.filter(
+            pk__in=request_ids, status='approved'
+        ).update(status='in_progress', updated_at=timezone.now())
+        if updated != len(request_ids):
+            raise MatchingConflict('Some aid requests are no longer approved.')
+
+        updated = VolunteerProfile.objects.filter(
+            pk__in=profile_ids, availability='available'
+        ).update(availability='unavailable')
+        if updated != len(profile_ids):
+            raise MatchingConflict('Some volunteers are no longer available.')
+
+        # Queryset updates and bulk_create send no model signals, so refresh the counters here
+        transaction.on_commit(invalidate_dashboard_stats)
+        for data_name in (AID_REQUEST_DATA, VOLUNTEER_DATA, ASSIGNMENT_DATA):
+            transaction.on_commit(lambda data_name=data_name: bump_data_version(data_name))
+
+        return VolunteerAssignment.objects.bulk_create([
+            VolunteerAssignment(
+                volunteer_id=match.volunteer_id,
+                aid_request_id=match.aid_request_id,
+                assigned_by=assigned_by,
+                status='assigned',
+                notes=notes,
+            )
+            for match in matches
+        ], batch_size=500)
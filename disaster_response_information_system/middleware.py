@@ -0,0 +1,156 @@
+# Liew Qian Hui 22063182
+"""
+Per-request performance instrumentation.
+
+QueryMetricsMiddleware records the SQL query count, database time, time
+spent in statements that take the write lock (on SQLite mostly waiting
+for it under concurrent writes), time spent outside the database (view
+logic and template rendering) and, optionally, peak Python allocations for
+every request, tagged with the URL name. Views exceeding their query
+budget from ``DRIS_QUERY_BUDGETS`` are logged, or raise
+QueryBudgetExceeded when ``DRIS_QUERY_BUDGET_ACTION`` is ``'raise'`` (as
+QueryBudgetTestRunner sets it for the test suite).
+"""
+import logging
+import time
+import tracemalloc
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('dris.performance')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a view runs more SQL queries than its configured budget"""
+
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'BEGIN')
+
+
+class _QueryRecorder:
+    """Database execute wrapper counting queries and their duration"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.write_duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.duration += elapsed
+            if sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+                self.write_duration += elapsed
+            self.count += 1
+
+
+def query_budget_for(url_name):
+    """Return the query budget for a URL name, or None when unlimited"""
+    budgets = getattr(settings, 'DRIS_QUERY_BUDGETS', {})
+    return budgets.get(url_name, getattr(settings, 'DRIS_QUERY_BUDGET_DEFAULT', None))
+
+
+class _Measurement:
+    """Query recording and timing for one request"""
+
+    def __init__(self):
+        self.trace_memory = getattr(settings, 'DRIS_PERF_TRACE_MEMORY', False) and not tracemalloc.is_tracing()
+        if self.trace_memory:
+            tracemalloc.start()
+
+        self.recorder = _QueryRecorder()
+        self.start = time.perf_counter()
+        self.wrappers = []
+
+    def install(self):
+        """Wrap the calling thread's database connections"""
+        self.wrappers = [connection.execute_wrapper(self.recorder) for connection in connections.all()]
+        for wrapper in self.wrappers:
+            wrapper.__enter__()
+
+    def uninstall(self):
+        for wrapper in reversed(self.wrappers):
+            wrapper.__exit__(None, None, None)
+
+    def stop(self):
+        self.total = time.perf_counter() - self.start
+        self.peak_kb = None
+        if self.trace_memory:
+            self.peak_kb = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+
+
+class QueryMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            # Stay on the event loop for async views instead of forcing a thread hop
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        measurement = _Measurement()
+        measurement.install()
+        try:
+            response = self.get_response(request)
+        finally:
+            measurement.uninstall()
+            measurement.stop()
+        return self.process_metrics(request, response, measurement)
+
+    async def __acall__(self, request):
+        # Connections are per thread; the async ORM runs this request's queries on
+        # one thread-sensitive executor thread, so the wrappers are installed there
+        measurement = _Measurement()
+        await sync_to_async(measurement.install)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(measurement.uninstall)()
+            measurement.stop()
+        return self.process_metrics(request, response, measurement)
+
+    def process_metrics(self, request, response, measurement):
+        recorder = measurement.recorder
+        total = measurement.total
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.url_name if match else None
+        metrics = {
+            'url_name': url_name,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 2),
+            'write_ms': round(recorder.write_duration * 1000, 2),
+            'render_ms': round((total - recorder.duration) * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'peak_kb': measurement.peak_kb,
+        }
+        response.perf_metrics = metrics
+        logger.info('%(method)s %(url_name)s %(status)s queries=%(queries)s db=%(db_ms)sms write=%(write_ms)sms '
+                    'render=%(render_ms)sms total=%(total_ms)sms peak=%(peak_kb)skB', metrics, extra=metrics)
+
+        if getattr(settings, 'DRIS_PERF_SERVER_TIMING', False):
+            response['Server-Timing'] = (
+                f'db;dur={metrics["db_ms"]};desc="{recorder.count} queries", write;dur={metrics["write_ms"]}, '
+                f'render;dur={metrics["render_ms"]}, total;dur={metrics["total_ms"]}'
+            )
+
+        budget = query_budget_for(url_name)
+        if budget is not None and recorder.count > budget:
+            message = f'View "{url_name}" ran {recorder.count} queries (budget {budget}).'
+            if getattr(settings, 'DRIS_QUERY_BUDGET_ACTION', 'log') == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message, extra=metrics)
+
+        return response
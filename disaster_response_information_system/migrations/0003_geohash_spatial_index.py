@@ -0,0 +1,66 @@
+# Generated by Django 5.2.3 on 2026-10-17 14:07
+
+from django.db import migrations, models
+
+# Geohash encoding of spatial.py when this migration was written, kept here
+# so that later changes to the live module cannot change what it does
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    total = precision * 5
+    lat_bits, lon_bits = total // 2, total - total // 2
+    row = max(min(int((float(latitude) + 90.0) / (180.0 / (1 << lat_bits))), (1 << lat_bits) - 1), 0)
+    col = max(min(int((float(longitude) + 180.0) / (360.0 / (1 << lon_bits))), (1 << lon_bits) - 1), 0)
+    value = 0
+    for i in range(total):
+        # Interleave the column and row bits, longitude first
+        if i % 2 == 0:
+            lon_bits -= 1
+            bit = (col >> lon_bits) & 1
+        else:
+            lat_bits -= 1
+            bit = (row >> lat_bits) & 1
+        value = (value << 1) | bit
+    return ''.join(GEOHASH_ALPHABET[(value >> shift) & 31] for shift in range(total - 5, -1, -5))
+
+
+def populate_geohash(apps, schema_editor):
+    for model_name in ('DisasterReport', 'Shelter', 'AidRequest'):
+        model = apps.get_model('disaster_response_information_system', model_name)
+        batch = []
+        for obj in model.objects.only('id', 'latitude', 'longitude').iterator(chunk_size=2000):
+            obj.geohash = encode_geohash(obj.latitude, obj.longitude)
+            batch.append(obj)
+            if len(batch) >= 2000:
+                model.objects.bulk_update(batch, ['geohash'])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disaster_response_information_system', '0002_disasterreport_area_affected_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aidrequest',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=9),
+        ),
+        migrations.AddField(
+            model_name='disasterreport',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=9),
+        ),
+        migrations.AddField(
+            model_name='shelter',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=9),
+        ),
+        migrations.RunPython(populate_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-17 14:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disaster_response_information_system', '0003_geohash_spatial_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='volunteerprofile',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, help_text='Usual base location, used when matching volunteers to aid requests', max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='volunteerprofile',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.3 on 2026-10-17 14:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('disaster_response_information_system', '0004_volunteerprofile_location'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aidrequest',
+            index=models.Index(fields=['requested_at'], name='aid_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aidrequest',
+            index=models.Index(fields=['status', 'requested_at'], name='aid_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aidrequest',
+            index=models.Index(fields=['aid_type', 'requested_at'], name='aid_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aidrequest',
+            index=models.Index(fields=['requester', 'requested_at'], name='aid_requester_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disasterreport',
+            index=models.Index(fields=['reported_at'], name='report_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disasterreport',
+            index=models.Index(fields=['severity', 'reported_at'], name='report_severity_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disasterreport',
+            index=models.Index(fields=['disaster_type', 'reported_at'], name='report_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disasterreport',
+            index=models.Index(fields=['is_active', 'reported_at'], name='report_active_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disasterreport',
+            index=models.Index(fields=['is_active', 'severity', 'reported_at'], name='report_active_sev_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disasterreport',
+            index=models.Index(fields=['is_active', 'disaster_type', 'reported_at'], name='report_active_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['user_role', 'date_joined'], name='user_role_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['date_joined'], name='user_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='volunteerprofile',
+            index=models.Index(fields=['availability'], name='volunteer_availability_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-17 14:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disaster_response_information_system', '0005_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aidrequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='disasterreport',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='shelter',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
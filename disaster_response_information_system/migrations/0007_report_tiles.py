@@ -0,0 +1,74 @@
+# Generated by Django 5.2.3 on 2026-10-17 14:47
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Substr
+
+# The tile aggregation of tiles.py when this migration was written, kept here
+# so that later changes to the live module cannot change what it does
+TILE_PRECISIONS = range(1, 7)
+SEVERITY_FIELDS = {1: 'low_count', 2: 'medium_count', 3: 'high_count', 4: 'critical_count'}
+
+
+def build_report_tiles(apps, schema_editor):
+    DisasterReport = apps.get_model('disaster_response_information_system', 'DisasterReport')
+    ReportTile = apps.get_model('disaster_response_information_system', 'ReportTile')
+    severity_counts = {
+        field: Count('id', filter=Q(severity=level)) for level, field in SEVERITY_FIELDS.items()
+    }
+    reports = DisasterReport.objects.filter(is_active=True).exclude(geohash='')
+    for precision in TILE_PRECISIONS:
+        rows = reports.annotate(cell=Substr('geohash', 1, precision)).values('cell', 'disaster_type').annotate(
+            report_count=Count('id'),
+            people_total=Sum('people_affected'),
+            area_total=Sum('area_affected'),
+            latitude_total=Sum('latitude'),
+            longitude_total=Sum('longitude'),
+            **severity_counts,
+        ).order_by()
+        ReportTile.objects.bulk_create([
+            ReportTile(
+                precision=precision,
+                cell=row['cell'],
+                disaster_type=row['disaster_type'],
+                report_count=row['report_count'],
+                people_affected=row['people_total'] or 0,
+                area_affected=row['area_total'] or 0,
+                latitude_sum=float(row['latitude_total']),
+                longitude_sum=float(row['longitude_total']),
+                **{field: row[field] for field in SEVERITY_FIELDS.values()},
+            )
+            for row in rows
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disaster_response_information_system', '0006_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportTile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precision', models.PositiveSmallIntegerField()),
+                ('cell', models.CharField(max_length=9)),
+                ('disaster_type', models.CharField(choices=[('flood', 'Flood'), ('landslide', 'Landslide'), ('haze', 'Haze'), ('other', 'Other')], max_length=10)),
+                ('report_count', models.IntegerField(default=0)),
+                ('low_count', models.IntegerField(default=0)),
+                ('medium_count', models.IntegerField(default=0)),
+                ('high_count', models.IntegerField(default=0)),
+                ('critical_count', models.IntegerField(default=0)),
+                ('people_affected', models.BigIntegerField(default=0)),
+                ('area_affected', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('latitude_sum', models.FloatField(default=0)),
+                ('longitude_sum', models.FloatField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('precision', 'cell', 'disaster_type'), name='report_tile_cell_uniq')],
+            },
+        ),
+        migrations.RunPython(build_report_tiles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-17 14:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disaster_response_information_system', '0007_report_tiles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Incident',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('disaster_type', models.CharField(max_length=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='disasterreport',
+            name='incident',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reports', to='disaster_response_information_system.incident'),
+        ),
+        migrations.AddIndex(
+            model_name='disasterreport',
+            index=models.Index(fields=['disaster_type', 'geohash'], name='report_type_geohash_idx'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.3 on 2026-10-17 14:56
+
+import bisect
+import math
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+
+# The triage scoring of triage.py when this migration was written, kept here
+# so that later changes to the live module cannot change what it does. The
+# neighbour search is plain Python, so migrating needs neither NumPy nor SciPy
+AID_TYPE_URGENCY = {'rescue': 40, 'medical': 30, 'shelter': 20, 'food': 10, 'other': 5}
+PEOPLE_WEIGHT = 10
+SEVERITY_WEIGHT = 8
+WAIT_POINTS_PER_HOUR = 2
+TRIAGE_RADIUS_KM = 5
+EARTH_RADIUS_KM = 6371.0088
+TRIAGE_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def unit_vector(latitude, longitude):
+    latitude, longitude = math.radians(float(latitude)), math.radians(float(longitude))
+    return (
+        math.cos(latitude) * math.cos(longitude),
+        math.cos(latitude) * math.sin(longitude),
+        math.sin(latitude),
+    )
+
+
+def score_pending_aid_requests(apps, schema_editor):
+    AidRequest = apps.get_model('disaster_response_information_system', 'AidRequest')
+    DisasterReport = apps.get_model('disaster_response_information_system', 'DisasterReport')
+
+    # Active reports by latitude, so each request only checks a band of them
+    reports = sorted(DisasterReport.objects.filter(is_active=True).values_list('latitude', 'longitude', 'severity'))
+    report_latitudes = [float(report[0]) for report in reports]
+    report_vectors = [unit_vector(latitude, longitude) for latitude, longitude, _ in reports]
+    chord = 2 * math.sin(TRIAGE_RADIUS_KM / (2 * EARTH_RADIUS_KM))
+    band = math.degrees(TRIAGE_RADIUS_KM / EARTH_RADIUS_KM) + 1e-9
+
+    batch = []
+    pending = AidRequest.objects.filter(status='pending').only(
+        'id', 'aid_type', 'num_people', 'latitude', 'longitude', 'requested_at',
+    )
+    for aid_request in pending.iterator(chunk_size=2000):
+        severity = 0
+        latitude = float(aid_request.latitude)
+        start = bisect.bisect_left(report_latitudes, latitude - band)
+        end = bisect.bisect_right(report_latitudes, latitude + band)
+        if start < end:
+            point = unit_vector(aid_request.latitude, aid_request.longitude)
+            severity = max((
+                reports[i][2] for i in range(start, end)
+                if math.dist(point, report_vectors[i]) <= chord
+            ), default=0)
+        score = (
+            AID_TYPE_URGENCY.get(aid_request.aid_type, 0)
+            + PEOPLE_WEIGHT * math.log2(1 + max(aid_request.num_people or 0, 0))
+            + SEVERITY_WEIGHT * severity
+        )
+        hours = (aid_request.requested_at - TRIAGE_EPOCH).total_seconds() / 3600
+        aid_request.triage_priority = score - WAIT_POINTS_PER_HOUR * hours
+        batch.append(aid_request)
+        if len(batch) >= 2000:
+            AidRequest.objects.bulk_update(batch, ['triage_priority'])
+            batch = []
+    if batch:
+        AidRequest.objects.bulk_update(batch, ['triage_priority'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('disaster_response_information_system', '0008_incidents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aidrequest',
+            name='triage_priority',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='aidrequest',
+            index=models.Index(fields=['status', 'triage_priority'], name='aid_status_priority_idx'),
+        ),
+        migrations.RunPython(score_pending_aid_requests, migrations.RunPython.noop),
+    ]
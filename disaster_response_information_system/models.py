@@ -4,6 +4,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 
+from .spatial import GeoLocatedModel
+
 class User(AbstractUser):
     USER_ROLES = [
         ('citizen', 'Citizen'),
@@ -15,11 +17,41 @@ class User(AbstractUser):
     phone = models.CharField(max_length=15, blank=True, null=True)
     address = models.TextField(blank=True, null=True)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['user_role', 'date_joined'], name='user_role_joined_idx'),
+            models.Index(fields=['date_joined'], name='user_joined_idx'),
+        ]
+
     def __str__(self):
         return f"{self.username} ({self.get_user_role_display()})"
 
 
-class DisasterReport(models.Model):
+class TimestampedModel(models.Model):
+    """Abstract base recording when a row last changed, for HTTP Last-Modified validators"""
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # auto_now only reaches the database if the field is saved
+        update_fields = kwargs.get('update_fields')
+        if update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'updated_at'}
+        super().save(*args, **kwargs)
+
+
+class Incident(models.Model):
+    """A cluster of disaster reports describing the same event, see incidents.py"""
+    disaster_type = models.CharField(max_length=10)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Incident #{self.pk} ({self.disaster_type})"
+
+
+class DisasterReport(TimestampedModel, GeoLocatedModel):
     DISASTER_TYPES = [
         ('flood', 'Flood'),
         ('landslide', 'Landslide'),
@@ -53,12 +85,56 @@ class DisasterReport(models.Model):
     people_affected = models.IntegerField(blank=True, null=True)
     area_affected = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, help_text="Area affected in square kilometers")
     infrastructure_damage = models.CharField(max_length=15, choices=INFRASTRUCTURE_DAMAGE_LEVELS, blank=True, null=True)
+    incident = models.ForeignKey(Incident, on_delete=models.SET_NULL, blank=True, null=True, related_name='reports')
+
+    class Meta:
+        # Match the filter/sort combinations of disaster_reports and admin_dashboard;
+        # the trailing id of each keyset ordering is the implicit rowid
+        indexes = [
+            models.Index(fields=['reported_at'], name='report_date_idx'),
+            models.Index(fields=['severity', 'reported_at'], name='report_severity_date_idx'),
+            models.Index(fields=['disaster_type', 'reported_at'], name='report_type_date_idx'),
+            models.Index(fields=['is_active', 'reported_at'], name='report_active_date_idx'),
+            models.Index(fields=['is_active', 'severity', 'reported_at'], name='report_active_sev_date_idx'),
+            models.Index(fields=['is_active', 'disaster_type', 'reported_at'], name='report_active_type_date_idx'),
+            # Near-duplicate lookups (incidents.py)
+            models.Index(fields=['disaster_type', 'geohash'], name='report_type_geohash_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_disaster_type_display()} at {self.location} ({self.latitude}, {self.longitude})"
 
 
-class Shelter(models.Model):
+class ReportTile(models.Model):
+    """
+    Running totals of the active disaster reports of one type inside one
+    geohash cell, kept for every map precision; see tiles.py
+    """
+    precision = models.PositiveSmallIntegerField()
+    cell = models.CharField(max_length=9)
+    disaster_type = models.CharField(max_length=10, choices=DisasterReport.DISASTER_TYPES)
+    report_count = models.IntegerField(default=0)
+    # Counts per severity level, so the maximum survives reports leaving the cell
+    low_count = models.IntegerField(default=0)
+    medium_count = models.IntegerField(default=0)
+    high_count = models.IntegerField(default=0)
+    critical_count = models.IntegerField(default=0)
+    people_affected = models.BigIntegerField(default=0)
+    area_affected = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Coordinate sums for the reports' centroid
+    latitude_sum = models.FloatField(default=0)
+    longitude_sum = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['precision', 'cell', 'disaster_type'], name='report_tile_cell_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.report_count} {self.disaster_type} reports in {self.cell}"
+
+
+class Shelter(TimestampedModel, GeoLocatedModel):
     name = models.CharField(max_length=255)
     address = models.TextField()
     latitude = models.DecimalField(max_digits=9, decimal_places=6)
@@ -86,7 +162,7 @@ class Shelter(models.Model):
             return (self.current_occupancy / self.capacity) * 100
         return 0
 
-class AidRequest(models.Model):
+class AidRequest(TimestampedModel, GeoLocatedModel):
     AID_TYPES = [
         ('food', 'Food'),
         ('shelter', 'Shelter'),
@@ -122,6 +198,19 @@ class AidRequest(models.Model):
         limit_choices_to={'user_role': 'authority'},
         help_text='Authority user who approved or rejected this request.'
     )
+    # Time-invariant triage ordering key; see triage.py
+    triage_priority = models.FloatField(default=0, editable=False)
+
+    class Meta:
+        # Match the filter/sort combinations of admin_dashboard and my_aid_requests
+        indexes = [
+            models.Index(fields=['requested_at'], name='aid_date_idx'),
+            models.Index(fields=['status', 'requested_at'], name='aid_status_date_idx'),
+            models.Index(fields=['aid_type', 'requested_at'], name='aid_type_date_idx'),
+            models.Index(fields=['requester', 'requested_at'], name='aid_requester_date_idx'),
+            # Triage queue: the next pending requests to review
+            models.Index(fields=['status', 'triage_priority'], name='aid_status_priority_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_aid_type_display()} request at {self.location} by {self.requester.username}"
@@ -142,6 +231,13 @@ class VolunteerProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='volunteer_profile')
     skills = models.ManyToManyField(Skill)
     availability = models.CharField(max_length=15, choices=AVAILABILITY_CHOICES, default='available')
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True, help_text="Usual base location, used when matching volunteers to aid requests")
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['availability'], name='volunteer_availability_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username}'s Volunteer Profile"
@@ -0,0 +1,123 @@
+# Liew Qian Hui 22063182
+"""
+Data-version counters and a versioned read-through cache for public page
+fragments.
+
+Each cached fragment's key includes a data-version counter for the tables
+it was rendered from. Writes bump the counter (see signals.py), so every
+fragment rendered from older data stops being addressed at once, with no
+key scanning, and is left to expire. Counters and fragments live in the
+default cache, so the same code works with the local-memory backend and a
+shared backend such as Redis or Memcached. A request that reads from a
+replica sees versions tagged with the replica's sync generation, so what it
+renders from a lagging copy is cached apart from pages of the primary.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from .routers import read_source
+
+# Data sets with a version counter; signals.py bumps them on writes
+REPORT_DATA = 'disaster_reports'
+SHELTER_DATA = 'shelters'
+AID_REQUEST_DATA = 'aid_requests'
+VOLUNTEER_DATA = 'volunteers'  # volunteer profiles, their skills and locations
+ASSIGNMENT_DATA = 'assignments'
+USER_DATA = 'users'
+
+PAGE_CACHE_TIMEOUT = 600  # seconds; stale versions are never read, this only bounds memory
+VERSION_KEY = 'dris:version:{}'
+CHANGED_AT_KEY = 'dris:changed_at:{}'
+FRAGMENT_KEY = 'dris:page:{}:{}:{}'
+COUNTER_KEY = 'dris:page_cache:{}:{}'
+
+
+def _start_version(name):
+    # Start from a timestamp so a counter lost to eviction never reuses an old
+    # version, and treat the data as changed now since earlier writes are unknown
+    now = time.time()
+    cache.add(CHANGED_AT_KEY.format(name), now, None)
+    cache.add(VERSION_KEY.format(name), int(now * 1000), None)
+
+
+def data_versions(names):
+    """Current version counters for several data sets, as seen by the current request, as a dict"""
+    keys = {VERSION_KEY.format(name): name for name in names}
+    found = cache.get_many(keys)
+    missing = [name for key, name in keys.items() if key not in found]
+    for name in missing:
+        _start_version(name)
+    if missing:
+        found = cache.get_many(keys)
+    versions = {name: found.get(key) for key, name in keys.items()}
+    source = read_source()
+    if source is not None:
+        versions = {name: f'{version}@{source}' for name, version in versions.items()}
+    return versions
+
+
+def data_version(name):
+    """Current version counter for a data set"""
+    return data_versions([name])[name]
+
+
+def data_changed_at(name):
+    """Unix time of the last recorded write to a data set"""
+    changed_at = cache.get(CHANGED_AT_KEY.format(name))
+    if changed_at is None:
+        _start_version(name)
+        changed_at = cache.get(CHANGED_AT_KEY.format(name))
+    return changed_at
+
+
+def bump_data_version(name):
+    """Invalidate every fragment and validator derived from ``name``"""
+    cache.set(CHANGED_AT_KEY.format(name), time.time(), None)
+    try:
+        cache.incr(VERSION_KEY.format(name))
+    except ValueError:
+        _start_version(name)
+
+
+def _count(page, outcome):
+    key = COUNTER_KEY.format(page, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def cached_fragment(page, data_name, params, render):
+    """
+    Return the cached HTML for ``page`` with ``params`` at the current
+    version of ``data_name``, calling ``render()`` to build it on a miss.
+    """
+    digest = hashlib.md5(urlencode(sorted(params.items())).encode()).hexdigest()
+    key = FRAGMENT_KEY.format(page, data_version(data_name), digest)
+    html = cache.get(key)
+    if html is None:
+        _count(page, 'misses')
+        html = render()
+        cache.set(key, str(html), PAGE_CACHE_TIMEOUT)
+    else:
+        _count(page, 'hits')
+    return mark_safe(html)
+
+
+def page_cache_stats(pages=('disaster_reports', 'disaster_report_detail')):
+    """Hit/miss counts and hit ratio per cached page"""
+    stats = {}
+    for page in pages:
+        counts = cache.get_many([COUNTER_KEY.format(page, 'hits'), COUNTER_KEY.format(page, 'misses')])
+        hits = counts.get(COUNTER_KEY.format(page, 'hits'), 0)
+        misses = counts.get(COUNTER_KEY.format(page, 'misses'), 0)
+        stats[page] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / (hits + misses) if hits + misses else None,
+        }
+    return stats
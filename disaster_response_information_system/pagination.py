@@ -0,0 +1,163 @@
+# Liew Qian Hui 22063182
+"""
+Keyset (cursor) pagination helpers.
+
+Instead of OFFSET, each page continues from the sort key of the last row of
+the previous page, so every page costs the same index seek regardless of
+depth. Cursors are opaque URL-safe tokens wrapping that sort key and the
+direction to read in.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded"""
+
+
+def encode_cursor(values, direction=NEXT):
+    data = json.dumps([direction] + list(values), separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(token, fields):
+    """
+    Decode a cursor into ``(direction, values)``, with one sort-key value per
+    model field in ``fields`` converted by that field. Raises InvalidCursor
+    for anything that does not decode to such values, e.g. a tampered token.
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor('Malformed cursor.') from e
+    if not isinstance(data, list) or len(data) != len(fields) + 1 or data[0] not in (NEXT, PREVIOUS):
+        raise InvalidCursor('Malformed cursor.')
+    try:
+        values = [field.to_python(value) for field, value in zip(fields, data[1:])]
+    except (ValidationError, ValueError, TypeError) as e:
+        raise InvalidCursor('Malformed cursor.') from e
+    if any(value is None for value in values):
+        raise InvalidCursor('Malformed cursor.')
+    return data[0], values
+
+
+def ordering_fields(queryset, ordering):
+    """The model fields, or annotations' output fields, that ``ordering`` sorts ``queryset`` by"""
+    fields = []
+    for name in (field.lstrip('-') for field in ordering):
+        if name in queryset.query.annotations:
+            fields.append(queryset.query.annotations[name].output_field)
+        elif name == 'pk':
+            fields.append(queryset.model._meta.pk)
+        else:
+            fields.append(queryset.model._meta.get_field(name))
+    return fields
+
+
+def reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+def keyset_filter(ordering, values):
+    """
+    Build the Q object selecting rows strictly after ``values`` for an
+    ordering such as ``['-reported_at', '-id']``.
+
+    The ordering must end with a unique field so that ties are broken.
+    """
+    condition = Q()
+    equal_prefix = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal_prefix & Q(**{f'{name}__{lookup}': value})
+        equal_prefix &= Q(**{name: value})
+    return condition
+
+
+class KeysetPage:
+    """One page of rows with cursors to its neighbours"""
+
+    def __init__(self, rows, next_cursor, previous_cursor):
+        self.object_list = rows
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _keyset_queryset(queryset, ordering, cursor):
+    """Return ``(direction, cursor values, queryset to read)`` for a page request"""
+    direction, values = decode_cursor(cursor, ordering_fields(queryset, ordering)) if cursor else (NEXT, None)
+
+    # Read backwards from the cursor for previous pages, then restore the order
+    read_ordering = ordering if direction == NEXT else reverse_ordering(ordering)
+    queryset = queryset.order_by(*read_ordering)
+    if values is not None:
+        queryset = queryset.filter(keyset_filter(read_ordering, values))
+    return direction, values, queryset
+
+
+def _keyset_page(rows, direction, values, page_size, key_func):
+    # One extra row was fetched to learn whether the page continues in that direction
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == PREVIOUS:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage(rows, None, None)
+
+    first, last = encode_cursor(key_func(rows[0]), PREVIOUS), encode_cursor(key_func(rows[-1]), NEXT)
+    if direction == NEXT:
+        return KeysetPage(rows, last if has_more else None, first if values is not None else None)
+    return KeysetPage(rows, last, first if has_more else None)
+
+
+def _default_key_func(ordering):
+    def key_func(row):
+        return [getattr(row, field.lstrip('-')) for field in ordering]
+    return key_func
+
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=20, key_func=None):
+    """
+    Return a KeysetPage of ``queryset`` for ``ordering``.
+
+    ``key_func`` turns a row into its sort-key list; by default attributes
+    named after the ordering fields are read. Raises InvalidCursor for a
+    cursor that does not match the ordering.
+    """
+    direction, values, queryset = _keyset_queryset(queryset, ordering, cursor)
+    rows = list(queryset[:page_size + 1])
+    return _keyset_page(rows, direction, values, page_size, key_func or _default_key_func(ordering))
+
+
+async def apaginate_keyset(queryset, ordering, cursor=None, page_size=20, key_func=None):
+    """Async version of paginate_keyset for async views"""
+    direction, values, queryset = _keyset_queryset(queryset, ordering, cursor)
+    rows = [row async for row in queryset[:page_size + 1]]
+    return _keyset_page(rows, direction, values, page_size, key_func or _default_key_func(ordering))
@@ -0,0 +1,177 @@
+# Liew Qian Hui 22063182
+"""
+Read/write database routing with read-your-writes stickiness.
+
+Writes always go to the primary (``default``). Reads go to one of the
+``DRIS_DB_REPLICAS`` aliases, but only while ReplicaRoutingMiddleware is
+handling a GET or HEAD request. Everything else reads from the primary:
+other requests, write views, transactions, management commands and
+sessions. A request that writes sets a cookie that keeps the same browser
+on the primary for ``DRIS_REPLICA_STICKY_SECONDS``. So a citizen who has
+just submitted an aid request sees it in "My aid requests" straight away,
+before the replicas have caught up.
+
+The ``replica`` alias in settings is a file copy of the primary, refreshed
+by ``manage.py sync_replica``. Under tests it mirrors the test database.
+Each sync bumps the replica's generation in the cache, and the data
+versions seen by a replica-routed request carry it (see page_cache), so
+pages and validators built from a copy are never reused once a newer copy
+is synced. The sync runs in its own process, so replicas need a cache
+shared by every worker (DRIS_SHARED_CACHE).
+"""
+import contextvars
+import random
+import sqlite3
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'dris_primary_until'
+REPLICA_METHODS = ('GET', 'HEAD')
+PRIMARY_ONLY_APPS = {'sessions'}  # a session is read right after it is written, on login
+GENERATION_KEY = 'dris:replica_generation:{}'
+
+
+class _RequestRouting:
+    """Where the current request reads from, and whether it has written"""
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.wrote = False
+
+
+_routing = contextvars.ContextVar('dris_request_routing', default=None)
+
+
+def replica_aliases():
+    replicas = [alias for alias in getattr(settings, 'DRIS_DB_REPLICAS', []) if alias in settings.DATABASES]
+    if replicas and not getattr(settings, 'DRIS_SHARED_CACHE', False):
+        raise ImproperlyConfigured('DRIS_DB_REPLICAS requires a cache shared by every worker (DRIS_SHARED_CACHE).')
+    return replicas
+
+
+def replica_generation(alias):
+    """Sync generation of a replica; it changes whenever the replica is synced"""
+    key = GENERATION_KEY.format(alias)
+    generation = cache.get(key)
+    if generation is None:
+        # Start from a timestamp, so a generation lost to eviction is never reused
+        cache.add(key, int(time.time() * 1000), None)
+        generation = cache.get(key)
+    return generation
+
+
+def read_source():
+    """Where the current request reads from: None for the primary, else the replica alias and its generation"""
+    routing = _routing.get()
+    if routing is None or routing.replica is None or routing.wrote:
+        return None
+    return f'{routing.replica}.{replica_generation(routing.replica)}'
+
+
+def use_primary():
+    """Read from the primary for the rest of the current request, e.g. before writing what is read"""
+    routing = _routing.get()
+    if routing is not None:
+        routing.replica = None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if (routing is None or routing.replica is None or routing.wrote
+                or model._meta.app_label in PRIMARY_ONLY_APPS or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # every alias holds the same data
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS  # replicas are copies of the migrated primary
+
+
+class ReplicaRoutingMiddleware:
+    """Let GET requests read from a replica unless the browser wrote recently; mark browsers that write"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        routing = self.routing_for(request)
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.mark_writer(response, routing)
+
+    async def __acall__(self, request):
+        # The context, and so the routing, is carried into sync_to_async threads of the async ORM
+        routing = self.routing_for(request)
+        token = _routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.mark_writer(response, routing)
+
+    def routing_for(self, request):
+        replicas = replica_aliases()
+        replica = None
+        if replicas and request.method in REPLICA_METHODS and not self.is_sticky(request):
+            replica = random.choice(replicas)  # one per request, so a page never mixes replicas
+        return _RequestRouting(replica)
+
+    def mark_writer(self, response, routing):
+        if routing.wrote and replica_aliases():
+            seconds = getattr(settings, 'DRIS_REPLICA_STICKY_SECONDS', 30)
+            response.set_cookie(STICKY_COOKIE, str(int(time.time() + seconds)), max_age=seconds,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def is_sticky(self, request):
+        try:
+            return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+
+def sync_replica(alias):
+    """
+    Copy the primary into a file-based SQLite replica with SQLite's online
+    backup API, which gives a consistent snapshot while writes go on. Pages
+    cached from the old copy are no longer addressed afterwards.
+    """
+    target = connections[alias].settings_dict
+    if not target['ENGINE'].endswith('sqlite3') or not connections[DEFAULT_DB_ALIAS].vendor == 'sqlite':
+        raise ValueError(f'Only SQLite replicas of an SQLite primary can be synced; "{alias}" is not one.')
+    primary = connections[DEFAULT_DB_ALIAS]
+    primary.ensure_connection()
+    connections[alias].close()
+    destination = sqlite3.connect(target['NAME'])
+    try:
+        primary.connection.backup(destination)
+    finally:
+        destination.close()
+    try:
+        cache.incr(GENERATION_KEY.format(alias))
+    except ValueError:
+        replica_generation(alias)
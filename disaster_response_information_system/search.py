@@ -0,0 +1,160 @@
+# Liew Qian Hui 22063182
+"""
+Full-text search over report, aid request and shelter text fields.
+
+On SQLite the text columns are mirrored into external-content FTS5 tables
+kept in sync by triggers, so searches are ranked (bm25) token lookups with
+prefix matching instead of leading-wildcard LIKE scans. Other databases fall
+back to LikeSearchBackend until a native backend is configured through
+``DRIS_SEARCH_BACKEND``.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import DisasterReport, AidRequest, Shelter
+
+# model -> (FTS table, indexed columns)
+SEARCH_INDEXES = {
+    DisasterReport: ('dris_report_fts', ('location', 'description')),
+    AidRequest: ('dris_aid_request_fts', ('location', 'description')),
+    Shelter: ('dris_shelter_fts', ('name', 'address')),
+}
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(query):
+    """Split user input into lowercase word tokens"""
+    return [term.lower() for term in TOKEN_RE.findall(query or '')]
+
+
+class BaseSearchBackend:
+    """Interface for search backends"""
+
+    def match(self, model, query, fields=None):
+        """Q object restricting ``model`` rows to those matching every term of ``query``"""
+        raise NotImplementedError
+
+    def ranked_ids(self, model, query, fields=None, limit=20, queryset=None):
+        """
+        Primary keys of the best matches for ``query``, best first, among the
+        rows of ``queryset`` (all rows of ``model`` by default)
+        """
+        raise NotImplementedError
+
+    def install(self, using='default'):
+        """Create or repair any database objects the backend needs"""
+
+
+class LikeSearchBackend(BaseSearchBackend):
+    """Portable fallback: every term must appear in one of the fields"""
+
+    def match(self, model, query, fields=None):
+        fields = fields or SEARCH_INDEXES[model][1]
+        condition = Q()
+        for term in search_terms(query):
+            term_condition = Q()
+            for field in fields:
+                term_condition |= Q(**{f'{field}__icontains': term})
+            condition &= term_condition
+        return condition
+
+    def ranked_ids(self, model, query, fields=None, limit=20, queryset=None):
+        queryset = model.objects.all() if queryset is None else queryset
+        return list(
+            queryset.filter(self.match(model, query, fields)).order_by('-pk').values_list('pk', flat=True)[:limit]
+        )
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """SQLite FTS5 external-content tables maintained by triggers"""
+
+    def match_expression(self, model, query, fields=None):
+        """Build an FTS5 query: every term as a quoted prefix, optionally column-scoped"""
+        terms = search_terms(query)
+        if not terms:
+            return None
+        expression = ' AND '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        if fields:
+            expression = '{%s} : (%s)' % (' '.join(fields), expression)
+        return expression
+
+    def match(self, model, query, fields=None):
+        expression = self.match_expression(model, query, fields)
+        if expression is None:
+            return Q()
+        table = SEARCH_INDEXES[model][0]
+        return Q(pk__in=RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [expression]))
+
+    def ranked_ids(self, model, query, fields=None, limit=20, queryset=None):
+        expression = self.match_expression(model, query, fields)
+        if expression is None:
+            return []
+        table = SEARCH_INDEXES[model][0]
+        queryset = model.objects.all() if queryset is None else queryset
+        # Restrict in the ranking query itself, so the limit counts only visible rows
+        restriction, params = '', []
+        if queryset.query.where:
+            sql, params = queryset.order_by().values('pk').query.sql_with_params()
+            restriction = f' AND rowid IN ({sql})'
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {table} WHERE {table} MATCH %s{restriction} ORDER BY bm25({table}) LIMIT %s',
+                [expression, *params, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def install(self, using='default'):
+        """Create missing FTS tables and triggers, rebuilding any index that was out of sync"""
+        with connections[using].cursor() as cursor:
+            for model, (table, columns) in SEARCH_INDEXES.items():
+                source = model._meta.db_table
+                cols = ', '.join(columns)
+                new_cols = ', '.join(f'new.{column}' for column in columns)
+                old_cols = ', '.join(f'old.{column}' for column in columns)
+                triggers = {
+                    f'{table}_ai': f'AFTER INSERT ON {source} BEGIN '
+                                   f'INSERT INTO {table}(rowid, {cols}) VALUES (new.id, {new_cols}); END',
+                    f'{table}_ad': f'AFTER DELETE ON {source} BEGIN '
+                                   f"INSERT INTO {table}({table}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END",
+                    f'{table}_au': f'AFTER UPDATE OF {cols} ON {source} BEGIN '
+                                   f"INSERT INTO {table}({table}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+                                   f'INSERT INTO {table}(rowid, {cols}) VALUES (new.id, {new_cols}); END',
+                }
+
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name IN (%s)"
+                    % ', '.join(['%s'] * (len(triggers) + 1)),
+                    [table, *triggers],
+                )
+                existing = {row[0] for row in cursor.fetchall()}
+                if existing == {table, *triggers}:
+                    continue
+
+                # Table remakes during migrations drop triggers; recreate and resync
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5({cols}, '
+                    f"content='{source}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+                )
+                for name, body in triggers.items():
+                    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+                cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+
+
+def get_search_backend():
+    backend_path = getattr(settings, 'DRIS_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    if connection.vendor == 'sqlite':
+        return SQLiteFTSBackend()
+    return LikeSearchBackend()
+
+
+def text_search(queryset, query, fields=None):
+    """Filter ``queryset`` to rows matching ``query`` in its model's search index"""
+    return queryset.filter(get_search_backend().match(queryset.model, query, fields))
@@ -0,0 +1,121 @@
+# Liew Qian Hui 22063182
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, post_migrate, m2m_changed
+from django.dispatch import receiver
+
+from .models import User, DisasterReport, AidRequest, VolunteerProfile, Shelter, Skill, VolunteerAssignment
+from .stats import invalidate_dashboard_stats
+from .search import get_search_backend
+from .tiles import TILE_FIELDS, report_contribution, instance_contribution, apply_tile_changes
+from .triage import score_aid_requests, rescore_requests_near
+from .backends import forget_cached_user
+from .page_cache import (
+    REPORT_DATA, SHELTER_DATA, AID_REQUEST_DATA, VOLUNTEER_DATA, ASSIGNMENT_DATA, USER_DATA, bump_data_version,
+)
+
+
+@receiver([post_save, post_delete], sender=DisasterReport)
+@receiver([post_save, post_delete], sender=AidRequest)
+@receiver([post_save, post_delete], sender=VolunteerProfile)
+def dashboard_stats_changed(sender, **kwargs):
+    """Drop cached dashboard counters once the write is committed"""
+    transaction.on_commit(invalidate_dashboard_stats)
+
+
+def _touches_tiles(update_fields):
+    return update_fields is None or not set(update_fields).isdisjoint(TILE_FIELDS)
+
+
+@receiver(pre_save, sender=DisasterReport)
+def load_report_tile_contribution(sender, instance, update_fields=None, **kwargs):
+    """Remember what the stored report adds to the map tiles before it changes"""
+    instance._stored_tile_contribution = None
+    if instance._state.adding or not _touches_tiles(update_fields):
+        return
+    stored = sender.objects.filter(pk=instance.pk).values(*TILE_FIELDS).first()
+    if stored is not None:
+        instance._stored_tile_contribution = report_contribution(stored)
+
+
+def _report_contribution_changed(removed, added):
+    apply_tile_changes(removed=removed, added=added)
+    # Pending aid requests near the report weigh its severity in their triage
+    rescore_requests_near([
+        (contribution.latitude, contribution.longitude)
+        for contribution in removed + added if contribution is not None
+    ])
+
+
+@receiver(post_save, sender=DisasterReport)
+def update_report_tiles(sender, instance, update_fields=None, **kwargs):
+    """Move the report's contribution between map tiles and rescore aid requests near it"""
+    if not _touches_tiles(update_fields):
+        return
+    stored = getattr(instance, '_stored_tile_contribution', None)
+    current = instance_contribution(instance)
+    if stored != current:
+        _report_contribution_changed([stored], [current])
+
+
+@receiver(post_delete, sender=DisasterReport)
+def remove_report_from_tiles(sender, instance, **kwargs):
+    contribution = instance_contribution(instance)
+    if contribution is not None:
+        _report_contribution_changed([contribution], [])
+
+
+@receiver(pre_save, sender=AidRequest)
+def score_aid_request(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Refresh the triage key of a request saved in full while pending"""
+    if instance.status == 'pending' and update_fields is None and not raw:
+        score_aid_requests([instance])
+
+
+# model -> data set whose version counter moves when the model changes
+MODEL_DATA = {
+    DisasterReport: REPORT_DATA,
+    Shelter: SHELTER_DATA,
+    AidRequest: AID_REQUEST_DATA,
+    VolunteerProfile: VOLUNTEER_DATA,
+    VolunteerProfile.skills.through: VOLUNTEER_DATA,
+    Skill: VOLUNTEER_DATA,
+    VolunteerAssignment: ASSIGNMENT_DATA,
+    User: USER_DATA,
+}
+
+
+@receiver([post_save, post_delete])
+@receiver(m2m_changed, sender=VolunteerProfile.skills.through)
+def data_changed(sender, update_fields=None, **kwargs):
+    """Bump the data version of a changed model once the write is committed"""
+    data_name = MODEL_DATA.get(sender)
+    if data_name is None or kwargs.get('action', 'post_').startswith('pre_'):
+        return
+    if sender is User and update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    transaction.on_commit(lambda: bump_data_version(data_name))
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_stats_changed(sender, update_fields=None, **kwargs):
+    """Drop cached dashboard counters unless only the login timestamp changed"""
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    transaction.on_commit(invalidate_dashboard_stats)
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    """
+    Drop the cached request user now and again after the commit, so a request
+    racing the write cannot cache the old row for the rest of the timeout
+    """
+    forget_cached_user(instance.pk)
+    transaction.on_commit(lambda: forget_cached_user(instance.pk))
+
+
+@receiver(post_migrate)
+def install_search_indexes(sender, using='default', **kwargs):
+    """Create or repair the full-text search tables after this app migrates"""
+    if sender.name == 'disaster_response_information_system':
+        get_search_backend().install(using=using)
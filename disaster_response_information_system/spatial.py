@@ -0,0 +1,279 @@
+# Liew Qian Hui 22063182
+"""
+Geohash grid index and spatial queries for models with latitude/longitude.
+
+Each geo-located model stores a fixed-precision geohash next to its
+coordinates. Because geohashes sort by their prefix, every grid cell maps to
+a contiguous range of that indexed column, so radius and bounding-box
+lookups only read the rows in the handful of cells that cover the area.
+"""
+import math
+
+import numpy as np
+from django.db import models
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # roughly 5m x 5m cells
+MAX_COVERING_CELLS = 24  # upper bound on cells OR-ed together in one query
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+
+def _cell_bits(precision):
+    """Return (lat_bits, lon_bits) of a geohash with the given precision"""
+    total = precision * 5
+    return total // 2, total - total // 2
+
+
+def _cell_size(precision):
+    """Return (height, width) in degrees of one cell at the given precision"""
+    lat_bits, lon_bits = _cell_bits(precision)
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def _grid_index(lat, lon, precision):
+    """Return the integer (row, column) of the cell containing a point"""
+    lat_bits, lon_bits = _cell_bits(precision)
+    height, width = _cell_size(precision)
+    row = min(int((float(lat) + 90.0) / height), (1 << lat_bits) - 1)
+    col = min(int((float(lon) + 180.0) / width), (1 << lon_bits) - 1)
+    return max(row, 0), max(col, 0)
+
+
+def _encode_cell(row, col, precision):
+    """Interleave row/column bits (longitude first) into a geohash string"""
+    lat_bits, lon_bits = _cell_bits(precision)
+    value = 0
+    for i in range(precision * 5):
+        if i % 2 == 0:
+            lon_bits -= 1
+            bit = (col >> lon_bits) & 1
+        else:
+            lat_bits -= 1
+            bit = (row >> lat_bits) & 1
+        value = (value << 1) | bit
+
+    chars = []
+    for shift in range((precision - 1) * 5, -1, -5):
+        chars.append(GEOHASH_ALPHABET[(value >> shift) & 31])
+    return ''.join(chars)
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encode a coordinate pair as a geohash string"""
+    row, col = _grid_index(latitude, longitude, precision)
+    return _encode_cell(row, col, precision)
+
+
+def geohash_bounds(geohash):
+    """Return the (min_lat, min_lon, max_lat, max_lon) box of a geohash cell"""
+    precision = len(geohash)
+    row = col = 0
+    i = 0
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if i % 2 == 0:
+                col = (col << 1) | bit
+            else:
+                row = (row << 1) | bit
+            i += 1
+    height, width = _cell_size(precision)
+    min_lat = row * height - 90.0
+    min_lon = col * width - 180.0
+    return min_lat, min_lon, min_lat + height, min_lon + width
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometres between two points"""
+    lat1, lon1, lat2, lon2 = map(math.radians, map(float, (lat1, lon1, lat2, lon2)))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_km_array(latitude, longitude, latitudes, longitudes):
+    """Vectorised great-circle distances from one point to arrays of points"""
+    lat1 = math.radians(float(latitude))
+    lon1 = math.radians(float(longitude))
+    lat2 = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon2 = np.radians(np.asarray(longitudes, dtype=np.float64))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def haversine_km_matrix(latitudes1, longitudes1, latitudes2, longitudes2):
+    """Pairwise great-circle distances, shaped (len(points1), len(points2))"""
+    lat1 = np.radians(np.asarray(latitudes1, dtype=np.float64))[:, np.newaxis]
+    lon1 = np.radians(np.asarray(longitudes1, dtype=np.float64))[:, np.newaxis]
+    lat2 = np.radians(np.asarray(latitudes2, dtype=np.float64))[np.newaxis, :]
+    lon2 = np.radians(np.asarray(longitudes2, dtype=np.float64))[np.newaxis, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def parse_coordinates(latitude, longitude):
+    """Return a valid (lat, lon) float pair from user input, or None"""
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    """
+    Return the (min_lat, min_lon, max_lat, max_lon) box enclosing a circle.
+    A circle over the antimeridian gives a box with min_lon > max_lon.
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = math.cos(math.radians(latitude))
+    if cos_lat < 1e-6 or abs(latitude) + lat_delta >= 90:
+        lon_delta = 180.0
+    else:
+        lon_delta = min(180.0, radius_km / (KM_PER_DEGREE_LAT * cos_lat))
+    if lon_delta >= 180.0:
+        min_lon, max_lon = -180.0, 180.0
+    else:
+        min_lon, max_lon = longitude - lon_delta, longitude + lon_delta
+        if min_lon < -180.0:
+            min_lon += 360.0
+        elif max_lon > 180.0:
+            max_lon -= 360.0
+    return (
+        max(-90.0, latitude - lat_delta),
+        min_lon,
+        min(90.0, latitude + lat_delta),
+        max_lon,
+    )
+
+
+def split_bbox(min_lat, min_lon, max_lat, max_lon):
+    """Boxes not crossing the antimeridian that together make up the given one"""
+    if float(min_lon) > float(max_lon):
+        return [(min_lat, min_lon, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon)]
+    return [(min_lat, min_lon, max_lat, max_lon)]
+
+
+def covering_precision(min_lat, min_lon, max_lat, max_lon, max_cells=MAX_COVERING_CELLS):
+    """
+    Return the finest geohash precision whose grid covers a bounding box with
+    at most ``max_cells`` cells, or 0 if even precision 1 needs more.
+    """
+    min_lat, min_lon, max_lat, max_lon = map(float, (min_lat, min_lon, max_lat, max_lon))
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        top, left = _grid_index(max_lat, min_lon, precision)
+        bottom, right = _grid_index(min_lat, max_lon, precision)
+        if (top - bottom + 1) * (right - left + 1) <= max_cells:
+            return precision
+    return 0
+
+
+def covering_cells(min_lat, min_lon, max_lat, max_lon, max_cells=MAX_COVERING_CELLS):
+    """
+    Return the geohash prefixes of the finest grid that covers a bounding box
+    with at most ``max_cells`` cells.
+    """
+    precision = covering_precision(min_lat, min_lon, max_lat, max_lon, max_cells)
+    if not precision:
+        # The whole world is wider than max_cells at precision 1; no prefix needed
+        return ['']
+    top, left = _grid_index(max_lat, min_lon, precision)
+    bottom, right = _grid_index(min_lat, max_lon, precision)
+    return [
+        _encode_cell(row, col, precision)
+        for row in range(bottom, top + 1)
+        for col in range(left, right + 1)
+    ]
+
+
+def haversine_expression(latitude, longitude, lat_field='latitude', lon_field='longitude'):
+    """Database expression for the distance in kilometres to a fixed point"""
+    lat = math.radians(float(latitude))
+    lon = math.radians(float(longitude))
+    dlat = Radians(F(lat_field), output_field=FloatField()) - lat
+    dlon = Radians(F(lon_field), output_field=FloatField()) - lon
+    a = (
+        Power(Sin(dlat / 2), 2)
+        + math.cos(lat) * Cos(Radians(F(lat_field), output_field=FloatField())) * Power(Sin(dlon / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a), output_field=FloatField())
+
+
+def bbox_filter(min_lat, min_lon, max_lat, max_lon, cell_filters=None):
+    """
+    Q object matching rows with a geohash and coordinates inside the box,
+    which crosses the antimeridian when min_lon > max_lon.
+
+    ``cell_filters`` are equality lookups repeated inside every cell range,
+    so an index on those columns followed by geohash serves each range.
+    """
+    cell_filters = cell_filters or {}
+    condition = Q()
+    for min_lat, min_lon, max_lat, max_lon in split_bbox(min_lat, min_lon, max_lat, max_lon):
+        cell_filter = Q()
+        for cell in covering_cells(min_lat, min_lon, max_lat, max_lon):
+            if not cell:
+                cell_filter = Q(**cell_filters)
+                break
+            # '~' sorts after every geohash character, closing the prefix range
+            cell_filter |= Q(geohash__gte=cell, geohash__lt=cell + '~', **cell_filters)
+        condition |= cell_filter & Q(
+            latitude__gte=min_lat,
+            latitude__lte=max_lat,
+            longitude__gte=min_lon,
+            longitude__lte=max_lon,
+        )
+    return condition
+
+
+class SpatialQuerySet(models.QuerySet):
+    """QuerySet with geohash-indexed bounding-box and radius lookups"""
+
+    def within_bbox(self, min_lat, min_lon, max_lat, max_lon, cell_filters=None):
+        """Rows whose coordinates fall inside the bounding box (over the antimeridian if min_lon > max_lon)"""
+        return self.filter(bbox_filter(min_lat, min_lon, max_lat, max_lon, cell_filters))
+
+    def with_distance(self, latitude, longitude):
+        """Annotate ``distance_km`` from the given point"""
+        return self.annotate(distance_km=haversine_expression(latitude, longitude))
+
+    def within_radius(self, latitude, longitude, radius_km, cell_filters=None):
+        """Rows within ``radius_km`` of the point, annotated with ``distance_km``"""
+        return self.within_bbox(*radius_bbox(latitude, longitude, radius_km), cell_filters).with_distance(
+            latitude, longitude
+        ).filter(distance_km__lte=radius_km)
+
+    def nearest(self, latitude, longitude, radius_km, cell_filters=None):
+        """Rows within ``radius_km`` of the point, closest first"""
+        return self.within_radius(latitude, longitude, radius_km, cell_filters).order_by('distance_km')
+
+
+class GeoLocatedModel(models.Model):
+    """Abstract base keeping a geohash cell in step with latitude/longitude"""
+    geohash = models.CharField(max_length=GEOHASH_PRECISION, blank=True, editable=False, db_index=True)
+
+    objects = SpatialQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def refresh_geohash(self):
+        """Recompute the geohash; call before bulk_create/bulk_update"""
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode_geohash(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+
+    def save(self, *args, **kwargs):
+        self.refresh_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
@@ -0,0 +1,52 @@
+# Liew Qian Hui 22063182
+"""
+Cached counters for the authority dashboard.
+
+Each table is aggregated once with conditional counts, and the result is
+kept in the cache until a model signal reports a write to one of the
+counted tables. The counts come from the primary, so a lagging replica's
+figures are never cached.
+"""
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count, Q
+
+from .models import User, DisasterReport, AidRequest, VolunteerProfile
+
+DASHBOARD_STATS_CACHE_KEY = 'dris:dashboard_stats'
+DASHBOARD_STATS_TIMEOUT = 300  # seconds; signals normally invalidate much sooner
+
+
+def compute_dashboard_stats():
+    """Count dashboard statistics with one aggregate query per table"""
+    reports = DisasterReport.objects.using(DEFAULT_DB_ALIAS).aggregate(
+        total_reports=Count('id'),
+        active_reports=Count('id', filter=Q(is_active=True)),
+    )
+    aid_requests = AidRequest.objects.using(DEFAULT_DB_ALIAS).aggregate(
+        total_aid_requests=Count('id'),
+        pending_aid_requests=Count('id', filter=Q(status='pending')),
+    )
+    users = User.objects.using(DEFAULT_DB_ALIAS).aggregate(
+        volunteers_count=Count('id', filter=Q(user_role='volunteer')),
+    )
+    volunteers = VolunteerProfile.objects.using(DEFAULT_DB_ALIAS).aggregate(
+        available_volunteers=Count('id', filter=Q(availability='available')),
+    )
+
+    stats = {**reports, **aid_requests, **users, **volunteers}
+    stats['inactive_reports'] = stats['total_reports'] - stats['active_reports']
+    return stats
+
+
+def get_dashboard_stats():
+    """Return the dashboard statistics, computing them on a cache miss"""
+    stats = cache.get(DASHBOARD_STATS_CACHE_KEY)
+    if stats is None:
+        stats = compute_dashboard_stats()
+        cache.set(DASHBOARD_STATS_CACHE_KEY, stats, DASHBOARD_STATS_TIMEOUT)
+    return stats
+
+
+def invalidate_dashboard_stats():
+    cache.delete(DASHBOARD_STATS_CACHE_KEY)
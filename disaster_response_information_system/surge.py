@@ -0,0 +1,486 @@
+# Liew Qian Hui 22063182
+"""
+Replay of timestamped incident-surge event logs against the site.
+
+A log is NDJSON: a header line with the accounts and shelters the scenario
+needs, then one event per line in time order, e.g.
+``{"t": 12.5, "actor": "citizen:12", "action": "report_create", "ref": "R17",
+"data": {...}}``. Every actor keeps its own session and its events run in
+order, while different actors run concurrently on a fixed pool of workers.
+Each event is sent ``t / speedup`` seconds into the run, through Django's
+test client in this process or over HTTP to a locally started server that
+uses the same database.
+
+Results are kept per action: throughput, error rate, latency percentiles,
+lag behind the schedule when every worker is busy, and the server's
+database time and write-statement time as measured by
+QueryMetricsMiddleware. SQLite lets one writer in at a time, so under a
+surge the write-statement time is mostly spent waiting for the lock.
+
+``multi_state_flood`` builds the bundled scenario: a monsoon flood moving
+through Kelantan, Terengganu, Pahang and Selangor within one hour.
+"""
+import http.cookiejar
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import Client
+from django.urls import reverse
+
+from .models import User, DisasterReport, AidRequest, Shelter
+from .synthetic import HOTSPOTS, DESCRIPTIONS, AID_DESCRIPTIONS, FIRST_NAMES, LAST_NAMES, DEFAULT_PASSWORD, generate_dataset
+
+# (state, hotspot, wave start, peak and end as fractions of the scenario, share of citizens)
+FLOOD_WAVES = [
+    ('Kelantan', 'Kota Bharu', 0.0, 0.15, 0.55, 0.35),
+    ('Terengganu', 'Kuala Terengganu', 0.1, 0.3, 0.7, 0.25),
+    ('Pahang', 'Kuantan', 0.25, 0.5, 0.9, 0.2),
+    ('Selangor', 'Shah Alam', 0.4, 0.7, 1.0, 0.2),
+]
+NEW_CITIZEN_SHARE = 0.3  # citizens who register during the surge rather than log in
+DASHBOARD_INTERVAL = 30  # mean seconds between an authority's dashboard loads
+
+# action -> statuses of a successful response
+EXPECTED_STATUSES = {
+    'register': {302}, 'login': {302}, 'report_create': {302}, 'aid_request_create': {302},
+    'verify_report': {302}, 'approve_aid_request': {302}, 'assign_volunteer': {302}, 'shelter_edit': {302},
+    'shelter_occupancy': {200, 409},  # 409: the shelter is full or empty
+    'browse_reports': {200}, 'browse_shelters': {200}, 'dashboard': {200}, 'triage_queue': {200},
+    'my_assignments': {200},
+}
+
+
+def multi_state_flood(seed=0, citizens=20000, duration=3600, authorities=40, volunteers=2000, shelters=300):
+    """Return ``(header, events)`` of the bundled flood scenario"""
+    rng = random.Random(seed)
+    hotspots = {hotspot[0]: hotspot for hotspot in HOTSPOTS}
+    events = []
+
+    def add(t, actor, action, **fields):
+        if t <= duration:
+            events.append({'t': round(t, 3), 'actor': actor, 'action': action, **fields})
+
+    def point(hotspot):
+        _, latitude, longitude, spread, _, _ = hotspots[hotspot]
+        return round(latitude + rng.gauss(0, spread), 6), round(longitude + rng.gauss(0, spread), 6)
+
+    existing = new = 0
+    reports, aid_requests = [], []
+    for state, hotspot, start, peak, end, share in FLOOD_WAVES:
+        for _ in range(round(citizens * share)):
+            t = rng.triangular(start, end, peak) * duration
+            if rng.random() < NEW_CITIZEN_SHARE:
+                actor = f'new:{new}'
+                new += 1
+                add(t, actor, 'register', data={
+                    'first_name': rng.choice(FIRST_NAMES), 'last_name': rng.choice(LAST_NAMES),
+                    'phone': f'01{rng.randint(0, 9)}-{rng.randint(1000000, 9999999)}', 'address': f'{hotspot}, {state}',
+                })
+            else:
+                actor = f'citizen:{existing}'
+                existing += 1
+                add(t, actor, 'login')
+            if rng.random() < 0.5:
+                add(t + rng.uniform(1, 120), actor, 'browse_reports', query={'disaster_type': 'flood'})
+            if rng.random() < 0.6:
+                latitude, longitude = point(hotspot)
+                report_t = t + rng.expovariate(1 / 60)
+                ref = f'R{len(reports)}'
+                add(report_t, actor, 'report_create', ref=ref, data={
+                    'disaster_type': 'flood', 'severity': rng.choices([1, 2, 3, 4], [20, 35, 30, 15])[0],
+                    'location': f'Kampung {rng.randint(1, 400)}, {hotspot}', 'latitude': latitude,
+                    'longitude': longitude, 'description': rng.choice(DESCRIPTIONS['flood']),
+                })
+                if report_t <= duration:
+                    reports.append((report_t, ref, actor))
+            if rng.random() < 0.45:
+                latitude, longitude = point(hotspot)
+                aid_t = t + rng.expovariate(1 / 120)
+                aid_type = rng.choices(['food', 'shelter', 'rescue', 'medical'], [35, 30, 20, 15])[0]
+                ref = f'A{len(aid_requests)}'
+                add(aid_t, actor, 'aid_request_create', ref=ref, data={
+                    'aid_type': aid_type, 'description': AID_DESCRIPTIONS[aid_type],
+                    'location': f'Kampung {rng.randint(1, 400)}, {hotspot}', 'latitude': latitude,
+                    'longitude': longitude, 'num_people': max(1, int(rng.lognormvariate(1.2, 0.8))),
+                })
+                if aid_t <= duration:
+                    aid_requests.append((aid_t, ref, actor))
+            if rng.random() < 0.3:
+                add(t + rng.uniform(60, 600), actor, 'browse_shelters')
+
+    for number in range(authorities):
+        actor = f'authority:{number}'
+        t = rng.uniform(0, 30)
+        add(t, actor, 'login')
+        while t < duration:
+            t += rng.expovariate(1 / DASHBOARD_INTERVAL)
+            action = rng.choices(['dashboard', 'triage_queue', 'shelter_edit', 'shelter_occupancy'], [5, 3, 1, 3])[0]
+            if action == 'shelter_edit':
+                add(t, actor, action, shelter=rng.randrange(shelters))
+            elif action == 'shelter_occupancy':
+                add(t, actor, action, shelter=rng.randrange(shelters), delta=rng.choice([-1, 1]) * rng.randint(1, 20))
+            else:
+                add(t, actor, action)
+    # Authorities verify half the reports, and approve and staff aid requests, minutes after they arrive
+    for report_t, ref, owner in reports:
+        if rng.random() < 0.5:
+            add(report_t + rng.uniform(60, 600), f'authority:{rng.randrange(authorities)}', 'verify_report',
+                target=ref, owner=owner)
+    for aid_t, ref, owner in aid_requests:
+        if rng.random() < 0.6:
+            actor = f'authority:{rng.randrange(authorities)}'
+            approve_t = aid_t + rng.uniform(60, 900)
+            add(approve_t, actor, 'approve_aid_request', target=ref, owner=owner)
+            if rng.random() < 0.5:
+                add(approve_t + rng.uniform(30, 300), actor, 'assign_volunteer', target=ref, owner=owner,
+                    volunteer=rng.randrange(volunteers))
+    for number in rng.sample(range(volunteers), volunteers // 5):
+        actor = f'volunteer:{number}'
+        t = rng.uniform(0, duration / 2)
+        add(t, actor, 'login')
+        while t < duration:
+            t += rng.expovariate(1 / 300)
+            add(t, actor, 'my_assignments')
+
+    events.sort(key=lambda event: event['t'])
+    header = {
+        'scenario': 'multi_state_flood', 'seed': seed, 'duration': duration,
+        'setup': {'citizens': existing, 'volunteers': volunteers, 'authorities': authorities, 'shelters': shelters},
+    }
+    return header, events
+
+
+def write_log(path, header, events):
+    with open(path, 'w') as f:
+        for line in [header, *events]:
+            f.write(json.dumps(line, separators=(',', ':')) + '\n')
+
+
+def read_log(path):
+    with open(path) as f:
+        header = json.loads(f.readline())
+        return header, [json.loads(line) for line in f if line.strip()]
+
+
+def prepare_accounts(header, prefix, seed=0):
+    """Create the scenario's accounts and shelters; returns the shelter ids in scenario order"""
+    setup = header['setup']
+    generate_dataset(
+        seed=seed, prefix=prefix, reports=0, aid_requests=0, citizens=setup['citizens'],
+        volunteers=setup['volunteers'], authorities=setup['authorities'], shelters=setup['shelters'],
+    )
+    return list(Shelter.objects.order_by('-pk').values_list('pk', flat=True)[:setup['shelters']])[::-1]
+
+
+class ClientSession:
+    """One actor's session through the test client, in this process"""
+
+    def __init__(self, host):
+        self.client = Client(raise_request_exception=False, HTTP_HOST=host)
+
+    def request(self, method, path, data=None):
+        # Flash messages from redirects would otherwise pile up in the cookie
+        self.client.cookies.pop('messages', None)
+        response = self.client.post(path, data) if method == 'POST' else self.client.get(path, data)
+        metrics = getattr(response, 'perf_metrics', None) or {}
+        error = None
+        if getattr(response, 'exc_info', None):
+            exc = response.exc_info[1]
+            error = f'{type(exc).__name__}: {exc}'
+        return response.status_code, metrics.get('db_ms'), metrics.get('write_ms'), error
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    """One actor's session over HTTP, with its own cookies and CSRF token"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect())
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return None
+
+    def request(self, method, path, data=None):
+        if method == 'POST' and self.csrf_token() is None:
+            self.open('GET', reverse('login'))
+        if method == 'POST':
+            return self.open('POST', path, data, {'X-CSRFToken': self.csrf_token(), 'Referer': self.base_url + path})
+        return self.open('GET', path, data)
+
+    def open(self, method, path, data=None, headers=None):
+        url = self.base_url + path
+        body = None
+        if data and method == 'GET':
+            url += '?' + urllib.parse.urlencode(data)
+        elif data:
+            body = urllib.parse.urlencode(data).encode()
+        request = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+        try:
+            with self.opener.open(request, timeout=120) as response:
+                response.read()
+                status, response_headers = response.status, response.headers
+        except urllib.error.HTTPError as e:
+            e.read()
+            status, response_headers = e.code, e.headers
+        except OSError as e:
+            return None, None, None, f'{type(e).__name__}: {e}'
+        timing = _server_timing(response_headers.get('Server-Timing', ''))
+        return status, timing.get('db'), timing.get('write'), None
+
+
+def _server_timing(header):
+    durations = {}
+    for metric in header.split(','):
+        name, _, params = metric.strip().partition(';')
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'dur':
+                durations[name] = float(value)
+    return durations
+
+
+class _ActionStats:
+    def __init__(self):
+        self.latencies = []
+        self.lags = []
+        self.db_ms = []
+        self.write_ms = []
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.failed = 0
+        self.unresolved = 0
+
+
+def _percentile(values, percent):
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+class SurgeReplay:
+    """Drive a scenario's events against the site; see the module docstring"""
+
+    def __init__(self, header, events, prefix, shelter_ids, session_factory, speedup=1.0, concurrency=64,
+                 password=DEFAULT_PASSWORD):
+        self.header = header
+        self.events = events
+        self.prefix = prefix
+        self.shelter_ids = shelter_ids
+        self.open_shelter_ids = None  # the active ones, which take check-ins; loaded on first use
+        self.session_factory = session_factory
+        self.speedup = speedup
+        self.concurrency = concurrency
+        self.password = password
+        self.lock = threading.Lock()
+        self.pending = {}  # actor -> deque of (event, due time) waiting for its session
+        self.sessions = {}
+        self.stats = defaultdict(_ActionStats)
+        self.ids = {}  # scenario reference -> database id
+        self.unsubmitted = {event['ref'] for event in events if 'ref' in event}
+        self.waiting = defaultdict(list)  # scenario reference -> actors whose next event acts on it
+        self.remaining = len(events)
+        self.finished = threading.Event()
+
+    def username(self, actor):
+        role, number = actor.split(':')
+        return f'{self.prefix}_{role}_{int(number):06d}'
+
+    def run(self):
+        """Replay every event; returns the results summary"""
+        self.start = time.perf_counter()
+        self.pool = ThreadPoolExecutor(max_workers=self.concurrency)
+        if not self.events:
+            self.finished.set()
+        for event in self.events:
+            due = self.start + event['t'] / self.speedup
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            with self.lock:
+                queue = self.pending.setdefault(event['actor'], deque())
+                queue.append((event, due))
+                if len(queue) > 1:
+                    continue  # the actor's earlier events are running or waiting
+            self.pool.submit(self.drain, event['actor'])
+        self.finished.wait()
+        self.pool.shutdown()
+        return self.summary(time.perf_counter() - self.start)
+
+    def drain(self, actor):
+        """Run an actor's queued events one after another"""
+        session = self.sessions.get(actor) or self.sessions.setdefault(actor, self.session_factory())
+        while True:
+            with self.lock:
+                event, due = self.pending[actor][0]
+                if event.get('target') in self.unsubmitted:
+                    # Behind schedule, the request creating the target is still queued or running; the
+                    # actor is resumed once it finishes rather than holding a worker meanwhile
+                    self.waiting[event['target']].append(actor)
+                    return
+            try:
+                self.execute(session, event, due)
+            except Exception as e:
+                with self.lock:
+                    stats = self.stats[event['action']]
+                    stats.failed += 1
+                    stats.errors[f'{type(e).__name__}: {e}'] += 1
+            finally:
+                with self.lock:
+                    if 'ref' in event:
+                        self.unsubmitted.discard(event['ref'])
+                        for waiting_actor in self.waiting.pop(event['ref'], []):
+                            self.pool.submit(self.drain, waiting_actor)
+                    queue = self.pending[actor]
+                    queue.popleft()
+                    self.remaining -= 1
+                    if not self.remaining:
+                        self.finished.set()
+                    if not queue:
+                        del self.pending[actor]
+                        return
+
+    def resolve(self, model, event):
+        """Database id of the report or aid request an earlier event created"""
+        ref = event['target']
+        if ref not in self.ids:
+            owner_field = 'reporter__username' if model is DisasterReport else 'requester__username'
+            pk = model.objects.filter(
+                **{owner_field: self.username(event['owner'])}, description__endswith=f'[{ref}]'
+            ).values_list('pk', flat=True).first()
+            if pk is None:
+                return None
+            self.ids[ref] = pk
+        return self.ids[ref]
+
+    def user_id(self, username):
+        if username not in self.ids:
+            self.ids[username] = User.objects.filter(username=username).values_list('pk', flat=True).first()
+        return self.ids[username]
+
+    def build_request(self, event):
+        """``(method, path, data)`` for an event, or None when what it acts on does not exist yet"""
+        action = event['action']
+        username = self.username(event['actor'])
+        data = dict(event.get('data', {}))
+        if action == 'register':
+            data.update(username=username, email=f'{username}@example.com', user_role='citizen',
+                        password=self.password, confirm_password=self.password)
+            return 'POST', reverse('register'), data
+        if action == 'login':
+            return 'POST', reverse('login'), {'username': username, 'password': self.password}
+        if action in ('report_create', 'aid_request_create'):
+            data['description'] = f'{data["description"]} [{event["ref"]}]'
+            return 'POST', reverse('disaster_report_create' if action == 'report_create' else 'aid_request_create'), data
+        if action == 'browse_reports':
+            return 'GET', reverse('disaster_reports'), event.get('query')
+        if action == 'browse_shelters':
+            return 'GET', reverse('shelters'), None
+        if action == 'dashboard':
+            return 'GET', reverse('admin_dashboard'), {'aid_filter_status': 'pending'}
+        if action == 'triage_queue':
+            return 'GET', reverse('api_triage_queue'), None
+        if action == 'my_assignments':
+            return 'GET', reverse('my_assignments'), None
+        if action == 'shelter_edit':
+            shelter = Shelter.objects.get(pk=self.shelter_ids[event['shelter'] % len(self.shelter_ids)])
+            return 'POST', reverse('shelter_edit', args=[shelter.pk]), {
+                'name': shelter.name, 'address': shelter.address, 'latitude': shelter.latitude,
+                'longitude': shelter.longitude, 'capacity': shelter.capacity,
+                'contact_info': f'Duty officer {username}', 'is_active': 'on' if shelter.is_active else '',
+            }
+        if action == 'shelter_occupancy':
+            if self.open_shelter_ids is None:
+                self.open_shelter_ids = list(
+                    Shelter.objects.filter(pk__in=self.shelter_ids, is_active=True).order_by('pk').values_list('pk', flat=True)
+                )
+            if not self.open_shelter_ids:
+                return None
+            shelter_id = self.open_shelter_ids[event['shelter'] % len(self.open_shelter_ids)]
+            name = 'api_shelter_check_in' if event['delta'] > 0 else 'api_shelter_check_out'
+            return 'POST', reverse(name, args=[shelter_id]), {'count': abs(event['delta'])}
+        if action == 'verify_report':
+            report_id = self.resolve(DisasterReport, event)
+            return report_id and ('POST', reverse('update_disaster_status', args=[report_id]), {'action': 'activate'})
+        if action == 'approve_aid_request':
+            aid_request_id = self.resolve(AidRequest, event)
+            return aid_request_id and ('GET', reverse('update_aid_request_status', args=[aid_request_id, 'approved']), None)
+        if action == 'assign_volunteer':
+            aid_request_id = self.resolve(AidRequest, event)
+            volunteer_id = self.user_id(self.username(f'volunteer:{event["volunteer"]}'))
+            return aid_request_id and volunteer_id and ('POST', reverse('assign_volunteer_to_request'), {
+                'aid_request_id': aid_request_id, 'volunteer_id': volunteer_id, 'notes': 'Surge replay',
+            })
+        raise ValueError(f'Unknown action "{action}".')
+
+    def execute(self, session, event, due):
+        action = event['action']
+        stats = self.stats[action]
+        request = self.build_request(event)
+        if not request:
+            with self.lock:
+                stats.unresolved += 1
+            return
+        method, path, data = request
+        started = time.perf_counter()
+        status, db_ms, write_ms, error = session.request(method, path, data)
+        latency = time.perf_counter() - started
+        with self.lock:
+            stats.latencies.append(latency * 1000)
+            stats.lags.append(max(0.0, started - due) * 1000)
+            stats.statuses[status] += 1
+            if db_ms is not None:
+                stats.db_ms.append(db_ms)
+            if write_ms is not None:
+                stats.write_ms.append(write_ms)
+            if status not in EXPECTED_STATUSES[action]:
+                stats.failed += 1
+                stats.errors[error or f'HTTP {status}'] += 1
+
+    def summary(self, elapsed):
+        actions = {}
+        for action, stats in sorted(self.stats.items()):
+            count = len(stats.latencies)
+            actions[action] = {
+                'requests': count,
+                'failed': stats.failed,
+                'error_rate': stats.failed / count if count else 0.0,
+                'unresolved': stats.unresolved,
+                'throughput': count / elapsed,
+                'p50_ms': _percentile(stats.latencies, 50),
+                'p95_ms': _percentile(stats.latencies, 95),
+                'p99_ms': _percentile(stats.latencies, 99),
+                'lag_p95_ms': _percentile(stats.lags, 95),
+                'db_ms_mean': statistics.fmean(stats.db_ms) if stats.db_ms else None,
+                'lock_wait_ms_total': sum(stats.write_ms) if stats.write_ms else None,
+                'lock_wait_p95_ms': _percentile(stats.write_ms, 95),
+                'statuses': {str(status): total for status, total in stats.statuses.items()},
+                'errors': dict(stats.errors.most_common(5)),
+            }
+        total = sum(result['requests'] for result in actions.values())
+        failed = sum(result['failed'] for result in actions.values())
+        return {
+            'elapsed_s': elapsed,
+            'requests': total,
+            'throughput': total / elapsed,
+            'error_rate': failed / total if total else 0.0,
+            'actions': actions,
+        }
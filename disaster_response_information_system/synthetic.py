@@ -0,0 +1,310 @@
+# Liew Qian Hui 22063182
+"""
+Seeded synthetic datasets at disaster scale, for benchmarks and load tests.
+
+Every model is populated from one ``random.Random(seed)``: the same seed,
+sizes and ``now`` always produce the same rows, apart from ``updated_at``
+and, on a database that already has data, ids. Reports and aid requests
+cluster around flood, landslide and haze hotspots, and most arrive in short
+surges, as they do during a real disaster. Rows are built a batch at a time and written with
+bulk_create inside one transaction; derived data (map tiles, triage keys,
+dashboard counters, page versions) is rebuilt at the end, and the search
+index follows the inserts through its triggers.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    User, Incident, DisasterReport, Shelter, AidRequest, Skill, VolunteerProfile, VolunteerAssignment,
+)
+from .page_cache import REPORT_DATA, SHELTER_DATA, AID_REQUEST_DATA, VOLUNTEER_DATA, ASSIGNMENT_DATA, USER_DATA, bump_data_version
+from .stats import invalidate_dashboard_stats
+from .tiles import rebuild_report_tiles
+from .triage import rebuild_triage
+
+DEFAULT_SIZES = {
+    'citizens': 20000,
+    'volunteers': 10000,
+    'authorities': 50,
+    'shelters': 500,
+    'reports': 100000,
+    'aid_requests': 50000,
+}
+USERNAME_PREFIX = 'synthetic'
+DEFAULT_PASSWORD = 'dris-benchmark'
+BATCH_SIZE = 2000
+HISTORY_DAYS = 90
+SURGES_PER_HOTSPOT = 3
+SURGE_SHARE = 0.7  # share of reports and requests raised during a surge
+INCIDENT_CELL_PRECISION = 5
+
+# (name, latitude, longitude, spread in degrees, weight, disaster type weights)
+HOTSPOTS = [
+    ('Kota Bharu', 6.1254, 102.2381, 0.25, 14, {'flood': 8, 'landslide': 1, 'other': 1}),
+    ('Kuala Terengganu', 5.3302, 103.1408, 0.2, 10, {'flood': 8, 'landslide': 1, 'other': 1}),
+    ('Kuantan', 3.8077, 103.3260, 0.2, 9, {'flood': 7, 'haze': 1, 'other': 1}),
+    ('Shah Alam', 3.0738, 101.5183, 0.12, 12, {'flood': 6, 'haze': 2, 'other': 1}),
+    ('Kuala Lumpur', 3.1390, 101.6869, 0.1, 12, {'flood': 5, 'landslide': 2, 'haze': 2, 'other': 1}),
+    ('Cameron Highlands', 4.4718, 101.3767, 0.1, 6, {'landslide': 7, 'flood': 2, 'other': 1}),
+    ('George Town', 5.4141, 100.3288, 0.08, 7, {'landslide': 4, 'flood': 3, 'haze': 2, 'other': 1}),
+    ('Johor Bahru', 1.4927, 103.7414, 0.15, 9, {'haze': 6, 'flood': 3, 'other': 1}),
+    ('Kuching', 1.5535, 110.3593, 0.2, 8, {'flood': 5, 'haze': 4, 'other': 1}),
+    ('Kota Kinabalu', 5.9804, 116.0735, 0.2, 7, {'landslide': 5, 'flood': 4, 'other': 1}),
+]
+PLACE_WORDS = ['Jalan', 'Kampung', 'Taman', 'Lorong', 'Persiaran', 'Bandar', 'Sungai', 'Bukit']
+PLACE_NAMES = ['Merdeka', 'Indah', 'Baru', 'Sentosa', 'Harmoni', 'Jaya', 'Permai', 'Damai', 'Mutiara', 'Cempaka']
+DESCRIPTIONS = {
+    'flood': ['Water rising above knee level', 'Road submerged and impassable', 'Houses flooded after heavy rain',
+              'River burst its banks near the school', 'Flash flood trapping cars at the junction'],
+    'landslide': ['Slope collapsed onto the road', 'Mud and debris blocking the highway',
+                  'Cracks appearing on the hillside behind houses', 'Retaining wall gave way after rain'],
+    'haze': ['Visibility under 500 metres', 'Strong smell of smoke across the area',
+             'Air quality unhealthy, residents coughing', 'Schools closed because of haze'],
+    'other': ['Power lines down after the storm', 'Fallen trees blocking the road', 'Water supply cut off'],
+}
+AID_DESCRIPTIONS = {
+    'food': 'Family needs food and drinking water',
+    'shelter': 'Home flooded, need a place to stay',
+    'rescue': 'People trapped and need evacuation',
+    'medical': 'Elderly resident needs medical attention',
+    'other': 'Need help clearing debris',
+}
+FIRST_NAMES = ['Aisyah', 'Ahmad', 'Mei Ling', 'Wei Jie', 'Priya', 'Ravi', 'Nurul', 'Hafiz', 'Siew Lan', 'Kumar',
+               'Farah', 'Daniel', 'Li Hua', 'Arjun', 'Siti', 'Jason']
+LAST_NAMES = ['Abdullah', 'Tan', 'Lim', 'Wong', 'Raj', 'Ismail', 'Lee', 'Hassan', 'Chong', 'Muthu', 'Yusof', 'Ng']
+SKILLS = [
+    ('Boat handling', 'Operating small boats in flood water'),
+    ('Swift water rescue', 'Search and rescue in moving water'),
+    ('First aid', 'Basic first aid and CPR'),
+    ('Nursing', 'Registered nurse'),
+    ('Cooking', 'Cooking for large groups'),
+    ('Driving', 'Driving trucks and 4x4 vehicles'),
+    ('Logistics', 'Warehousing and distribution of supplies'),
+    ('Construction', 'Building and repairing temporary shelters'),
+    ('Counselling', 'Psychological first aid'),
+]
+
+SEVERITY_WEIGHTS = [(1, 35), (2, 30), (3, 22), (4, 13)]
+DAMAGE_WEIGHTS = [(None, 40), ('low', 25), ('moderate', 20), ('severe', 10), ('catastrophic', 5)]
+AID_TYPE_WEIGHTS = [('food', 35), ('shelter', 20), ('rescue', 12), ('medical', 18), ('other', 15)]
+AID_STATUS_WEIGHTS = [('pending', 35), ('approved', 20), ('in_progress', 15), ('completed', 20), ('rejected', 10)]
+
+
+def _weighted(rng, pairs):
+    values, weights = zip(*pairs)
+    return rng.choices(values, weights)[0]
+
+
+class _Generator:
+    """Builds rows for one dataset; a single random stream keeps it reproducible"""
+
+    def __init__(self, seed, now, batch_size):
+        self.rng = random.Random(seed)
+        self.now = now
+        self.start = now - timedelta(days=HISTORY_DAYS)
+        self.batch_size = batch_size
+        self.hotspot_weights = [hotspot[4] for hotspot in HOTSPOTS]
+        # Each hotspot's surges: (start, duration in hours)
+        self.surges = [
+            [(self.start + timedelta(days=self.rng.uniform(0, HISTORY_DAYS - 2)), self.rng.uniform(6, 48))
+             for _ in range(SURGES_PER_HOTSPOT)]
+            for _ in HOTSPOTS
+        ]
+
+    def hotspot(self):
+        return self.rng.choices(range(len(HOTSPOTS)), self.hotspot_weights)[0]
+
+    def point(self, index):
+        _, latitude, longitude, spread, _, _ = HOTSPOTS[index]
+        return (
+            round(latitude + self.rng.gauss(0, spread), 6),
+            round(longitude + self.rng.gauss(0, spread), 6),
+        )
+
+    def moment(self, index):
+        """A time in the history window; most fall inside one of the hotspot's surges"""
+        if self.rng.random() < SURGE_SHARE:
+            surge = self.rng.randrange(SURGES_PER_HOTSPOT)
+            start, hours = self.surges[index][surge]
+            return min(start + timedelta(hours=self.rng.uniform(0, hours)), self.now), surge
+        return self.start + timedelta(seconds=self.rng.uniform(0, HISTORY_DAYS * 86400)), None
+
+    def place(self, index):
+        return f'{self.rng.choice(PLACE_WORDS)} {self.rng.choice(PLACE_NAMES)} {self.rng.randint(1, 40)}, {HOTSPOTS[index][0]}'
+
+    def batches(self, total, build):
+        for offset in range(0, total, self.batch_size):
+            yield [build(number) for number in range(offset, min(offset + self.batch_size, total))]
+
+
+def generate_dataset(seed=0, now=None, prefix=USERNAME_PREFIX, password=DEFAULT_PASSWORD, batch_size=BATCH_SIZE,
+                     progress=None, **sizes):
+    """
+    Insert a synthetic dataset and return the number of rows created per
+    model. ``sizes`` override DEFAULT_SIZES (citizens, volunteers,
+    authorities, shelters, reports, aid_requests); ``progress(message)`` is
+    called as each stage finishes.
+    """
+    sizes = {**DEFAULT_SIZES, **sizes}
+    generator = _Generator(seed, now or timezone.now(), batch_size)
+    rng = generator.rng
+    progress = progress or (lambda message: None)
+    password_hash = make_password(password)  # hashing once per user would dominate the run
+    counts = {}
+
+    with transaction.atomic():
+        def build_user(role):
+            def build(number):
+                first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                username = f'{prefix}_{role}_{number:06d}'
+                return User(
+                    username=username, password=password_hash, user_role=role,
+                    first_name=first_name, last_name=last_name, email=f'{username}@example.com',
+                    phone=f'01{rng.randint(0, 9)}-{rng.randint(1000000, 9999999)}',
+                    date_joined=generator.start - timedelta(days=rng.uniform(0, 365)),
+                )
+            return build
+
+        user_ids = {}
+        for role, size in (('authority', sizes['authorities']), ('citizen', sizes['citizens']),
+                           ('volunteer', sizes['volunteers'])):
+            user_ids[role] = []
+            for batch in generator.batches(size, build_user(role)):
+                user_ids[role].extend(user.pk for user in User.objects.bulk_create(batch))
+        counts['users'] = sum(len(ids) for ids in user_ids.values())
+        progress(f'{counts["users"]} users')
+
+        skills = []
+        for name, description in SKILLS:
+            skill, _ = Skill.objects.get_or_create(name=name, defaults={'description': description})
+            skills.append(skill.pk)
+
+        volunteer_profiles = []
+        for batch in generator.batches(len(user_ids['volunteer']), lambda number: VolunteerProfile(
+            user_id=user_ids['volunteer'][number],
+            availability='available' if rng.random() < 0.7 else 'unavailable',
+            **dict(zip(('latitude', 'longitude'), generator.point(generator.hotspot()))),
+        )):
+            created = VolunteerProfile.objects.bulk_create(batch)
+            VolunteerProfile.skills.through.objects.bulk_create([
+                VolunteerProfile.skills.through(volunteerprofile_id=profile.pk, skill_id=skill_id)
+                for profile in created for skill_id in rng.sample(skills, rng.randint(1, 3))
+            ])
+            volunteer_profiles.extend(created)
+        counts['volunteer_profiles'] = len(volunteer_profiles)
+        progress(f'{counts["volunteer_profiles"]} volunteer profiles')
+
+        shelters_by_hotspot = [[] for _ in HOTSPOTS]
+
+        def build_shelter(number):
+            index = generator.hotspot()
+            latitude, longitude = generator.point(index)
+            capacity = rng.choice([50, 80, 120, 200, 300, 500, 1000])
+            shelter = Shelter(
+                name=f'{rng.choice(["Dewan", "Sekolah", "Masjid", "Balai Raya", "Stadium"])} {rng.choice(PLACE_NAMES)} {number}',
+                address=generator.place(index), latitude=latitude, longitude=longitude, capacity=capacity,
+                current_occupancy=int(capacity * rng.betavariate(2, 2)), contact_info=f'03-{rng.randint(1000000, 9999999)}',
+                is_active=rng.random() < 0.9, created_at=generator.start - timedelta(days=rng.uniform(0, 30)),
+            )
+            shelter.refresh_geohash()
+            shelter.hotspot = index
+            return shelter
+
+        counts['shelters'] = 0
+        for batch in generator.batches(sizes['shelters'], build_shelter):
+            for shelter in Shelter.objects.bulk_create(batch):
+                shelters_by_hotspot[shelter.hotspot].append(shelter.pk)
+            counts['shelters'] += len(batch)
+        progress(f'{counts["shelters"]} shelters')
+
+        # One incident per surge, disaster type and ~5km cell, created with its first report
+        incidents = {}
+
+        def build_report(number):
+            index = generator.hotspot()
+            disaster_type = _weighted(generator.rng, HOTSPOTS[index][5].items())
+            latitude, longitude = generator.point(index)
+            reported_at, surge = generator.moment(index)
+            report = DisasterReport(
+                reporter_id=rng.choice(user_ids['citizen']), disaster_type=disaster_type,
+                location=generator.place(index), latitude=latitude, longitude=longitude,
+                severity=_weighted(rng, SEVERITY_WEIGHTS), description=rng.choice(DESCRIPTIONS[disaster_type]),
+                reported_at=reported_at, is_active=rng.random() < 0.6,
+                people_affected=int(rng.lognormvariate(3, 1.2)) if rng.random() < 0.8 else None,
+                area_affected=round(min(rng.lognormvariate(0, 1.2), 9999), 2) if rng.random() < 0.6 else None,
+                infrastructure_damage=_weighted(rng, DAMAGE_WEIGHTS),
+            )
+            report.refresh_geohash()
+            if surge is not None and rng.random() < 0.3:
+                report.incident_key = (index, surge, disaster_type, report.geohash[:INCIDENT_CELL_PRECISION])
+            return report
+
+        counts['reports'] = 0
+        for batch in generator.batches(sizes['reports'], build_report):
+            new_keys = sorted({report.incident_key for report in batch if hasattr(report, 'incident_key')} - set(incidents))
+            for key, incident in zip(new_keys, Incident.objects.bulk_create(
+                [Incident(disaster_type=key[2], created_at=generator.surges[key[0]][key[1]][0]) for key in new_keys]
+            )):
+                incidents[key] = incident.pk
+            for report in batch:
+                if hasattr(report, 'incident_key'):
+                    report.incident_id = incidents[report.incident_key]
+            DisasterReport.objects.bulk_create(batch)
+            counts['reports'] += len(batch)
+        counts['incidents'] = len(incidents)
+        progress(f'{counts["reports"]} disaster reports in {counts["incidents"]} incidents')
+
+        volunteer_user_ids = [profile.user_id for profile in volunteer_profiles]
+
+        def build_aid_request(number):
+            index = generator.hotspot()
+            aid_type = _weighted(rng, AID_TYPE_WEIGHTS)
+            status = _weighted(rng, AID_STATUS_WEIGHTS)
+            latitude, longitude = generator.point(index)
+            aid_request = AidRequest(
+                requester_id=rng.choice(user_ids['citizen']), aid_type=aid_type,
+                description=AID_DESCRIPTIONS[aid_type], location=generator.place(index),
+                latitude=latitude, longitude=longitude, num_people=max(1, int(rng.lognormvariate(1.2, 0.9))),
+                status=status, requested_at=generator.moment(index)[0],
+            )
+            if status != 'pending':
+                aid_request.approved_by_id = rng.choice(user_ids['authority'])
+            if aid_type == 'shelter' and status in ('approved', 'in_progress', 'completed') and shelters_by_hotspot[index]:
+                aid_request.shelter_id = rng.choice(shelters_by_hotspot[index])
+            aid_request.refresh_geohash()
+            return aid_request
+
+        counts['aid_requests'] = counts['assignments'] = 0
+        for batch in generator.batches(sizes['aid_requests'], build_aid_request):
+            created = AidRequest.objects.bulk_create(batch)
+            assignments = []
+            for aid_request in created:
+                if aid_request.status not in ('in_progress', 'completed') or not volunteer_user_ids:
+                    continue
+                assigned_at = aid_request.requested_at + timedelta(hours=rng.uniform(1, 24))
+                completed = aid_request.status == 'completed'
+                assignments.append(VolunteerAssignment(
+                    volunteer_id=rng.choice(volunteer_user_ids), aid_request_id=aid_request.pk,
+                    assigned_by_id=rng.choice(user_ids['authority']),
+                    status='completed' if completed else rng.choice(['assigned', 'in_progress']),
+                    assigned_at=assigned_at,
+                    completed_at=assigned_at + timedelta(hours=rng.uniform(1, 72)) if completed else None,
+                ))
+            VolunteerAssignment.objects.bulk_create(assignments)
+            counts['aid_requests'] += len(created)
+            counts['assignments'] += len(assignments)
+        progress(f'{counts["aid_requests"]} aid requests, {counts["assignments"]} volunteer assignments')
+
+        # bulk_create sends no signals; rebuild what they would have maintained
+        counts['report_tiles'] = rebuild_report_tiles()
+        rebuild_triage()
+        progress(f'{counts["report_tiles"]} map tiles, triage keys')
+
+    invalidate_dashboard_stats()
+    for data_name in (REPORT_DATA, SHELTER_DATA, AID_REQUEST_DATA, VOLUNTEER_DATA, ASSIGNMENT_DATA, USER_DATA):
+        bump_data_version(data_name)
+    return counts
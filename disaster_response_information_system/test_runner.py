@@ -0,0 +1,23 @@
+# Liew Qian Hui 22063182
+import logging
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class QueryBudgetTestRunner(DiscoverRunner):
+    """Test runner under which a view going over its query budget fails the test"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.budget_override = override_settings(DRIS_QUERY_BUDGET_ACTION='raise')
+        self.budget_override.enable()
+        # Keep the per-request metrics lines that DEBUG turns on out of the test output
+        self.performance_logger = logging.getLogger('dris.performance')
+        self.performance_level = self.performance_logger.level
+        self.performance_logger.setLevel(logging.WARNING)
+
+    def teardown_test_environment(self, **kwargs):
+        self.performance_logger.setLevel(self.performance_level)
+        self.budget_override.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,3 +1,1488 @@
-from django.test import TestCase
+import asyncio
+import csv
+import importlib
+import io
+import json
+import os
+import re
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction, OperationalError
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    User, DisasterReport, AidRequest, ReportTile, Incident, Shelter, VolunteerProfile, VolunteerAssignment, Skill,
+)
+from .spatial import encode_geohash, haversine_km
+from .tiles import rebuild_report_tiles
+from .triage import nearby_severities, rebuild_triage
+from .synthetic import generate_dataset
+from .events import REPORT_ACTIVATED, REPORT_SUBMITTED, report_events
+from .locking import retry_on_lock
+from .middleware import QueryBudgetExceeded
+from .pagination import encode_cursor, paginate_keyset
+from .routers import STICKY_COOKIE, ReplicaRoutingMiddleware, sync_replica
+from . import views
+from .views import rank_shelters_by_distance
+from .stats import get_dashboard_stats
+from .surge import multi_state_flood, prepare_accounts, read_log, write_log, ClientSession, SurgeReplay
+
+REPORT_TABLE = DisasterReport._meta.db_table
+AID_REQUEST_TABLE = AidRequest._meta.db_table
+
+
+class ListingIndexTests(TestCase):
+    """Every listing query on reports and aid requests must be answered from an index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.citizen = User.objects.create_user(username='citizen', password='pass', user_role='citizen')
+        cls.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+        for i in range(10):
+            DisasterReport.objects.create(
+                reporter=cls.citizen, disaster_type='flood', location=f'Area {i}',
+                latitude=3.1, longitude=101.6, severity=i % 4 + 1, description='Water rising',
+                is_active=i % 2 == 0, reported_at=timezone.now(),
+            )
+            AidRequest.objects.create(
+                requester=cls.citizen, aid_type='food', description='Need food',
+                location=f'Area {i}', latitude=3.1, longitude=101.6,
+                status='pending' if i % 2 else 'approved',
+                approved_by=None if i % 2 else cls.authority,
+            )
+
+    def setUp(self):
+        # Public listings are served from the page cache; start cold so their queries run
+        cache.clear()
+
+    def assertListingQueriesUseIndexes(self, url, params=None, user=None):
+        if user:
+            self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+
+        listing_queries = [
+            query['sql'] for query in ctx.captured_queries
+            if query['sql'].startswith('SELECT') and 'ORDER BY' in query['sql']
+            and (f'FROM "{REPORT_TABLE}"' in query['sql'] or f'FROM "{AID_REQUEST_TABLE}"' in query['sql'])
+        ]
+        self.assertTrue(listing_queries, f'No listing query captured for {url}')
+
+        with connection.cursor() as cursor:
+            for sql in listing_queries:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+                for step in plan:
+                    for table in (REPORT_TABLE, AID_REQUEST_TABLE):
+                        if step.startswith(f'SCAN {table}'):
+                            self.assertIn('USING', step, f'Full table scan in {url}: {plan}')
+                    self.assertNotIn('TEMP B-TREE FOR ORDER BY', step, f'Unindexed sort in {url}: {plan}')
+
+    def test_public_disaster_reports(self):
+        url = reverse('disaster_reports')
+        for params in [
+            {},
+            {'sort_by': 'date_asc'},
+            {'sort_by': 'severity_desc'},
+            {'sort_by': 'severity_asc', 'severity': '3'},
+            {'disaster_type': 'flood', 'date_range': 'today'},
+            {'date_range': 'week', 'sort_by': 'date_desc'},
+        ]:
+            with self.subTest(params=params):
+                self.assertListingQueriesUseIndexes(url, params)
+
+    def test_authority_disaster_reports(self):
+        url = reverse('disaster_reports')
+        for params in [{}, {'sort_by': 'severity_desc'}, {'disaster_type': 'flood', 'date_range': 'month'}]:
+            with self.subTest(params=params):
+                self.assertListingQueriesUseIndexes(url, params, user=self.authority)
+
+    def test_admin_dashboard(self):
+        url = reverse('admin_dashboard')
+        for params in [
+            {},
+            {'filter_type': 'flood', 'aid_filter_status': 'pending'},
+            {'filter_status': 'active', 'aid_filter_type': 'food'},
+        ]:
+            with self.subTest(params=params):
+                self.assertListingQueriesUseIndexes(url, params, user=self.authority)
+
+    def test_my_aid_requests(self):
+        self.assertListingQueriesUseIndexes(reverse('my_aid_requests'), user=self.citizen)
+
+
+class PublicPageCacheTests(TestCase):
+    """Public report pages come from the versioned cache until a report changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+        cls.report = DisasterReport.objects.create(
+            reporter=cls.authority, disaster_type='flood', location='Kampung Baru',
+            latitude=3.1, longitude=101.6, severity=3, description='Water rising', is_active=True,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeated_views_are_served_from_cache(self):
+        for url in [reverse('disaster_reports'), reverse('disaster_report_detail', args=[self.report.id])]:
+            with self.subTest(url=url):
+                self.client.get(url)
+                with self.assertNumQueries(0):
+                    response = self.client.get(url)
+                self.assertContains(response, 'Kampung Baru')
+
+    def test_report_change_invalidates_cached_pages(self):
+        detail_url = reverse('disaster_report_detail', args=[self.report.id])
+        self.client.get(reverse('disaster_reports'))
+        self.client.get(detail_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.report.is_active = False
+            self.report.save()
+
+        self.assertEqual(self.client.get(detail_url).status_code, 404)
+        self.assertNotContains(self.client.get(reverse('disaster_reports')), 'Kampung Baru')
+
+    def test_date_range_listing_moves_with_the_clock(self):
+        now = timezone.now()
+        DisasterReport.objects.create(
+            reporter=self.authority, disaster_type='haze', location='Bukit Merah', latitude=4.0, longitude=101.0,
+            severity=2, description='Smoke', is_active=True, reported_at=now - timedelta(days=7, minutes=-1),
+        )
+        url = reverse('disaster_reports') + '?date_range=week'
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            self.assertContains(self.client.get(url), 'Bukit Merah')
+        with mock.patch('django.utils.timezone.now', return_value=now + timedelta(minutes=2)):
+            self.assertNotContains(self.client.get(url), 'Bukit Merah')
+
+    def test_authorities_bypass_cache(self):
+        self.client.force_login(self.authority)
+        self.client.get(reverse('disaster_reports'))
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('disaster_reports'))
+        self.assertTrue(any(f'FROM "{REPORT_TABLE}"' in query['sql'] for query in ctx.captured_queries))
+
+class ConditionalGetTests(TestCase):
+    """Unchanged listings and API responses are revalidated with a 304"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+        cls.report = DisasterReport.objects.create(
+            reporter=cls.authority, disaster_type='flood', location='Kampung Baru',
+            latitude=3.1, longitude=101.6, severity=3, description='Water rising', is_active=True,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unchanged_listing_returns_not_modified(self):
+        url = reverse('disaster_reports')
+        response = self.client.get(url)
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        not_modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_report_change_changes_validators(self):
+        url = reverse('disaster_reports')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.report.severity = 4
+            self.report.save(update_fields=['severity'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_validators_vary_by_viewer(self):
+        url = reverse('disaster_reports')
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.authority)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+class ReportTileTests(TestCase):
+    """Map tiles follow report changes and the tile API aggregates them"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+        cls.reports = [
+            DisasterReport.objects.create(
+                reporter=cls.authority, disaster_type='flood', location=f'Kampung {i}',
+                latitude=3.1 + i * 0.01, longitude=101.6, severity=i + 1, description='Water rising',
+                is_active=True, people_affected=10,
+            )
+            for i in range(3)
+        ]
+
+    def tile_rows(self):
+        return sorted(ReportTile.objects.filter(report_count__gt=0).values_list(
+            'precision', 'cell', 'disaster_type', 'report_count', 'low_count', 'medium_count',
+            'high_count', 'critical_count', 'people_affected',
+        ))
+
+    def test_incremental_tiles_match_rebuild(self):
+        first, second, third = self.reports
+        first.is_active = False
+        first.save(update_fields=['is_active'])
+        second.latitude, second.severity = 5.5, 4
+        second.save()
+        third.delete()
+        incremental = self.tile_rows()
+        rebuild_report_tiles()
+        self.assertEqual(incremental, self.tile_rows())
+
+    def test_tile_api_aggregates_reports(self):
+        response = self.client.get(reverse('api_report_tiles'), {'zoom': 8, 'bbox': '3,101,4,102'})
+        buckets = response.json()['buckets']
+        self.assertEqual(len(buckets), 1)
+        self.assertEqual(buckets[0]['count'], 3)
+        self.assertEqual(buckets[0]['max_severity'], 3)
+        self.assertEqual(buckets[0]['people_affected'], 30)
+
+    def test_rebuild_revalidates_the_tile_api(self):
+        url = reverse('api_report_tiles') + '?zoom=8&bbox=3,101,4,102'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            rebuild_report_tiles()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_tile_api_rejects_bad_bbox(self):
+        response = self.client.get(reverse('api_report_tiles'), {'bbox': '4,101,3,102'})
+        self.assertEqual(response.status_code, 400)
+
+class IncidentClusterTests(TestCase):
+    """Near-duplicate submissions are grouped and managed as one incident"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+        cls.citizen = User.objects.create_user(username='citizen', password='pass', user_role='citizen')
+        cls.existing = DisasterReport.objects.create(
+            reporter=cls.citizen, disaster_type='flood', location='Kampung Baru',
+            latitude=3.1, longitude=101.6, severity=2, description='Water rising',
+        )
+        # Same place but another type, and same type but far away
+        DisasterReport.objects.create(
+            reporter=cls.citizen, disaster_type='haze', location='Kampung Baru',
+            latitude=3.1, longitude=101.6, severity=2, description='Smoke',
+        )
+        DisasterReport.objects.create(
+            reporter=cls.citizen, disaster_type='flood', location='Ipoh',
+            latitude=4.6, longitude=101.1, severity=2, description='Water rising',
+        )
+
+    def submit(self, latitude, longitude):
+        self.client.force_login(self.citizen)
+        self.client.post(reverse('disaster_report_create'), {
+            'disaster_type': 'flood', 'location': 'Kampung Baru', 'latitude': latitude,
+            'longitude': longitude, 'severity': 2, 'description': 'Street flooded',
+        })
+        return DisasterReport.objects.latest('id')
+
+    def test_nearby_report_joins_incident(self):
+        report = self.submit('3.101000', '101.601000')
+        self.existing.refresh_from_db()
+        self.assertIsNotNone(report.incident_id)
+        self.assertEqual(report.incident_id, self.existing.incident_id)
+        self.assertEqual(Incident.objects.get().reports.count(), 2)
+
+    def test_report_bridging_incidents_merges_them(self):
+        first = Incident.objects.create(disaster_type='flood')
+        second = Incident.objects.create(disaster_type='flood')
+        DisasterReport.objects.filter(pk=self.existing.pk).update(incident=first)
+        DisasterReport.objects.create(
+            reporter=self.citizen, disaster_type='flood', location='Kampung Baru',
+            latitude=3.1074, longitude=101.6, severity=2, description='Water rising', incident=second,
+        )
+        report = self.submit('3.103700', '101.600000')
+        self.assertEqual(report.incident_id, first.pk)
+        self.assertFalse(Incident.objects.filter(pk=second.pk).exists())
+        self.assertEqual(first.reports.count(), 3)
+
+    def test_distant_report_is_not_linked(self):
+        report = self.submit('3.200000', '101.600000')
+        self.assertIsNone(report.incident_id)
+
+    def test_authority_activates_whole_incident(self):
+        report = self.submit('3.101000', '101.601000')
+        self.client.force_login(self.authority)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('update_incident_status', args=[report.incident_id]), {'action': 'activate'})
+        self.assertEqual(DisasterReport.objects.filter(incident_id=report.incident_id, is_active=True).count(), 2)
+        self.assertEqual(ReportTile.objects.get(precision=1).report_count, 2)
+        response = self.client.get(reverse('disaster_report_detail', args=[report.id]))
+        self.assertContains(response, 'Incident #')
+
+class TriageQueueTests(TestCase):
+    """Pending aid requests are queued by urgency, people, nearby severity and waiting time"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+        cls.citizen = User.objects.create_user(username='citizen', password='pass', user_role='citizen')
+        cls.food = AidRequest.objects.create(
+            requester=cls.citizen, aid_type='food', location='Kampung Baru', latitude=3.1, longitude=101.6,
+            num_people=2, description='Need food', requested_at=timezone.now() - timedelta(hours=2),
+        )
+        cls.rescue = AidRequest.objects.create(
+            requester=cls.citizen, aid_type='rescue', location='Ipoh', latitude=4.6, longitude=101.1,
+            num_people=40, description='Trapped on roof',
+        )
+
+    def queue(self):
+        self.client.force_login(self.authority)
+        response = self.client.get(reverse('api_triage_queue'))
+        return [item['id'] for item in response.json()['aid_requests']]
+
+    def test_urgent_request_jumps_the_queue(self):
+        self.assertEqual(self.queue(), [self.rescue.id, self.food.id])
+
+    def test_severe_report_nearby_raises_priority(self):
+        self.food.num_people = 30
+        self.food.save()
+        report = DisasterReport.objects.create(
+            reporter=self.citizen, disaster_type='flood', location='Kampung Baru',
+            latitude=3.11, longitude=101.61, severity=4, description='Water rising',
+        )
+        self.assertEqual(self.queue(), [self.rescue.id, self.food.id])
+        report.is_active = True
+        report.save()
+        self.assertEqual(self.queue(), [self.food.id, self.rescue.id])
+
+    def test_rebuild_saves_like_incremental_rescoring(self):
+        AidRequest.objects.filter(pk=self.rescue.pk).update(triage_priority=-1e9)
+        self.assertEqual(self.queue(), [self.food.id, self.rescue.id])
+        detail_url = reverse('api_aid_request_detail', args=[self.rescue.pk])
+        etag = self.client.get(detail_url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(rebuild_triage(), 1)
+        self.assertEqual(self.queue(), [self.rescue.id, self.food.id])
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.rescue.refresh_from_db()
+        self.assertGreater(self.rescue.updated_at, self.food.updated_at)
+
+    def test_reviewed_request_leaves_the_queue(self):
+        self.rescue.status = 'approved'
+        self.rescue.save()
+        self.assertEqual(self.queue(), [self.food.id])
+
+class BulkStatusTests(TestCase):
+    """Bulk status actions change many rows in a few statements and keep derived data in step"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+        cls.citizen = User.objects.create_user(username='citizen', password='pass', user_role='citizen')
+        for i in range(40):
+            DisasterReport.objects.create(
+                reporter=cls.citizen, disaster_type='flood' if i % 4 else 'haze', location=f'Kampung {i}',
+                latitude=3 + i * 0.05, longitude=101 + i * 0.03, severity=i % 4 + 1, description='Spam',
+            )
+        cls.pending = AidRequest.objects.create(
+            requester=cls.citizen, aid_type='food', location='Ipoh', latitude=4.6, longitude=101.1, description='Need food',
+        )
+        cls.completed = AidRequest.objects.create(
+            requester=cls.citizen, aid_type='food', location='Ipoh', latitude=4.6, longitude=101.1, description='Done',
+            status='completed',
+        )
+
+    def setUp(self):
+        self.client.force_login(self.authority)
+
+    def test_filtered_activation_is_one_batch(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('bulk_update_disaster_reports'), {
+                'action': 'activate', 'apply_to': 'filtered', 'filter_type': 'flood',
+            })
+        self.assertLess(len(queries), 25)
+        self.assertEqual(DisasterReport.objects.filter(is_active=True).count(), 30)
+        self.assertFalse(DisasterReport.objects.filter(is_active=True, disaster_type='haze').exists())
+
+        incremental = sorted(ReportTile.objects.filter(report_count__gt=0).values_list(
+            'precision', 'cell', 'disaster_type', 'report_count', 'critical_count',
+        ))
+        rebuild_report_tiles()
+        self.assertEqual(incremental, sorted(ReportTile.objects.filter(report_count__gt=0).values_list(
+            'precision', 'cell', 'disaster_type', 'report_count', 'critical_count',
+        )))
+
+    def test_approval_skips_requests_that_cannot_transition(self):
+        self.client.post(reverse('bulk_update_aid_requests'), {
+            'action': 'approve', 'ids': [self.pending.pk, self.completed.pk],
+        })
+        self.pending.refresh_from_db()
+        self.completed.refresh_from_db()
+        self.assertEqual(self.pending.status, 'approved')
+        self.assertEqual(self.pending.approved_by, self.authority)
+        self.assertEqual(self.completed.status, 'completed')
+        self.assertIsNone(self.completed.approved_by)
+
+class ShelterOccupancyTests(TestCase):
+    """Check-ins and check-outs stay within [0, capacity] and batches are validated before any write"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+        cls.shelter = Shelter.objects.create(
+            name='Dewan Orang Ramai', address='Jalan Besar', latitude=3.1, longitude=101.7, capacity=10,
+            current_occupancy=8,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.authority)
+
+    def occupancy(self):
+        self.shelter.refresh_from_db()
+        return self.shelter.current_occupancy
+
+    def test_check_in_past_capacity_is_refused(self):
+        response = self.client.post(reverse('api_shelter_check_in', args=[self.shelter.pk]), {'count': 3})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.occupancy(), 8)
+
+    def test_check_out_below_zero_is_refused(self):
+        response = self.client.post(reverse('api_shelter_check_out', args=[self.shelter.pk]), {'count': 9})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.occupancy(), 8)
+
+    def test_check_out_decrements(self):
+        response = self.client.post(reverse('api_shelter_check_out', args=[self.shelter.pk]), {'count': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.occupancy(), 5)
+
+    def test_batch_with_an_invalid_entry_writes_nothing(self):
+        url = reverse('api_shelter_occupancy_batch', args=[self.shelter.pk])
+        for deltas in ([1, True], [-2, 'x'], [1, 1.5]):
+            response = self.client.post(url, json.dumps({'deltas': deltas}), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.occupancy(), 8)
+
+class KeysetPaginationTests(TestCase):
+    """Cursors page forwards and back, and tampered cursors are rejected instead of failing the query"""
+
+    TAMPERED = [['not-a-date', 5], [{'x': 1}, 5], ['2024-01-01T00:00:00+00:00', 'abc'], [None, 5]]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.citizen = User.objects.create_user(username='citizen', password='pass', user_role='citizen')
+        cls.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+        start = timezone.now() - timedelta(days=1)
+        for i in range(15):
+            DisasterReport.objects.create(
+                reporter=cls.citizen, disaster_type='flood', location=f'Area {i}', latitude=3.1, longitude=101.6,
+                severity=i % 4 + 1, description='Water rising', is_active=True,
+                reported_at=start + timedelta(minutes=i // 2),  # pairs share a time; the id breaks ties
+            )
+        cls.aid_request = AidRequest.objects.create(
+            requester=cls.citizen, aid_type='medical', description='Need insulin', location='Ipoh',
+            latitude=4.6, longitude=101.1,
+        )
+        for i in range(5):
+            volunteer = User.objects.create_user(username=f'volunteer{i}', password='pass', user_role='volunteer')
+            VolunteerProfile.objects.create(user=volunteer)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_forward_and_back(self):
+        reports = DisasterReport.objects.all()
+        ordering = ['-reported_at', '-id']
+        expected = list(reports.order_by(*ordering).values_list('id', flat=True))
+        pages, page = [], paginate_keyset(reports, ordering, page_size=4)
+        pages.append(page)
+        while page.has_next():
+            page = paginate_keyset(reports, ordering, cursor=page.next_cursor, page_size=4)
+            pages.append(page)
+        self.assertEqual([report.id for page in pages for report in page], expected)
+        self.assertFalse(pages[0].has_previous())
+
+        for index in range(len(pages) - 1, 0, -1):
+            previous = paginate_keyset(reports, ordering, cursor=pages[index].previous_cursor, page_size=4)
+            self.assertEqual([report.id for report in previous], [report.id for report in pages[index - 1]])
+
+    def test_tampered_cursor_shows_first_page(self):
+        first = self.client.get(reverse('disaster_reports')).context['report_list']
+        for values in self.TAMPERED:
+            cache.clear()
+            response = self.client.get(reverse('disaster_reports'), {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 200, values)
+            self.assertEqual(response.context['report_list'], first)
+
+    def test_volunteer_api_cursors(self):
+        self.client.force_login(self.authority)
+        url = reverse('api_available_volunteers', args=[self.aid_request.pk])
+        seen, cursor = [], None
+        while True:
+            data = self.client.get(url, {'limit': 2, **({'cursor': cursor} if cursor else {})}).json()
+            seen.extend(volunteer['id'] for volunteer in data['results'])
+            if not data['next_cursor']:
+                break
+            cursor = data['next_cursor']
+        self.assertEqual(sorted(seen), sorted(User.objects.filter(user_role='volunteer').values_list('id', flat=True)))
+        self.assertEqual(len(seen), 5)
+        back = self.client.get(url, {'limit': 2, 'cursor': data['previous_cursor']}).json()
+        self.assertEqual([volunteer['id'] for volunteer in back['results']], seen[2:4])
+
+        for values in [[0, 0, 'abc'], [{'x': 1}, 0, 1], [None, 0, 1]]:
+            response = self.client.get(url, {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 400, values)
+
+
+class SearchTests(TestCase):
+    """Search ranks only what the user may see, with the FTS and the portable backend alike"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.citizen = User.objects.create_user(username='citizen', password='pass', user_role='citizen')
+        cls.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+        # Many strong unverified matches that would fill the top of an unrestricted ranking
+        for i in range(45):
+            DisasterReport.objects.create(
+                reporter=cls.citizen, disaster_type='flood', location=f'Banjir Banjir Kampung {i}',
+                latitude=3.1, longitude=101.6, severity=2, description='Banjir banjir banjir', is_active=False,
+            )
+        cls.verified = DisasterReport.objects.create(
+            reporter=cls.citizen, disaster_type='flood', location='Kota Bharu', latitude=6.1, longitude=102.2,
+            severity=3, description='Banjir along the river', is_active=True,
+        )
+        cls.open_shelter = Shelter.objects.create(
+            name='Dewan Banjir', address='Jalan Sultan', latitude=6.1, longitude=102.2, capacity=50,
+        )
+        Shelter.objects.create(
+            name='Sekolah Banjir', address='Jalan Hospital', latitude=6.1, longitude=102.2, capacity=50, is_active=False,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, user=None, query='banjir'):
+        if user:
+            self.client.force_login(user)
+        response = self.client.get(reverse('api_search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [report['id'] for report in data['disaster_reports']], [shelter['id'] for shelter in data['shelters']]
+
+    def test_public_search_finds_verified_reports_behind_unverified_matches(self):
+        self.assertEqual(self.search(), ([self.verified.id], [self.open_shelter.id]))
+
+    def test_authority_search_includes_unverified_reports(self):
+        report_ids, shelter_ids = self.search(self.authority)
+        self.assertEqual(len(report_ids), 20)
+        self.assertEqual(shelter_ids, [self.open_shelter.id])
+
+    @override_settings(DRIS_SEARCH_BACKEND='disaster_response_information_system.search.LikeSearchBackend')
+    def test_portable_backend(self):
+        self.assertEqual(self.search(), ([self.verified.id], [self.open_shelter.id]))
+
+    def test_missing_query(self):
+        response = self.client.get(reverse('api_search'), {'q': ' '})
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchAssignTests(TestCase):
+    """The batch commit creates exactly the previewed assignments, or none when the plan went stale"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+        citizen = User.objects.create_user(username='citizen', password='pass', user_role='citizen')
+        cls.aid_requests = [
+            AidRequest.objects.create(
+                requester=citizen, aid_type='food', description='Need food', location=f'Area {i}',
+                latitude=3.1 + i * 0.01, longitude=101.6, status='approved',
+            )
+            for i in range(2)
+        ]
+        cls.volunteers = []
+        for i in range(2):
+            user = User.objects.create_user(username=f'volunteer{i}', password='pass', user_role='volunteer')
+            VolunteerProfile.objects.create(user=user, latitude=3.1 + i * 0.01, longitude=101.6)
+            cls.volunteers.append(user)
+
+    def setUp(self):
+        self.client.force_login(self.authority)
+
+    def preview(self):
+        response = self.client.get(reverse('batch_assign_volunteers'))
+        self.assertEqual(response.status_code, 200)
+        pairs = {(row['aid_request'].id, row['volunteer'].id) for row in response.context['preview']}
+        return pairs, response.context['plan']
+
+    def assignments(self):
+        return set(VolunteerAssignment.objects.values_list('aid_request_id', 'volunteer_id'))
+
+    def test_commit_creates_the_previewed_pairs_without_planning_again(self):
+        pairs, plan = self.preview()
+        self.assertEqual(len(pairs), 2)
+        # A volunteer who joins after the preview is not part of the reviewed plan
+        late = User.objects.create_user(username='late', password='pass', user_role='volunteer')
+        VolunteerProfile.objects.create(user=late, latitude=3.1, longitude=101.6)
+
+        with mock.patch('disaster_response_information_system.views.plan_assignments') as plan_assignments:
+            response = self.client.post(reverse('batch_assign_volunteers'), {'plan': plan, 'notes': 'Batch'})
+        plan_assignments.assert_not_called()
+        self.assertRedirects(response, reverse('admin_dashboard'), fetch_redirect_response=False)
+        self.assertEqual(self.assignments(), pairs)
+        self.assertEqual(set(AidRequest.objects.values_list('status', flat=True)), {'in_progress'})
+
+    def test_stale_plan_is_a_conflict(self):
+        _, plan = self.preview()
+        VolunteerProfile.objects.filter(user=self.volunteers[0]).update(availability='unavailable')
+
+        response = self.client.post(reverse('batch_assign_volunteers'), {'plan': plan})
+        self.assertRedirects(response, reverse('batch_assign_volunteers'), fetch_redirect_response=False)
+        self.assertEqual(self.assignments(), set())
+        self.assertEqual(set(AidRequest.objects.values_list('status', flat=True)), {'approved'})
+
+    def test_tampered_plan_is_rejected(self):
+        _, plan = self.preview()
+        for token in (plan[:-2] + 'xx', ''):
+            response = self.client.post(reverse('batch_assign_volunteers'), {'plan': token})
+            self.assertRedirects(response, reverse('batch_assign_volunteers'), fetch_redirect_response=False)
+        self.assertEqual(self.assignments(), set())
+
+
+class AvailableVolunteersApiTests(TestCase):
+    """The assign modals page through every available volunteer, best matches first"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+        citizen = User.objects.create_user(username='citizen', password='pass', user_role='citizen')
+        cls.aid_request = AidRequest.objects.create(
+            requester=citizen, aid_type='medical', description='Need insulin', location='Ipoh',
+            latitude=4.6, longitude=101.1, status='approved',
+        )
+        users = User.objects.bulk_create([
+            User(username=f'volunteer{i}', user_role='volunteer') for i in range(230)
+        ])
+        profiles = VolunteerProfile.objects.bulk_create([
+            VolunteerProfile(user=user, availability='unavailable' if i % 10 == 9 else 'available')
+            for i, user in enumerate(users)
+        ])
+        nursing = Skill.objects.create(name='Nursing', description='Registered nurse')
+        cls.nurses = {profile.user_id for profile in profiles[::7] if profile.availability == 'available'}
+        for profile in profiles[::7]:
+            profile.skills.add(nursing)
+        cls.available = {profile.user_id for profile in profiles if profile.availability == 'available'}
+
+    def test_following_cursors_returns_every_volunteer_once(self):
+        self.client.force_login(self.authority)
+        url = reverse('api_available_volunteers', args=[self.aid_request.pk])
+        results, params = [], {'limit': 200}
+        while True:
+            data = self.client.get(url, params).json()
+            results.extend(data['results'])
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+
+        ids = [volunteer['id'] for volunteer in results]
+        self.assertEqual(len(ids), len(self.available))
+        self.assertEqual(set(ids), self.available)
+        self.assertEqual(set(ids[:len(self.nurses)]), self.nurses)
+        self.assertTrue(all(volunteer['suitable'] for volunteer in results[:len(self.nurses)]))
+
+
+class QueryMetricsTests(TestCase):
+    """Every request is measured; views over their query budget fail under tests and are logged otherwise"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_suite_runs_with_budgets_raising(self):
+        self.assertEqual(settings.DRIS_QUERY_BUDGET_ACTION, 'raise')
+
+    def test_metrics_are_recorded(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('shelters'))
+        metrics = response.perf_metrics
+        self.assertEqual((metrics['url_name'], metrics['method'], metrics['status']), ('shelters', 'GET', 200))
+        self.assertGreater(metrics['queries'], 0)
+        self.assertEqual(metrics['queries'], len(queries))
+        self.assertGreaterEqual(metrics['total_ms'], metrics['db_ms'])
+
+    def test_async_views_are_measured(self):
+        self.client.force_login(self.authority)
+        response = self.client.get(reverse('api_triage_queue'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.perf_metrics['url_name'], 'api_triage_queue')
+        self.assertGreater(response.perf_metrics['queries'], 0)
+
+    @override_settings(DRIS_PERF_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('home'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", write;dur=[\d.]+, '
+                                                    r'render;dur=[\d.]+, total;dur=[\d.]+$')
+
+    @override_settings(DRIS_QUERY_BUDGETS={'shelters': 0})
+    def test_budget_exceeded_raises(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'View "shelters" ran'):
+            self.client.get(reverse('shelters'))
+
+    @override_settings(DRIS_QUERY_BUDGETS={'shelters': 0}, DRIS_QUERY_BUDGET_ACTION='log')
+    def test_budget_exceeded_is_logged_outside_tests(self):
+        with self.assertLogs('dris.performance', 'WARNING') as logs:
+            response = self.client.get(reverse('shelters'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('View "shelters" ran', logs.output[0])
+
+    @override_settings(DRIS_QUERY_BUDGETS={}, DRIS_QUERY_BUDGET_DEFAULT=0)
+    def test_default_budget_applies_to_views_without_one(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('shelters'))
+
+
+class MigrationDataTests(TestCase):
+    """Data migrations carry their own copy of the logic and agree with the live modules"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.citizen = User.objects.create_user(username='citizen', password='pass', user_role='citizen')
+        for i, (latitude, longitude) in enumerate([(3.1, 101.6), (3.12, 101.62), (5.4, 100.3), (-8.5, 179.99)]):
+            DisasterReport.objects.create(
+                reporter=cls.citizen, disaster_type='flood', location=f'Area {i}', latitude=latitude,
+                longitude=longitude, severity=i % 4 + 1, description='Water rising', is_active=i != 2,
+                people_affected=10 * i, area_affected=1.5 * i,
+            )
+            AidRequest.objects.create(
+                requester=cls.citizen, aid_type=['food', 'rescue', 'medical', 'shelter'][i], location=f'Area {i}',
+                latitude=latitude + 0.001, longitude=longitude, num_people=i * 3, description='Need help',
+                requested_at=timezone.now() - timedelta(hours=i),
+            )
+
+    def migration(self, name):
+        return importlib.import_module(f'disaster_response_information_system.migrations.{name}')
+
+    def test_geohashes(self):
+        encode = self.migration('0003_geohash_spatial_index').encode_geohash
+        points = [(0, 0), (90, 180), (-90, -180), (3.139003, 101.686855), (-33.8688, 151.2093), (51.5, -0.1276)]
+        for latitude, longitude in points:
+            for precision in (1, 5, 9):
+                self.assertEqual(encode(latitude, longitude, precision), encode_geohash(latitude, longitude, precision))
+
+        expected = dict(DisasterReport.objects.values_list('id', 'geohash'))
+        DisasterReport.objects.update(geohash='')
+        self.migration('0003_geohash_spatial_index').populate_geohash(apps, None)
+        self.assertEqual(dict(DisasterReport.objects.values_list('id', 'geohash')), expected)
+
+    def test_report_tiles(self):
+        fields = ['precision', 'cell', 'disaster_type', 'report_count', 'low_count', 'medium_count', 'high_count',
+                  'critical_count', 'people_affected', 'area_affected', 'latitude_sum', 'longitude_sum']
+        expected = list(ReportTile.objects.order_by('precision', 'cell').values_list(*fields))
+        self.assertTrue(expected)
+        ReportTile.objects.all().delete()
+        self.migration('0007_report_tiles').build_report_tiles(apps, None)
+        tiles = list(ReportTile.objects.order_by('precision', 'cell').values_list(*fields))
+        self.assertEqual([tile[:10] for tile in tiles], [tile[:10] for tile in expected])
+        for tile, expected_tile in zip(tiles, expected):
+            self.assertAlmostEqual(tile[10], expected_tile[10], places=6)
+            self.assertAlmostEqual(tile[11], expected_tile[11], places=6)
+
+    def test_triage_scores(self):
+        expected = dict(AidRequest.objects.values_list('id', 'triage_priority'))
+        AidRequest.objects.update(triage_priority=0)
+        self.migration('0009_aid_request_triage').score_pending_aid_requests(apps, None)
+        for aid_request_id, priority in AidRequest.objects.values_list('id', 'triage_priority'):
+            self.assertAlmostEqual(priority, expected[aid_request_id], places=6)
+
+
+class SpatialQueryTests(TestCase):
+    """Bounding-box and radius lookups over the geohash index, including across the antimeridian"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shelters = {}
+        for name, latitude, longitude in [
+            ('kl', 3.139, 101.687), ('petaling_jaya', 3.107, 101.607), ('ipoh', 4.597, 101.090),
+            ('fiji_east', -16.5, 179.99), ('fiji_west', -16.5, -179.99), ('fiji_far', -16.5, 179.5),
+            ('pole', 89.99, 0), ('pole_other_side', 89.99, 180),
+        ]:
+            cls.shelters[name] = Shelter.objects.create(
+                name=name, address='Somewhere', latitude=latitude, longitude=longitude, capacity=10,
+            )
+
+    def names(self, queryset):
+        return {shelter.name for shelter in queryset}
+
+    def test_within_bbox(self):
+        self.assertEqual(self.names(Shelter.objects.within_bbox(3.0, 101.5, 3.2, 101.7)), {'kl', 'petaling_jaya'})
+        self.assertEqual(self.names(Shelter.objects.within_bbox(3.0, 101.65, 3.2, 101.7)), {'kl'})
+        self.assertEqual(self.names(Shelter.objects.within_bbox(10, 0, 20, 10)), set())
+
+    def test_within_radius(self):
+        nearby = Shelter.objects.within_radius(3.139, 101.687, 10)
+        self.assertEqual(self.names(nearby), {'kl', 'petaling_jaya'})
+        distances = {shelter.name: shelter.distance_km for shelter in nearby}
+        self.assertAlmostEqual(distances['kl'], 0, places=3)
+        self.assertAlmostEqual(distances['petaling_jaya'], haversine_km(3.139, 101.687, 3.107, 101.607), places=3)
+
+    def test_nearest_orders_by_distance(self):
+        nearest = [shelter.name for shelter in Shelter.objects.nearest(4.0, 101.2, 200)]
+        self.assertEqual(nearest, sorted(['kl', 'petaling_jaya', 'ipoh'], key=lambda name: haversine_km(
+            4.0, 101.2, self.shelters[name].latitude, self.shelters[name].longitude,
+        )))
+        self.assertEqual(nearest[0], 'ipoh')
+
+    def test_radius_across_the_antimeridian(self):
+        self.assertEqual(self.names(Shelter.objects.within_radius(-16.5, 179.99, 20)), {'fiji_east', 'fiji_west'})
+        self.assertEqual(self.names(Shelter.objects.within_radius(-16.5, -179.99, 20)), {'fiji_east', 'fiji_west'})
+        self.assertEqual(
+            self.names(Shelter.objects.within_radius(-16.5, -179.99, 60)), {'fiji_east', 'fiji_west', 'fiji_far'},
+        )
+
+    def test_bbox_across_the_antimeridian(self):
+        self.assertEqual(self.names(Shelter.objects.within_bbox(-17, 179.9, -16, -179.9)), {'fiji_east', 'fiji_west'})
+        self.assertEqual(self.names(Shelter.objects.within_bbox(-17, -179.9, -16, 179.9)), {'fiji_far'})
+
+    def test_triage_sees_reports_across_the_antimeridian(self):
+        citizen = User.objects.create_user(username='citizen', password='pass', user_role='citizen')
+        DisasterReport.objects.create(
+            reporter=citizen, disaster_type='flood', location='Taveuni', latitude=-16.5, longitude=-179.99,
+            severity=4, description='Storm surge', is_active=True,
+        )
+        self.assertEqual(nearby_severities([(-16.5, 179.99), (-16.5, 179.5)]), [4, 0])
+
+    def test_radius_over_the_pole(self):
+        self.assertEqual(self.names(Shelter.objects.within_radius(89.99, 90, 5)), {'pole', 'pole_other_side'})
+
+
+class NearestShelterTests(TestCase):
+    """Shelters with space come first, nearest first; full shelters follow"""
+
+    @classmethod
+    def setUpTestData(cls):
+        def shelter(name, latitude, longitude, capacity=100, occupancy=0, **kwargs):
+            return Shelter.objects.create(
+                name=name, address='Jalan Besar', latitude=latitude, longitude=longitude, capacity=capacity,
+                current_occupancy=occupancy, **kwargs,
+            )
+
+        cls.near_full = shelter('Near but full', 3.140, 101.690, occupancy=100)
+        cls.near = shelter('Near', 3.150, 101.700, occupancy=90)
+        cls.twin_small = shelter('Twin small', 3.300, 101.700, occupancy=95)
+        cls.twin_large = shelter('Twin large', 3.300, 101.700, occupancy=10)
+        cls.far = shelter('Far', 4.600, 101.100)
+        cls.far_full = shelter('Far and full', 4.700, 101.100, capacity=20, occupancy=25)
+        cls.closed = shelter('Closed', 3.139, 101.687, is_active=False)
+
+    def test_ranking(self):
+        ranked = rank_shelters_by_distance(Shelter.objects.filter(is_active=True), 3.139, 101.687)
+        self.assertEqual(
+            [shelter.pk for shelter in ranked],
+            [self.near.pk, self.twin_large.pk, self.twin_small.pk, self.far.pk, self.near_full.pk, self.far_full.pk],
+        )
+        self.assertEqual(ranked[0].distance_km, round(haversine_km(3.139, 101.687, 3.150, 101.700), 1))
+
+    def test_limit_and_empty(self):
+        ranked = rank_shelters_by_distance(Shelter.objects.filter(is_active=True), 3.139, 101.687, limit=2)
+        self.assertEqual([shelter.pk for shelter in ranked], [self.near.pk, self.twin_large.pk])
+        self.assertEqual(rank_shelters_by_distance(Shelter.objects.none(), 3.139, 101.687), [])
+
+    def test_shelters_page_ranks_when_given_a_location(self):
+        response = self.client.get(reverse('shelters'), {'lat': '3.139', 'lng': '101.687', 'availability': 'available'})
+        self.assertEqual(
+            [shelter.pk for shelter in response.context['shelters']],
+            [self.near.pk, self.twin_large.pk, self.twin_small.pk, self.far.pk],
+        )
+        response = self.client.get(reverse('shelters'), {'lat': '200', 'lng': '101.687'})
+        self.assertNotIn(self.closed.pk, [shelter.pk for shelter in response.context['shelters']])
+        self.assertFalse(hasattr(response.context['shelters'][0], 'distance_km'))
+
+
+class DashboardStatsTests(TestCase):
+    """Dashboard counters are cached, match the tables, and are refreshed by every write path"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.citizen = User.objects.create_user(username='citizen', password='pass', user_role='citizen')
+        cls.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+        for i in range(3):
+            volunteer = User.objects.create_user(username=f'volunteer{i}', password='pass', user_role='volunteer')
+            VolunteerProfile.objects.create(user=volunteer, availability='available' if i else 'unavailable')
+        for i in range(5):
+            DisasterReport.objects.create(
+                reporter=cls.citizen, disaster_type='flood', location=f'Area {i}', latitude=3.1, longitude=101.6,
+                severity=2, description='Water rising', is_active=i < 2,
+            )
+            AidRequest.objects.create(
+                requester=cls.citizen, aid_type='food', description='Need food', location=f'Area {i}',
+                latitude=3.1, longitude=101.6, status='pending' if i < 3 else 'approved',
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts(self):
+        self.assertEqual(get_dashboard_stats(), {
+            'total_reports': 5, 'active_reports': 2, 'inactive_reports': 3,
+            'total_aid_requests': 5, 'pending_aid_requests': 3,
+            'volunteers_count': 3, 'available_volunteers': 2,
+        })
+
+    def test_cached_until_a_write(self):
+        get_dashboard_stats()
+        with self.assertNumQueries(0):
+            get_dashboard_stats()
+
+        report = DisasterReport.objects.filter(is_active=False).first()
+        report.is_active = True
+        with self.captureOnCommitCallbacks(execute=True):
+            report.save()
+        self.assertEqual(get_dashboard_stats()['active_reports'], 3)
+
+    def test_bulk_status_updates_refresh_the_counts(self):
+        get_dashboard_stats()
+        self.client.force_login(self.authority)
+        pending = list(AidRequest.objects.filter(status='pending').values_list('pk', flat=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('bulk_update_aid_requests'), {'action': 'approve', 'ids': pending[:2]})
+        self.assertEqual(get_dashboard_stats()['pending_aid_requests'], 1)
+
+
+class ExportTests(TestCase):
+    """Exports select the same rows, in the same order, as the listings with the same filters"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.citizen = User.objects.create_user(username='citizen', password='pass', user_role='citizen')
+        cls.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+        start = timezone.now() - timedelta(days=3)
+        for i, (disaster_type, location) in enumerate([
+            ('flood', 'Kuala Lumpur'), ('flood', 'Kota Bharu'), ('landslide', 'Cameron Highlands'),
+            ('flood', 'Kuala Terengganu'), ('haze', 'Kuala Lumpur'), ('other', 'Ipoh'),
+        ]):
+            DisasterReport.objects.create(
+                reporter=cls.citizen, disaster_type=disaster_type, location=location, latitude=3.1, longitude=101.6,
+                severity=i % 4 + 1, description='Reported', is_active=i % 3 != 0,
+                reported_at=start + timedelta(hours=i),
+            )
+            AidRequest.objects.create(
+                requester=cls.citizen, aid_type=['food', 'medical'][i % 2], description='Need help',
+                location=location, latitude=3.1, longitude=101.6, status=['pending', 'approved', 'rejected'][i % 3],
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.authority)
+
+    def export(self, kind, params, file_format='csv'):
+        response = self.client.get(reverse('export_data', args=[kind, file_format]), params)
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        if file_format == 'csv':
+            return [int(row['id']) for row in csv.DictReader(io.StringIO(content))]
+        return [json.loads(line)['id'] for line in content.splitlines()]
+
+    def test_report_export_matches_the_listing(self):
+        for params in [{}, {'disaster_type': 'flood'}, {'location': 'kuala'}, {'severity': '2', 'sort_by': 'date_asc'},
+                       {'sort_by': 'severity_desc'}]:
+            listing = self.client.get(reverse('disaster_reports'), params).context['report_list']
+            listed = [int(report_id) for report_id in re.findall(r'/disaster_reports/(\d+)/', listing)]
+            self.assertEqual(self.export('disaster_reports', params), listed, params)
+            self.assertEqual(self.export('disaster_reports', params, 'ndjson'), listed, params)
+
+    def test_exports_match_the_dashboard_filters(self):
+        for params in [{}, {'filter_type': 'flood', 'filter_status': 'active'}, {'filter_severity': '1'},
+                       {'aid_filter_type': 'food'}, {'aid_filter_status': 'approved', 'aid_filter_type': 'medical'}]:
+            context = self.client.get(reverse('admin_dashboard'), params).context
+            self.assertEqual(
+                set(self.export('disaster_reports', params)), {report.id for report in context['disaster_reports']}, params,
+            )
+            self.assertEqual(
+                set(self.export('aid_requests', params)), {aid_request.id for aid_request in context['aid_requests']}, params,
+            )
+
+
+class ReportEventStreamTests(TestCase):
+    """The SSE feed sends only the events matching the subscriber's filters, live and on replay"""
+
+    def publish(self, severity, event_type=REPORT_ACTIVATED, disaster_type='flood', latitude=3.1, longitude=101.6):
+        return report_events.publish(event_type, {
+            'report_id': severity, 'disaster_type': disaster_type, 'severity': severity,
+            'latitude': latitude, 'longitude': longitude,
+        }, public=event_type != REPORT_SUBMITTED)
+
+    async def open_stream(self, params=None, last_event_id=None, client=None):
+        headers = {'Last-Event-ID': str(last_event_id)} if last_event_id is not None else {}
+        response = await (client or self.async_client).get(reverse('report_event_stream'), params or {}, headers=headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+        self.addCleanup(async_to_sync(self.close_stream), stream)
+        return stream
+
+    async def close_stream(self, stream):
+        await stream.aclose()  # unsubscribes
+
+    async def next_event(self, stream):
+        chunk = (await asyncio.wait_for(anext(stream), 5)).decode()
+        fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines())
+        return fields['event'], json.loads(fields['data'])['severity']
+
+    async def test_live_events_are_filtered_by_minimum_severity(self):
+        stream = await self.open_stream({'severity': 3})
+        for severity in (1, 2, 4, 3):
+            self.publish(severity)
+        self.assertEqual(await self.next_event(stream), (REPORT_ACTIVATED, 4))
+        self.assertEqual(await self.next_event(stream), (REPORT_ACTIVATED, 3))
+
+    async def test_replay_is_filtered_too(self):
+        first = self.publish(2)
+        self.publish(4)
+        self.publish(1, disaster_type='haze')
+        self.publish(3, disaster_type='haze')
+        stream = await self.open_stream({'severity': 3, 'disaster_type': 'haze'}, last_event_id=first['id'] - 1)
+        self.assertEqual(await self.next_event(stream), (REPORT_ACTIVATED, 3))
+
+    async def test_unverified_reports_only_reach_authorities(self):
+        authority = await User.objects.acreate(username='authority', user_role='authority')
+        await self.async_client.aforce_login(authority)
+        public = await self.open_stream({'severity': 3}, client=self.async_client_class())
+        authorities = await self.open_stream({'severity': 3})
+        self.publish(4, REPORT_SUBMITTED)
+        self.publish(3)
+        self.assertEqual(await self.next_event(authorities), (REPORT_SUBMITTED, 4))
+        self.assertEqual(await self.next_event(authorities), (REPORT_ACTIVATED, 3))
+        self.assertEqual(await self.next_event(public), (REPORT_ACTIVATED, 3))
+
+    async def test_bbox_across_the_antimeridian(self):
+        stream = await self.open_stream({'bbox': '-20,179,-10,-179'})
+        self.publish(1, latitude=-17, longitude=101.6)
+        self.publish(2, latitude=-17, longitude=179.5)
+        self.publish(3, latitude=-17, longitude=-179.5)
+        self.publish(4, latitude=3.1, longitude=179.5)
+        self.publish(1, latitude=-17, longitude=-179)
+        self.assertEqual(await self.next_event(stream), (REPORT_ACTIVATED, 2))
+        self.assertEqual(await self.next_event(stream), (REPORT_ACTIVATED, 3))
+        self.assertEqual(await self.next_event(stream), (REPORT_ACTIVATED, 1))
+
+    async def test_invalid_severity(self):
+        response = await self.async_client.get(reverse('report_event_stream'), {'severity': 'high'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AsyncApiViewTests(TestCase):
+    """The dashboard's JSON endpoints answer through the async request path"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+        cls.citizen = User.objects.create_user(username='citizen', password='pass', user_role='citizen',
+                                               first_name='Aina', last_name='Rahman')
+        cls.volunteer = User.objects.create_user(username='volunteer', password='pass', user_role='volunteer')
+        cls.profile = VolunteerProfile.objects.create(user=cls.volunteer, availability='available')
+        cls.profile.skills.add(Skill.objects.create(name='First aid', description='Certified'))
+        cls.aid_request = AidRequest.objects.create(
+            requester=cls.citizen, aid_type='medical', description='Need insulin', location='Ipoh',
+            latitude=4.6, longitude=101.1, num_people=2, status='pending',
+        )
+        VolunteerAssignment.objects.create(volunteer=cls.volunteer, aid_request=cls.aid_request, assigned_by=cls.authority)
+
+    def test_views_are_async(self):
+        for view in (views.api_aid_request_detail, views.api_triage_queue, views.api_available_volunteers,
+                     views.api_volunteer_profile, views.api_user_profile):
+            self.assertTrue(iscoroutinefunction(view), view.__name__)
+
+    async def test_authority_only(self):
+        url = reverse('api_user_profile', args=[self.citizen.pk])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 302)
+        await self.async_client.aforce_login(self.citizen)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+    async def test_aid_request_detail(self):
+        await self.async_client.aforce_login(self.authority)
+        response = await self.async_client.get(reverse('api_aid_request_detail', args=[self.aid_request.pk]))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['id'], self.aid_request.pk)
+        self.assertEqual(data['num_people'], 2)
+        self.assertEqual(data['requester_name'], 'Aina Rahman')
+        response = await self.async_client.get(reverse('api_aid_request_detail', args=[self.aid_request.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_triage_queue(self):
+        await self.async_client.aforce_login(self.authority)
+        response = await self.async_client.get(reverse('api_triage_queue'), {'limit': 5})
+        self.assertEqual([row['id'] for row in response.json()['aid_requests']], [self.aid_request.pk])
+        response = await self.async_client.get(reverse('api_triage_queue'), {'limit': 'all'})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_available_volunteers(self):
+        await self.async_client.aforce_login(self.authority)
+        url = reverse('api_available_volunteers', args=[self.aid_request.pk])
+        data = (await self.async_client.get(url)).json()
+        self.assertEqual([volunteer['id'] for volunteer in data['results']], [self.volunteer.pk])
+        self.assertEqual((await self.async_client.get(url, {'limit': 'x'})).status_code, 400)
+
+    async def test_volunteer_profile(self):
+        await self.async_client.aforce_login(self.authority)
+        response = await self.async_client.get(reverse('api_volunteer_profile', args=[self.profile.pk]))
+        data = response.json()
+        self.assertEqual(data['username'], 'volunteer')
+        self.assertEqual(data['skills'], ['First aid'])
+        self.assertEqual(data['assignment_count'], 1)
+        self.assertEqual(data['assignments'][0]['location'], 'Ipoh')
+        response = await self.async_client.get(reverse('api_volunteer_profile', args=[self.profile.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_user_profile(self):
+        await self.async_client.aforce_login(self.authority)
+        response = await self.async_client.get(reverse('api_user_profile', args=[self.citizen.pk]))
+        data = response.json()
+        self.assertEqual(data['full_name'], 'Aina Rahman')
+        self.assertEqual(data['user_role'], 'citizen')
+        response = await self.async_client.get(reverse('api_user_profile', args=[self.citizen.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ShelterEditTests(TestCase):
+    """Editing a shelter never overwrites occupancy changed by check-ins in the meantime"""
+
+    def setUp(self):
+        self.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+        self.shelter = Shelter.objects.create(
+            name='Dewan Orang Ramai', address='Jalan Besar', latitude=3.1, longitude=101.6, capacity=100,
+            current_occupancy=10,
+        )
+        self.client.force_login(self.authority)
+
+    def test_check_ins_between_get_and_post_are_kept(self):
+        form = self.client.get(reverse('shelter_edit', args=[self.shelter.pk])).context['form']
+        self.assertNotIn('current_occupancy', form.fields)
+        response = self.client.post(reverse('api_shelter_check_in', args=[self.shelter.pk]), {'count': 25})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(reverse('shelter_edit', args=[self.shelter.pk]), {
+            'name': 'Dewan Orang Ramai', 'address': 'Jalan Besar', 'latitude': 3.1, 'longitude': 101.6,
+            'capacity': 120, 'current_occupancy': 10, 'contact_info': '03-1234 5678', 'is_active': 'on',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.shelter.refresh_from_db()
+        self.assertEqual((self.shelter.capacity, self.shelter.current_occupancy), (120, 35))
+
+    def test_capacity_cannot_drop_below_occupancy(self):
+        response = self.client.post(reverse('shelter_edit', args=[self.shelter.pk]), {
+            'name': 'Dewan Orang Ramai', 'address': 'Jalan Besar', 'latitude': 3.1, 'longitude': 101.6,
+            'capacity': 5, 'is_active': 'on',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.shelter.refresh_from_db()
+        self.assertEqual(self.shelter.capacity, 100)
+
+
+class BulkImportTests(TestCase):
+    """Rows that cannot be decoded or parsed are reported per line; the other rows are imported"""
+
+    def setUp(self):
+        self.authority = User.objects.create_user(username='authority', password='pass', user_role='authority')
+        self.client.force_login(self.authority)
+
+    def upload(self, name, content, kind='disaster_reports'):
+        response = self.client.post(reverse('bulk_import'), {
+            'kind': kind, 'file': SimpleUploadedFile(name, content),
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.context['result']
+
+    def test_csv_with_latin1_and_malformed_rows(self):
+        content = (
+            'disaster_type,location,latitude,longitude,severity,description\n'
+            'flood,Kuala Lumpur,3.1,101.6,2,Rising water\n'
+            'flood,Kota Bharu,6.1,102.2,3,Caf\xe9 flooded\n'
+            f'landslide,Cameron Highlands,4.5,101.4,4,"{"x" * 200000}"\n'
+            'haze,Shah Alam,3.0,101.5,9,Bad severity\n'
+            'other,Klang,3.0,101.4,1,Warehouse fire\n'
+        ).encode('latin-1')
+        result = self.upload('reports.csv', content)
+        self.assertEqual(result.created, 2)
+        self.assertEqual(set(DisasterReport.objects.values_list('location', flat=True)), {'Kuala Lumpur', 'Klang'})
+        errors = dict(result.errors)
+        self.assertEqual(errors[3], 'Text is not valid UTF-8.')
+        self.assertTrue(errors[4].startswith('Malformed CSV: field larger than field limit'))
+        self.assertIn('severity', errors[5])
+        self.assertIsNone(result.stopped)
+
+    def test_ndjson_with_bad_lines(self):
+        lines = [
+            b'{"aid_type": "food", "location": "Ipoh", "latitude": 4.6, "longitude": 101.1, '
+            b'"num_people": 3, "description": "Need rice"}',
+            b'{"aid_type": "water", "location": "Sungai Petani", "latitude": 5.6, "longitude": 100.5, '
+            b'"num_people": 2, "description": "Air minum \xe0 habis"}',
+            b'{"aid_type": "food"',
+            b'[1, 2]',
+            b'{"aid_type": "medical", "location": "Kuantan", "latitude": 3.8, "longitude": 103.3, '
+            b'"num_people": 1, "description": "Insulin"}',
+        ]
+        result = self.upload('requests.ndjson', b'\n'.join(lines), kind='aid_requests')
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.errors, [(2, 'Text is not valid UTF-8.'), (3, 'Malformed record.'), (4, 'Malformed record.')])
+
+
+class SyntheticDatasetTests(TestCase):
+    """The generator is reproducible and leaves derived data consistent; the benchmark records every role"""
+
+    SIZES = {'citizens': 20, 'volunteers': 10, 'authorities': 2, 'shelters': 5, 'reports': 200, 'aid_requests': 100}
+
+    def test_same_seed_gives_same_rows(self):
+        now = timezone.now()
+        fields = ('disaster_type', 'latitude', 'longitude', 'severity', 'reported_at', 'is_active')
+        generate_dataset(seed=7, now=now, prefix='first', **self.SIZES)
+        first = list(DisasterReport.objects.order_by('pk').values_list(*fields))
+        DisasterReport.objects.all().delete()
+        generate_dataset(seed=7, now=now, prefix='second', **self.SIZES)
+        self.assertEqual(first, list(DisasterReport.objects.order_by('pk').values_list(*fields)))
+
+    def test_derived_data_is_rebuilt(self):
+        counts = generate_dataset(seed=1, **self.SIZES)
+        self.assertEqual(counts['reports'], 200)
+        self.assertEqual(counts['users'], 32)
+        self.assertEqual(
+            ReportTile.objects.filter(precision=1).aggregate(total=Sum('report_count'))['total'],
+            DisasterReport.objects.filter(is_active=True).count(),
+        )
+        self.assertFalse(AidRequest.objects.filter(status='pending', triage_priority=0).exists())
+
+    def test_benchmark_writes_results_per_role(self):
+        generate_dataset(seed=1, **self.SIZES)
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command('benchmark_views', repeat=1, warmup=0, only=['home', 'api_triage_queue'],
+                         output=output, stdout=io.StringIO())
+            with open(output) as f:
+                results = json.load(f)['results']
+        self.assertEqual(len(results), 8)
+        queue = {result['role']: result['status'] for result in results if result['url_name'] == 'api_triage_queue'}
+        self.assertEqual(queue, {'anonymous': 302, 'citizen': 302, 'volunteer': 302, 'authority': 200})
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SurgeReplayTests(TransactionTestCase):
+    """A small flood scenario replays without errors, and its event log round-trips"""
+
+    def test_replay_reports_every_action(self):
+        header, events = multi_state_flood(seed=3, citizens=30, duration=1800, authorities=2, volunteers=5, shelters=3)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'flood.ndjson')
+            write_log(path, header, events)
+            self.assertEqual(read_log(path), (header, events))
+        shelter_ids = prepare_accounts(header, 'surge')
+        results = SurgeReplay(
+            header, events, 'surge', shelter_ids, lambda: ClientSession('testserver'), speedup=1e6, concurrency=1,
+        ).run()
+
+        self.assertEqual(results['error_rate'], 0.0)
+        actions = results['actions']
+        for action in ('register', 'login', 'report_create', 'aid_request_create', 'verify_report',
+                       'approve_aid_request', 'shelter_edit', 'shelter_occupancy', 'dashboard'):
+            self.assertGreater(actions[action]['requests'], 0, action)
+            self.assertEqual(actions[action]['unresolved'], 0, action)
+        self.assertEqual(
+            DisasterReport.objects.filter(reporter__username__startswith='surge_').count(),
+            actions['report_create']['requests'],
+        )
+        self.assertIsNotNone(actions['report_create']['lock_wait_p95_ms'])
+
+
+@override_settings(DRIS_DB_LOCK_RETRY_DELAY=0)
+class LockRetryTests(TransactionTestCase):
+    """Lock errors are retried outside a transaction; other errors and nested transactions are not"""
+
+    def failing(self, *errors):
+        calls = []
+
+        def func():
+            calls.append(1)
+            if len(calls) <= len(errors):
+                raise errors[len(calls) - 1]
+            return 'done'
+        return func, calls
+
+    def test_lock_errors_are_retried(self):
+        func, calls = self.failing(OperationalError('database is locked'), OperationalError('database is locked'))
+        with self.assertLogs('disaster_response_information_system.locking', 'WARNING'):
+            self.assertEqual(retry_on_lock(func), 'done')
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors_and_nested_transactions_are_not_retried(self):
+        func, calls = self.failing(OperationalError('no such table: foo'))
+        with self.assertRaises(OperationalError):
+            retry_on_lock(func)
+        self.assertEqual(len(calls), 1)
+
+        func, calls = self.failing(OperationalError('database is locked'))
+        with self.assertRaises(OperationalError), transaction.atomic():
+            retry_on_lock(func)
+        self.assertEqual(len(calls), 1)
+
+    def test_write_views_run_in_one_transaction(self):
+        authority = User.objects.create_user(username='authority', password='x', user_role='authority')
+        citizen = User.objects.create_user(username='citizen', password='x', user_role='citizen')
+        report = DisasterReport.objects.create(
+            reporter=citizen, disaster_type='flood', location='Kuantan', latitude=3.8, longitude=103.3,
+            description='Water rising', severity=2, is_active=False,
+        )
+        self.client.force_login(authority)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('update_disaster_status', args=[report.pk]), {'action': 'activate'})
+        statements = [query['sql'] for query in queries]
+        self.assertEqual(sum(sql.startswith('BEGIN') for sql in statements), 1)
+        self.assertIn('BEGIN IMMEDIATE', statements)
+
+
+@override_settings(DRIS_DB_REPLICAS=['replica'], DRIS_SHARED_CACHE=True)
+class ReplicaRoutingTests(TransactionTestCase):
+    """GET requests read from a file-copy replica, except for a browser that has just written"""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        # Under tests the replica mirrors the primary; point it at a real copy instead
+        replica = connections['replica']
+        mirror = replica.settings_dict
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        replica.close()
+        replica.settings_dict = {**mirror, 'NAME': os.path.join(directory.name, 'replica.sqlite3')}
+
+        def restore():
+            replica.close()
+            replica.settings_dict = mirror
+        self.addCleanup(restore)
+
+    def test_writer_reads_own_writes_until_replica_catches_up(self):
+        citizen = User.objects.create_user(username='citizen', password='x', user_role='citizen')
+        sync_replica('replica')
+        self.client.force_login(citizen)
+        response = self.client.post(reverse('aid_request_create'), {
+            'aid_type': 'food', 'description': 'Family needs rice', 'location': 'Kuantan',
+            'latitude': '3.8', 'longitude': '103.3', 'num_people': 4,
+        })
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertContains(self.client.get(reverse('my_aid_requests')), 'Family needs rice')
+
+        # Without the cookie the page comes from the replica, copied before the request was made
+        del self.client.cookies[STICKY_COOKIE]
+        self.assertNotContains(self.client.get(reverse('my_aid_requests')), 'Family needs rice')
+        sync_replica('replica')
+        self.assertContains(self.client.get(reverse('my_aid_requests')), 'Family needs rice')
+
+    def test_replica_pages_are_cached_per_sync(self):
+        citizen = User.objects.create_user(username='citizen', password='x', user_role='citizen')
+        sync_replica('replica')
+        DisasterReport.objects.create(
+            reporter=citizen, disaster_type='flood', location='Kuantan', latitude=3.8, longitude=103.3,
+            description='Water rising', severity=2, is_active=True,
+        )
+        # The write bumped the data version, but the replica has not caught up
+        # yet; its page must not outlive the next sync under the new version
+        response = self.client.get(reverse('disaster_reports'))
+        self.assertNotContains(response, 'Kuantan')
+        self.assertEqual(self.client.get(reverse('disaster_reports'), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        sync_replica('replica')
+        response = self.client.get(reverse('disaster_reports'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Kuantan')
+
+    @override_settings(DRIS_SHARED_CACHE=False)
+    def test_replicas_require_a_shared_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.client.get(reverse('disaster_reports'))
+
+    def test_async_requests_are_routed_too(self):
+        authority = User.objects.create_user(username='authority', password='x', user_role='authority')
+        citizen = User.objects.create_user(username='citizen', password='x', user_role='citizen')
+        shelter = Shelter.objects.create(name='Dewan', address='Jalan Besar', latitude=3.8, longitude=103.3, capacity=50)
+        sync_replica('replica')
+        aid_request = AidRequest.objects.create(
+            requester=citizen, aid_type='rescue', description='Trapped', location='Kuantan',
+            latitude=3.8, longitude=103.3, num_people=5,
+        )
+        self.async_client.force_login(authority)
+
+        async def async_view(request):
+            pass
+
+        # Under ASGI the middleware stays on the event loop instead of running in a thread
+        self.assertTrue(iscoroutinefunction(ReplicaRoutingMiddleware(async_view)))
+
+        def queue():
+            response = async_to_sync(self.async_client.get)(reverse('api_triage_queue'))
+            return [item['id'] for item in response.json()['aid_requests']]
+
+        self.assertEqual(queue(), [])
+        response = async_to_sync(self.async_client.post)(reverse('api_shelter_check_in', args=[shelter.pk]), {'count': 2})
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(queue(), [aid_request.id])
+
+
+@override_settings(
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    AUTHENTICATION_BACKENDS=['disaster_response_information_system.backends.CachedModelBackend'],
+)
+class CachedAuthTests(TestCase):
+    """Authenticated pages run no session or user queries, and user changes take effect at once"""
+
+    def setUp(self):
+        cache.clear()
+        self.authority = User.objects.create_user(username='authority', password='x', user_role='authority')
+        self.citizen = User.objects.create_user(username='citizen', password='x', user_role='citizen')
+        self.client.force_login(self.citizen)
+        self.client.get(reverse('my_aid_requests'))
+
+    def auth_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        tables = ('django_session', User._meta.db_table)
+        return response, [query['sql'] for query in queries if any(f'FROM "{table}"' in query['sql'] for table in tables)]
+
+    def test_authenticated_page_runs_no_auth_queries(self):
+        response, queries = self.auth_queries(reverse('my_aid_requests'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_deactivated_user_is_logged_out(self):
+        authority = self.client_class()
+        authority.force_login(self.authority)
+        authority.get(reverse('toggle_user_status', args=[self.citizen.pk]))
+        response, _ = self.auth_queries(reverse('my_aid_requests'))
+        self.assertRedirects(response, f'{reverse("login")}?next={reverse("my_aid_requests")}', fetch_redirect_response=False)
+
+    def test_password_and_role_changes_are_seen(self):
+        citizen = User.objects.get(pk=self.citizen.pk)
+        citizen.user_role = 'volunteer'
+        citizen.save()
+        response, _ = self.auth_queries(reverse('my_aid_requests'))
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+
+        citizen.set_password('changed')
+        citizen.save()
+        response, _ = self.auth_queries(reverse('my_aid_requests'))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(reverse('login')))
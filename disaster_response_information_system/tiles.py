@@ -0,0 +1,251 @@
+# Liew Qian Hui 22063182
+"""
+Per-zoom map aggregates of active disaster reports.
+
+ReportTile keeps running totals of the active reports of each type in each
+geohash cell, for every precision in TILE_PRECISIONS. When a report is
+saved or deleted, the difference between its old and new contribution is
+applied to its cells (see signals.py). The map endpoint therefore reads a
+few hundred tile rows for the viewport and never scans the reports table.
+Bulk paths that bypass model signals call ``apply_tile_changes`` directly,
+and ``rebuild_report_tiles`` recomputes everything from scratch.
+"""
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Substr
+
+from .models import DisasterReport, ReportTile
+from .page_cache import REPORT_DATA, bump_data_version
+from .spatial import covering_cells, covering_precision, geohash_bounds
+
+TILE_PRECISIONS = range(1, 7)  # precision 6 cells are about 1.2km x 0.6km
+MAX_TILE_BUCKETS = 512  # coarsen the grid rather than return more buckets than this
+BULK_TILE_CHANGES = 64  # above this many changed tiles, write them in batches
+TILE_BATCH_SIZE = 500
+# Web map zoom level -> geohash precision whose cells are a few dozen pixels wide
+ZOOM_PRECISIONS = [1, 1, 1, 2, 2, 3, 3, 3, 4, 4, 5, 5, 5, 6]
+SEVERITY_FIELDS = {1: 'low_count', 2: 'medium_count', 3: 'high_count', 4: 'critical_count'}
+# Running totals of a tile, as changed by each report
+TOTAL_FIELDS = (
+    'report_count', *SEVERITY_FIELDS.values(),
+    'people_affected', 'area_affected', 'latitude_sum', 'longitude_sum',
+)
+TILE_FIELDS = (
+    'is_active', 'geohash', 'disaster_type', 'severity',
+    'people_affected', 'area_affected', 'latitude', 'longitude',
+)
+
+
+# What one active report adds to the tiles of its cells
+TileContribution = namedtuple(
+    'TileContribution',
+    'geohash disaster_type severity people_affected area_affected latitude longitude',
+)
+
+
+def zoom_precision(zoom):
+    """Geohash precision of the tiles shown at a map zoom level"""
+    return ZOOM_PRECISIONS[max(0, min(zoom, len(ZOOM_PRECISIONS) - 1))]
+
+
+def report_contribution(values):
+    """
+    What a report adds to its tiles, from a mapping of TILE_FIELDS, as a
+    TileContribution; None for reports that are not on the map.
+    """
+    if not values['is_active'] or not values['geohash']:
+        return None
+    return TileContribution(
+        values['geohash'],
+        values['disaster_type'],
+        int(values['severity']),
+        values['people_affected'] or 0,
+        Decimal(str(values['area_affected'] or 0)),
+        float(values['latitude']),
+        float(values['longitude']),
+    )
+
+
+def instance_contribution(report):
+    return report_contribution({name: getattr(report, name) for name in TILE_FIELDS})
+
+
+def apply_tile_changes(removed=(), added=(), tile_model=ReportTile):
+    """Subtract the ``removed`` and add the ``added`` report contributions"""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for sign, contributions in ((-1, removed), (1, added)):
+        for contribution in contributions:
+            if contribution is None:
+                continue
+            geohash, disaster_type, severity, people, area, latitude, longitude = contribution
+            for precision in TILE_PRECISIONS:
+                delta = deltas[(precision, geohash[:precision], disaster_type)]
+                delta['report_count'] += sign
+                delta[SEVERITY_FIELDS[severity]] += sign
+                delta['people_affected'] += sign * people
+                delta['area_affected'] += sign * area
+                delta['latitude_sum'] += sign * latitude
+                delta['longitude_sum'] += sign * longitude
+
+    changes = {}
+    for key, delta in deltas.items():
+        nonzero = {field: value for field, value in delta.items() if value}
+        if nonzero:
+            changes[key] = (nonzero, delta['report_count'])
+
+    with transaction.atomic():
+        if len(changes) > BULK_TILE_CHANGES:
+            _apply_tile_changes_in_bulk(changes, tile_model)
+        else:
+            for key, (fields, report_count) in changes.items():
+                _apply_tile_change(key, fields, report_count, tile_model)
+
+
+def _apply_tile_change(key, fields, report_count, tile_model):
+    precision, cell, disaster_type = key
+    tiles = tile_model.objects.filter(precision=precision, cell=cell, disaster_type=disaster_type)
+    increments = {field: F(field) + value for field, value in fields.items()}
+    if tiles.update(**increments) or report_count <= 0:
+        return
+    try:
+        with transaction.atomic():
+            tile_model.objects.create(precision=precision, cell=cell, disaster_type=disaster_type, **fields)
+    except IntegrityError:
+        # Another writer created the tile first
+        tiles.update(**increments)
+
+
+def _apply_tile_changes_in_bulk(changes, tile_model):
+    """Increment the stored tiles with one batched statement and insert the new ones together"""
+    cells = defaultdict(set)
+    for precision, cell, _ in changes:
+        cells[precision].add(cell)
+    stored = set()
+    for precision, precision_cells in cells.items():
+        stored.update(
+            tile_model.objects.filter(precision=precision, cell__in=precision_cells)
+            .values_list('precision', 'cell', 'disaster_type')
+        )
+
+    increments, created = [], {}
+    for key, (fields, report_count) in changes.items():
+        if key in stored:
+            increments.append([fields.get(field, 0) for field in TOTAL_FIELDS] + list(key))
+        elif report_count > 0:
+            precision, cell, disaster_type = key
+            created[key] = tile_model(precision=precision, cell=cell, disaster_type=disaster_type, **fields)
+
+    if increments:
+        # bulk_update would write computed values back; relative increments stay
+        # correct alongside concurrent writers and cost far less to build
+        connection = connections[router.db_for_write(tile_model)]
+        quote = connection.ops.quote_name
+
+        def column(name):
+            return quote(tile_model._meta.get_field(name).column)
+
+        assignments = ', '.join(f'{column(field)} = {column(field)} + %s' for field in TOTAL_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {quote(tile_model._meta.db_table)} SET {assignments} '
+                f'WHERE {column("precision")} = %s AND {column("cell")} = %s AND {column("disaster_type")} = %s',
+                increments,
+            )
+    if created:
+        try:
+            with transaction.atomic():
+                tile_model.objects.bulk_create(created.values(), batch_size=TILE_BATCH_SIZE)
+        except IntegrityError:
+            # Another writer created some of the tiles first
+            for key in created:
+                _apply_tile_change(key, *changes[key], tile_model)
+
+
+def rebuild_report_tiles():
+    """Recompute every tile from the reports table; returns the number of tiles"""
+    severity_counts = {
+        field: Count('id', filter=Q(severity=level)) for level, field in SEVERITY_FIELDS.items()
+    }
+    reports = DisasterReport.objects.filter(is_active=True).exclude(geohash='')
+    with transaction.atomic():
+        ReportTile.objects.all().delete()
+        total = 0
+        for precision in TILE_PRECISIONS:
+            rows = reports.annotate(cell=Substr('geohash', 1, precision)).values('cell', 'disaster_type').annotate(
+                report_count=Count('id'),
+                people_total=Sum('people_affected'),
+                area_total=Sum('area_affected'),
+                latitude_total=Sum('latitude'),
+                longitude_total=Sum('longitude'),
+                **severity_counts,
+            ).order_by()
+            tiles = [
+                ReportTile(
+                    precision=precision,
+                    cell=row['cell'],
+                    disaster_type=row['disaster_type'],
+                    report_count=row['report_count'],
+                    people_affected=row['people_total'] or 0,
+                    area_affected=row['area_total'] or 0,
+                    latitude_sum=float(row['latitude_total']),
+                    longitude_sum=float(row['longitude_total']),
+                    **{field: row[field] for field in SEVERITY_FIELDS.values()},
+                )
+                for row in rows
+            ]
+            ReportTile.objects.bulk_create(tiles, batch_size=1000)
+            total += len(tiles)
+        # Deletes and bulk_create send no model signals
+        transaction.on_commit(lambda: bump_data_version(REPORT_DATA))
+    return total
+
+
+def report_tile_buckets(zoom, bbox, disaster_type=None):
+    """
+    Aggregate the active reports inside ``bbox`` (min_lat, min_lon, max_lat,
+    max_lon) into one bucket per tile for a map at ``zoom``, optionally for
+    one disaster type. Returns ``(precision, buckets)``; the precision is
+    lowered when the box would otherwise span more than MAX_TILE_BUCKETS cells.
+    """
+    min_lat, min_lon, max_lat, max_lon = bbox
+    precision = max(1, min(zoom_precision(zoom), covering_precision(*bbox, max_cells=MAX_TILE_BUCKETS)))
+
+    tiles = ReportTile.objects.filter(report_count__gt=0)
+    if disaster_type:
+        tiles = tiles.filter(disaster_type=disaster_type)
+    # Repeat the precision in every range so each one is an index search
+    cell_filter = Q()
+    for prefix in {cell[:precision] for cell in covering_cells(*bbox)}:
+        if not prefix:
+            cell_filter = Q(precision=precision)
+            break
+        cell_filter |= Q(precision=precision, cell__gte=prefix, cell__lt=prefix + '~')
+
+    rows = tiles.filter(cell_filter).values('cell').annotate(
+        count=Sum('report_count'),
+        people_total=Sum('people_affected'),
+        area_total=Sum('area_affected'),
+        latitude_total=Sum('latitude_sum'),
+        longitude_total=Sum('longitude_sum'),
+        **{field: Sum(field) for field in SEVERITY_FIELDS.values()},
+    ).order_by('cell')
+
+    buckets = []
+    for row in rows:
+        bounds = geohash_bounds(row['cell'])
+        if bounds[0] > max_lat or bounds[2] < min_lat or bounds[1] > max_lon or bounds[3] < min_lon:
+            continue
+        buckets.append({
+            'geohash': row['cell'],
+            'count': row['count'],
+            'max_severity': max(level for level, field in SEVERITY_FIELDS.items() if row[field] > 0),
+            'people_affected': row['people_total'],
+            'area_affected': float(row['area_total']),
+            'latitude': round(row['latitude_total'] / row['count'], 6),
+            'longitude': round(row['longitude_total'] / row['count'], 6),
+            'bounds': [round(value, 6) for value in bounds],
+        })
+    return precision, buckets
@@ -0,0 +1,67 @@
+# Liew Qian Hui 22063182
+"""
+Bulk status changes for disaster reports and aid requests.
+
+Each change is one queryset UPDATE inside a transaction, whose WHERE clause
+also holds the transition rule, so rows that may not make the change are
+skipped by the database rather than loaded and checked one by one.
+Queryset updates send no model signals; the side effects the signals would
+have had (map tiles, triage keys, live events, dashboard counters and page
+versions) are applied here for the whole batch.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .page_cache import REPORT_DATA, AID_REQUEST_DATA, bump_data_version
+from .stats import invalidate_dashboard_stats
+from .tiles import apply_tile_changes, instance_contribution
+from .triage import rescore_requests_near
+from .events import REPORT_ACTIVATED, REPORT_DEACTIVATED, publish_report_event
+
+# new status -> statuses a request may move to it from
+AID_STATUS_TRANSITIONS = {
+    'approved': ('pending',),
+    'rejected': ('pending',),
+    'in_progress': ('approved',),
+    'completed': ('approved', 'in_progress'),
+}
+# Bulk action name -> new aid request status
+AID_BULK_ACTIONS = {'approve': 'approved', 'reject': 'rejected', 'complete': 'completed'}
+REPORT_BULK_ACTIONS = {'activate': True, 'deactivate': False}
+
+
+def set_reports_active(reports, is_active):
+    """Activate or deactivate the reports of a queryset; returns how many changed"""
+    with transaction.atomic():
+        changing = list(reports.exclude(is_active=is_active).order_by())
+        if not changing:
+            return 0
+        reports.exclude(is_active=is_active).update(is_active=is_active, updated_at=timezone.now())
+
+        removed = [instance_contribution(report) for report in changing]
+        for report in changing:
+            report.is_active = is_active
+            publish_report_event(report, REPORT_ACTIVATED if is_active else REPORT_DEACTIVATED)
+        apply_tile_changes(removed=removed, added=[instance_contribution(report) for report in changing])
+        rescore_requests_near([(report.latitude, report.longitude) for report in changing])
+        transaction.on_commit(invalidate_dashboard_stats)
+        transaction.on_commit(lambda: bump_data_version(REPORT_DATA))
+    return len(changing)
+
+
+def transition_aid_requests(aid_requests, new_status, user):
+    """
+    Move the requests of a queryset to ``new_status`` where
+    AID_STATUS_TRANSITIONS allows it; returns how many changed. Approving or
+    rejecting records ``user`` as the reviewing authority.
+    """
+    changes = {'status': new_status, 'updated_at': timezone.now()}
+    if new_status in ('approved', 'rejected'):
+        changes['approved_by'] = user
+    with transaction.atomic():
+        # Requests leaving 'pending' drop out of the triage queue, so their keys need no update
+        updated = aid_requests.filter(status__in=AID_STATUS_TRANSITIONS[new_status]).update(**changes)
+        if updated:
+            transaction.on_commit(invalidate_dashboard_stats)
+            transaction.on_commit(lambda: bump_data_version(AID_REQUEST_DATA))
+    return updated
@@ -0,0 +1,174 @@
+# Liew Qian Hui 22063182
+"""
+Priority triage of pending aid requests.
+
+A request's score is the urgency of its aid type, plus points for the number
+of people, the severity of active disaster reports nearby, and every hour it
+has waited. Waiting adds the same points per hour to every request, so the
+ordering never changes with time alone. Each request therefore stores a
+time-invariant key (its score minus the waiting points since a fixed
+epoch), and the (status, triage_priority) index is the priority queue:
+reading the next N pending requests is an index range read whatever the
+backlog size. Keys are recomputed only when a request is saved while
+pending, or when an active report near it appears, changes or goes away.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from scipy.spatial import cKDTree
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AidRequest, DisasterReport
+from .page_cache import AID_REQUEST_DATA, bump_data_version
+from .spatial import EARTH_RADIUS_KM, bbox_filter, encode_geohash, radius_bbox
+
+AID_TYPE_URGENCY = {'rescue': 40, 'medical': 30, 'shelter': 20, 'food': 10, 'other': 5}
+PEOPLE_WEIGHT = 10  # points per doubling of the people needing aid
+SEVERITY_WEIGHT = 8  # points per severity level of the worst active report nearby
+WAIT_POINTS_PER_HOUR = 2
+TRIAGE_RADIUS_KM = 5
+TRIAGE_GROUP_PRECISION = 3  # points in one ~150km geohash cell share a report lookup
+# TRIAGE_RADIUS_KM as a straight-line distance between points on the unit sphere
+TRIAGE_CHORD = 2 * math.sin(TRIAGE_RADIUS_KM / (2 * EARTH_RADIUS_KM))
+TRIAGE_EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _hours_since_epoch(moment):
+    return (moment - TRIAGE_EPOCH).total_seconds() / 3600
+
+
+def base_score(aid_type, num_people, nearby_severity):
+    """Score of a request before any waiting time"""
+    return (
+        AID_TYPE_URGENCY.get(aid_type, 0)
+        + PEOPLE_WEIGHT * math.log2(1 + max(num_people or 0, 0))
+        + SEVERITY_WEIGHT * nearby_severity
+    )
+
+
+def priority_key(score, requested_at):
+    """Stored ordering key: the score less the waiting points it will earn from the epoch"""
+    return score - WAIT_POINTS_PER_HOUR * _hours_since_epoch(requested_at)
+
+
+def current_score(triage_priority, now=None):
+    """A request's score at ``now``, waiting time included"""
+    return triage_priority + WAIT_POINTS_PER_HOUR * _hours_since_epoch(now or timezone.now())
+
+
+def _unit_vectors(latitudes, longitudes):
+    latitudes = np.radians(np.asarray(latitudes, dtype=np.float64))
+    longitudes = np.radians(np.asarray(longitudes, dtype=np.float64))
+    return np.column_stack((
+        np.cos(latitudes) * np.cos(longitudes),
+        np.cos(latitudes) * np.sin(longitudes),
+        np.sin(latitudes),
+    ))
+
+
+def _group_bboxes(points):
+    """Yield (point indexes, box around them widened by TRIAGE_RADIUS_KM) per geohash group"""
+    groups = defaultdict(list)
+    for index, (latitude, longitude) in enumerate(points):
+        groups[encode_geohash(latitude, longitude, TRIAGE_GROUP_PRECISION)].append(index)
+    for indexes in groups.values():
+        latitudes = [float(points[i][0]) for i in indexes]
+        longitudes = [float(points[i][1]) for i in indexes]
+        # Circles are widest in longitude at the point farthest from the equator
+        widest = max(latitudes, key=abs)
+        west = radius_bbox(widest, min(longitudes), TRIAGE_RADIUS_KM)
+        east = radius_bbox(widest, max(longitudes), TRIAGE_RADIUS_KM)
+        south = radius_bbox(min(latitudes), min(longitudes), TRIAGE_RADIUS_KM)
+        north = radius_bbox(max(latitudes), max(longitudes), TRIAGE_RADIUS_KM)
+        # The western edge may wrap past the eastern one over the antimeridian, as bbox_filter allows
+        yield indexes, (south[0], west[1], north[2], east[3])
+
+
+def nearby_severities(points, reports=None):
+    """
+    Highest severity of the active reports within TRIAGE_RADIUS_KM of each
+    (latitude, longitude) point, 0 where there are none. Each group of
+    nearby points needs one indexed lookup, searched with a k-d tree.
+    """
+    if reports is None:
+        reports = DisasterReport.objects.filter(is_active=True)
+    severities = [0] * len(points)
+    for indexes, box in _group_bboxes(points):
+        nearby = list(reports.filter(bbox_filter(*box)).values_list('latitude', 'longitude', 'severity'))
+        if not nearby:
+            continue
+        report_latitudes, report_longitudes, report_severities = zip(*nearby)
+        tree = cKDTree(_unit_vectors(report_latitudes, report_longitudes))
+        group_points = _unit_vectors([points[i][0] for i in indexes], [points[i][1] for i in indexes])
+        for index, neighbours in zip(indexes, tree.query_ball_point(group_points, TRIAGE_CHORD)):
+            if neighbours:
+                severities[index] = max(report_severities[i] for i in neighbours)
+    return severities
+
+
+def score_aid_requests(aid_requests, reports=None):
+    """Set ``triage_priority`` on each request (without saving); returns those that changed"""
+    severities = nearby_severities([(request.latitude, request.longitude) for request in aid_requests], reports)
+    changed = []
+    for aid_request, severity in zip(aid_requests, severities):
+        key = priority_key(
+            base_score(aid_request.aid_type, aid_request.num_people, severity), aid_request.requested_at
+        )
+        if key != aid_request.triage_priority:
+            aid_request.triage_priority = key
+            changed.append(aid_request)
+    return changed
+
+
+def rescore_requests_near(points):
+    """Recompute the pending requests within TRIAGE_RADIUS_KM of any of ``points``"""
+    pending = {}
+    for _, box in _group_bboxes(points):
+        for aid_request in AidRequest.objects.filter(bbox_filter(*box), status='pending').only(
+            'id', 'aid_type', 'num_people', 'latitude', 'longitude', 'requested_at', 'triage_priority'
+        ):
+            pending[aid_request.pk] = aid_request
+    if not pending:
+        return 0
+
+    return _save_scores(list(pending.values()))
+
+
+def triage_queue(limit):
+    """The ``limit`` pending requests to review next, highest priority first"""
+    # Both descending, so a backward walk of the (status, triage_priority) index is the order
+    return AidRequest.objects.filter(status='pending').order_by('-triage_priority', '-id')[:limit]
+
+
+def rebuild_triage(chunk_size=2000):
+    """Recompute the key of every pending request; returns how many changed"""
+    reports = DisasterReport.objects.filter(is_active=True)
+    pending = AidRequest.objects.filter(status='pending').order_by('geohash').only(
+        'id', 'aid_type', 'num_people', 'latitude', 'longitude', 'requested_at', 'triage_priority'
+    )
+    total = 0
+    batch = []
+    for aid_request in pending.iterator(chunk_size=chunk_size):
+        batch.append(aid_request)
+        if len(batch) >= chunk_size:
+            total += _save_scores(batch, reports)
+            batch = []
+    if batch:
+        total += _save_scores(batch, reports)
+    return total
+
+
+def _save_scores(aid_requests, reports=None):
+    """Score ``aid_requests`` and save those that changed; returns how many did"""
+    changed = score_aid_requests(aid_requests, reports)
+    if changed:
+        # bulk_update sends no model signals
+        now = timezone.now()
+        for aid_request in changed:
+            aid_request.updated_at = now
+        AidRequest.objects.bulk_update(changed, ['triage_priority', 'updated_at'], batch_size=500)
+        transaction.on_commit(lambda: bump_data_version(AID_REQUEST_DATA))
+    return len(changed)
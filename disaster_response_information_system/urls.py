@@ -9,6 +9,7 @@ urlpatterns = [
     path('disaster_reports/create/', views.disaster_report_create, name='disaster_report_create'),
     path('disaster_reports/<int:report_id>/', views.disaster_report_detail, name='disaster_report_detail'),
     path('disaster_reports/<int:report_id>/update_status/', views.update_disaster_status, name='update_disaster_status'),
+    path('incident/<int:incident_id>/update_status/', views.update_incident_status, name='update_incident_status'),
     path('shelters/', views.shelters, name='shelters'),
 
     # Authentication URLs
@@ -33,15 +34,27 @@ urlpatterns = [
     # Authority management actions
     path('toggle-disaster-report-status/<int:report_id>/', views.toggle_disaster_report_status, name='toggle_disaster_report_status'),
     path('update-aid-request-status/<int:request_id>/<str:new_status>/', views.update_aid_request_status, name='update_aid_request_status'),
+    path('disaster-reports/bulk-status/', views.bulk_update_disaster_reports, name='bulk_update_disaster_reports'),
+    path('aid-requests/bulk-status/', views.bulk_update_aid_requests, name='bulk_update_aid_requests'),
     path('shelter/create/', views.shelter_create, name='shelter_create'),
     path('shelter/edit/<int:shelter_id>/', views.shelter_edit, name='shelter_edit'),
     path('toggle-shelter-status/<int:shelter_id>/', views.toggle_shelter_status, name='toggle_shelter_status'),
     path('assign-volunteer/<int:volunteer_id>/', views.assign_volunteer, name='assign_volunteer'),
     path('assign-volunteer-to-request/', views.assign_volunteer_to_request, name='assign_volunteer_to_request'),
+    path('assign-volunteers/batch/', views.batch_assign_volunteers, name='batch_assign_volunteers'),
+    path('import/', views.bulk_import, name='bulk_import'),
+    path('export/<str:kind>.<str:file_format>', views.export_data, name='export_data'),
 
     # API Endpoints
     path('api/aid-request/<int:request_id>/', views.api_aid_request_detail, name='api_aid_request_detail'),
+    path('api/aid-requests/triage/', views.api_triage_queue, name='api_triage_queue'),
     path('api/available-volunteers-for-aid/<int:request_id>/', views.api_available_volunteers, name='api_available_volunteers'),
+    path('api/search/', views.api_search, name='api_search'),
+    path('api/reports/tiles/', views.api_report_tiles, name='api_report_tiles'),
+    path('api/reports/stream/', views.report_event_stream, name='report_event_stream'),
+    path('api/shelter/<int:shelter_id>/occupancy/batch/', views.api_shelter_occupancy_batch, name='api_shelter_occupancy_batch'),
+    path('api/shelter/<int:shelter_id>/check-in/', views.api_shelter_occupancy, {'action': 'check-in'}, name='api_shelter_check_in'),
+    path('api/shelter/<int:shelter_id>/check-out/', views.api_shelter_occupancy, {'action': 'check-out'}, name='api_shelter_check_out'),
     path('api/volunteer-profile/<int:volunteer_id>/', views.api_volunteer_profile, name='api_volunteer_profile'),
 
     # User management
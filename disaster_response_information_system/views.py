@@ -1,109 +1,262 @@
 # Liew Qian Hui 22063182
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.urls import reverse
 from django.contrib.auth import login, logout
 from django.contrib import messages
 from django.utils import timezone
-from django.core.paginator import Paginator
-from django.db.models import Q, F
-from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import Q, F, Count, Sum, Value, Case, When, Exists, OuterRef, Subquery
+from django.db.models.functions import Greatest, Coalesce
+import hashlib
+from urllib.parse import urlencode
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import JsonResponse
-
-from .models import User, DisasterReport, AidRequest, VolunteerProfile, Skill, Shelter, VolunteerAssignment
+from django.http import JsonResponse, StreamingHttpResponse, Http404
+from django.views.decorators.http import require_POST
+from django.db import transaction
+import json
+import asyncio
+import numpy as np
+
+from .models import User, DisasterReport, AidRequest, VolunteerProfile, Skill, Shelter, VolunteerAssignment, Incident
 from .forms import DisasterReportFilterForm, UserRegistrationForm, AidRequestForm, VolunteerProfileForm, DisasterReportForm, ShelterForm
+from .spatial import haversine_km_array, parse_coordinates
+from .stats import get_dashboard_stats
+from .matching import (
+    plan_assignments, commit_assignments, sign_plan, load_plan, unassigned_approved_requests, MatchingConflict,
+    AID_SKILL_KEYWORDS,
+)
+from .pagination import paginate_keyset, apaginate_keyset, InvalidCursor
+from .search import text_search, get_search_backend
+from .importers import IMPORT_SPECS, guess_format, import_records
+from .exporters import EXPORT_SPECS, EXPORT_FORMATS, export_records
+from .events import (
+    report_events, publish_report_event, format_sse, ReportEventFilter, HIGH_SEVERITY,
+    REPORT_ACTIVATED, REPORT_DEACTIVATED, REPORT_SUBMITTED,
+)
+from .page_cache import (
+    REPORT_DATA, SHELTER_DATA, AID_REQUEST_DATA, VOLUNTEER_DATA, ASSIGNMENT_DATA, USER_DATA,
+    data_version, cached_fragment, page_cache_stats, bump_data_version,
+)
+from .conditional import conditional_view
+from .tiles import report_tile_buckets
+from .incidents import link_duplicates, set_incident_active
+from .transitions import (
+    AID_BULK_ACTIONS, AID_STATUS_TRANSITIONS, REPORT_BULK_ACTIONS, set_reports_active, transition_aid_requests,
+)
+from .triage import triage_queue, current_score
+from .locking import write_view, retry_on_lock
+from .filters import REPORT_SORT_ORDERINGS, filter_disaster_reports, filter_dashboard_reports, filter_dashboard_aid_requests
+
+NEAREST_SHELTERS_LIMIT = 20
+API_PAGE_SIZE = 50
+REPORTS_PAGE_SIZE = 6
+SEARCH_RESULTS_LIMIT = 20
+REPORT_COUNT_TIMEOUT = 60  # seconds an approximate listing total is reused
+API_MAX_PAGE_SIZE = 200
+SSE_KEEPALIVE_SECONDS = 15
+SSE_RETRY_MS = 5000
 
 # Helper functions
 def is_authority(user):
     return user.is_authenticated and user.user_role == 'authority'
 
+def rank_shelters_by_distance(shelters_query, latitude, longitude, limit=NEAREST_SHELTERS_LIMIT):
+    """
+    Return the nearest shelters that still have space, closest first.
+
+    Only the id, coordinates and occupancy columns are read for ranking; full
+    Shelter objects are loaded for the top ``limit`` rows alone.
+    """
+    rows = np.array(
+        shelters_query.values_list('id', 'latitude', 'longitude', 'capacity', 'current_occupancy'),
+        dtype=np.float64,
+    ).reshape(-1, 5)
+    if not len(rows):
+        return []
+
+    distances = haversine_km_array(latitude, longitude, rows[:, 1], rows[:, 2])
+    availability = np.maximum(rows[:, 3] - rows[:, 4], 0)
+
+    # Shelters with space first, then by distance, then by remaining space
+    order = np.lexsort((-availability, distances, availability <= 0))[:limit]
+    ids = rows[order, 0].astype(np.int64).tolist()
+
+    shelters_by_id = Shelter.objects.in_bulk(ids)
+    ranked = []
+    for shelter_id, distance in zip(ids, distances[order]):
+        shelter = shelters_by_id[shelter_id]
+        shelter.distance_km = round(float(distance), 1)
+        ranked.append(shelter)
+    return ranked
+
 def home(request):
     """Home page view"""
     return render(request, 'home.html')
 
+@conditional_view(REPORT_DATA, model=DisasterReport, per_user=True, time_dependent=lambda request: bool(request.GET.get('date_range')))
 def disaster_reports(request):
     """Disaster reports listing page with filtering"""
     # Initialize the filter form with GET parameters
     filter_form = DisasterReportFilterForm(request.GET or None)
+    authority = is_authority(request.user)
 
-    if request.user.is_authenticated and request.user.user_role == 'authority':
-        reports = DisasterReport.objects.all()
-    else:
-        reports = DisasterReport.objects.filter(is_active=True)
-
-    # Apply filters if form is valid
+    # Normalized filters: only valid, non-empty values, so equivalent URLs share cache entries
+    filter_params = {}
     if filter_form.is_valid():
-        # Filter by disaster type
-        if filter_form.cleaned_data['disaster_type']:
-            reports = reports.filter(disaster_type=filter_form.cleaned_data['disaster_type'])
-
-        # Filter by severity
-        if filter_form.cleaned_data['severity']:
-            reports = reports.filter(severity=filter_form.cleaned_data['severity'])
-
-        # Filter by date range
-        date_range = filter_form.cleaned_data['date_range']
-        if date_range == 'today':
-            today = timezone.now().date()
-            reports = reports.filter(reported_at__date=today)
-        elif date_range == 'week':
-            one_week_ago = timezone.now() - timedelta(days=7)
-            reports = reports.filter(reported_at__gte=one_week_ago)
-        elif date_range == 'month':
-            one_month_ago = timezone.now() - timedelta(days=30)
-            reports = reports.filter(reported_at__gte=one_month_ago)
-
-        # Filter by location (case-insensitive partial match)
-        if filter_form.cleaned_data['location']:
-            location_query = filter_form.cleaned_data['location']
-            reports = reports.filter(location__icontains=location_query)
-
-        # Sort results
-        sort_by = filter_form.cleaned_data['sort_by']
-        if sort_by == 'newest':
-            reports = reports.order_by('-reported_at')
-        elif sort_by == 'oldest':
-            reports = reports.order_by('reported_at')
-        elif sort_by == 'severity_high':
-            reports = reports.order_by('-severity')
-        elif sort_by == 'severity_low':
-            reports = reports.order_by('severity')
-
-    # Default sort by newest
-    else:
-        reports = reports.order_by('-reported_at')
+        filter_params = {name: value for name, value in filter_form.cleaned_data.items() if value}
+    sort_by = filter_params.get('sort_by', 'date_desc')
+    cursor = request.GET.get('cursor', '')
+    # Date ranges move with the clock, so their cached results are kept per minute, like their ETags
+    time_bucket = timezone.now().strftime('%Y%m%d%H%M') if filter_params.get('date_range') else ''
+
+    def render_report_list():
+        if authority:
+            reports = DisasterReport.objects.select_related('reporter')
+        else:
+            reports = DisasterReport.objects.filter(is_active=True).select_related('reporter')
+
+        # Apply filters if form is valid
+        if filter_form.is_valid():
+            reports = filter_disaster_reports(reports, filter_form)
+
+        # Keyset pagination: each page seeks past the previous page's last sort key
+        try:
+            reports_page = paginate_keyset(
+                reports, REPORT_SORT_ORDERINGS[sort_by], cursor=cursor, page_size=REPORTS_PAGE_SIZE
+            )
+        except InvalidCursor:
+            reports_page = paginate_keyset(reports, REPORT_SORT_ORDERINGS[sort_by], page_size=REPORTS_PAGE_SIZE)
+
+        # The filtered count is cached per data version instead of run per page
+        count_key = 'dris:report_count:{}:'.format(data_version(REPORT_DATA)) + hashlib.md5(
+            f'{authority}:{time_bucket}:{urlencode(sorted(filter_params.items()))}'.encode()
+        ).hexdigest()
+        approximate_total = cache.get(count_key)
+        if approximate_total is None:
+            approximate_total = reports.count()
+            cache.set(count_key, approximate_total, REPORT_COUNT_TIMEOUT)
+
+        def page_query(page_cursor):
+            return urlencode({**filter_params, 'cursor': page_cursor})
 
-    # Pagination
-    paginator = Paginator(reports, 6)  # Show 6 reports per page
-    page_number = request.GET.get('page', 1)
-    reports = paginator.get_page(page_number)
+        context = {
+            'reports': reports_page,
+            'approximate_total': approximate_total,
+            'filtered': bool(filter_params),
+            'next_page_query': page_query(reports_page.next_cursor) if reports_page.has_next() else '',
+            'previous_page_query': page_query(reports_page.previous_cursor) if reports_page.has_previous() else '',
+            'first_page_query': urlencode(filter_params),
+        }
+        return render_to_string('partials/disaster_report_list.html', context, request)
+
+    # Everyone but authorities sees the same listing, so it is served from the versioned cache
+    if authority:
+        report_list = mark_safe(render_report_list())
+    else:
+        report_list = cached_fragment(
+            'disaster_reports', REPORT_DATA, {**filter_params, 'cursor': cursor, 'minute': time_bucket}, render_report_list
+        )
 
     context = {
         'filter_form': filter_form,
-        'reports': reports,
+        'report_list': report_list,
     }
     return render(request, 'disaster_reports.html', context)
 
+async def report_event_stream(request):
+    """
+    Server-sent events feed of report alerts, filterable by disaster_type
+    (repeatable), severity (minimum level) and bbox=min_lat,min_lon,max_lat,max_lon.
+    Authorities also receive new high-severity reports awaiting verification.
+    Serve under ASGI so idle connections hold no worker thread.
+    """
+    disaster_types = [t for t in request.GET.getlist('disaster_type') if t in dict(DisasterReport.DISASTER_TYPES)]
+    min_severity = None
+    bbox = None
+    try:
+        if request.GET.get('severity'):
+            min_severity = int(request.GET['severity'])
+        if request.GET.get('bbox'):
+            bbox = tuple(float(value) for value in request.GET['bbox'].split(','))
+            if len(bbox) != 4 or parse_coordinates(*bbox[:2]) is None or parse_coordinates(*bbox[2:]) is None:
+                raise ValueError
+    except ValueError:
+        return JsonResponse({'error': 'Invalid severity or bbox'}, status=400)
+
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+
+    user = await request.auser()
+    event_filter = ReportEventFilter(
+        disaster_types, min_severity, bbox,
+        include_unverified=user.is_authenticated and user.user_role == 'authority',
+    )
+
+    async def stream():
+        subscription, missed = report_events.subscribe(event_filter, last_event_id)
+        try:
+            yield f'retry: {SSE_RETRY_MS}\n\n'
+            for event in missed:
+                yield format_sse(event)
+            # A client that falls a full queue behind is dropped; it reconnects and replays via Last-Event-ID
+            while not subscription.overflowed:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_sse(event)
+        finally:
+            report_events.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # stop nginx from buffering the stream
+    return response
+
+@conditional_view(REPORT_DATA, model=DisasterReport, per_user=True)
 def disaster_report_detail(request, report_id):
     """Detailed view of a specific disaster report"""
     # Authorities can view all reports, others only active reports
     if request.user.is_authenticated and request.user.user_role == 'authority':
-        report = get_object_or_404(DisasterReport, pk=report_id)
+        report = get_object_or_404(DisasterReport.objects.select_related('reporter'), pk=report_id)
+        related_reports = []
+        if report.incident_id:
+            related_reports = list(
+                DisasterReport.objects.filter(incident_id=report.incident_id).exclude(pk=report.pk)
+                .only('id', 'location', 'severity', 'reported_at', 'is_active').order_by('-reported_at')
+            )
+        report_detail = render_to_string('partials/disaster_report_detail.html', {
+            'report': report,
+            'related_reports': related_reports,
+        }, request)
+        report_detail = mark_safe(report_detail)
     else:
-        report = get_object_or_404(DisasterReport, pk=report_id, is_active=True)
+        def render_report_detail():
+            report = get_object_or_404(DisasterReport.objects.select_related('reporter'), pk=report_id, is_active=True)
+            return render_to_string('partials/disaster_report_detail.html', {'report': report}, request)
+
+        report_detail = cached_fragment('disaster_report_detail', REPORT_DATA, {'id': report_id}, render_report_detail)
 
     context = {
-        'report': report
+        'report_detail': report_detail
     }
     return render(request, 'disaster_report_details.html', context)
 
 @login_required
 @user_passes_test(is_authority)
+@write_view
 def update_disaster_status(request, report_id):
     """Allow authorities to activate or deactivate a disaster report"""
     report = get_object_or_404(DisasterReport, pk=report_id)
 
     if request.method == 'POST':
         action = request.POST.get('action')
+        was_active = report.is_active
         if action == 'activate':
             report.is_active = True
             messages.success(request, f"The disaster report for {report.location} has been activated and is now publicly visible.")
@@ -112,10 +265,32 @@ def update_disaster_status(request, report_id):
             messages.success(request, f"The disaster report for {report.location} has been deactivated and is no longer publicly visible.")
 
         report.save()
+        if report.is_active != was_active:
+            publish_report_event(report, REPORT_ACTIVATED if report.is_active else REPORT_DEACTIVATED)
 
     # Redirect back to the detail page
     return redirect('disaster_report_detail', report_id=report.id)
 
+@login_required
+@user_passes_test(is_authority)
+@require_POST
+@write_view
+def update_incident_status(request, incident_id):
+    """Allow authorities to activate or deactivate every report of an incident"""
+    incident = get_object_or_404(Incident, pk=incident_id)
+    action = request.POST.get('action')
+    if action not in ('activate', 'deactivate'):
+        messages.error(request, 'Unknown action.')
+    else:
+        changed = set_incident_active(incident, action == 'activate')
+        messages.success(request, f"{changed} report(s) in incident #{incident.pk} have been {action}d.")
+
+    report_id = request.POST.get('report_id')
+    if report_id and report_id.isdigit():
+        return redirect('disaster_report_detail', report_id=int(report_id))
+    return redirect('admin_dashboard')
+
+@conditional_view(SHELTER_DATA, model=Shelter, per_user=True)
 def shelters(request):
     """Shelters listing page with filtering"""
     # Start with all active shelters
@@ -126,12 +301,9 @@ def shelters(request):
     capacity_filter = request.GET.get('capacity', 'all')
     availability_filter = request.GET.get('availability', 'all')
 
-    # Apply location filter (case-insensitive partial match)
+    # Apply location filter (full-text, prefix match on each word of name or address)
     if location_filter:
-        shelters_query = shelters_query.filter(
-            Q(name__icontains=location_filter) |
-            Q(address__icontains=location_filter)
-        )
+        shelters_query = text_search(shelters_query, location_filter)
 
     # Apply capacity filter
     if capacity_filter == 'small':
@@ -147,26 +319,35 @@ def shelters(request):
     elif availability_filter == 'full':
         shelters_query = shelters_query.filter(current_occupancy__gte=F('capacity'))
 
-    # Calculate shelter statistics
-    total_shelters = shelters_query.count()
-    available_shelters = shelters_query.exclude(current_occupancy__gte=F('capacity')).count()
-    available_capacity = sum(
-        max(0, shelter.capacity - shelter.current_occupancy)
-        for shelter in shelters_query
+    # Calculate shelter statistics in a single aggregate query
+    stats = shelters_query.aggregate(
+        total_shelters=Count('id'),
+        available_shelters=Count('id', filter=Q(current_occupancy__lt=F('capacity'))),
+        available_capacity=Sum(Greatest(F('capacity') - F('current_occupancy'), Value(0))),
     )
 
+    # Rank by distance and remaining space when the citizen shares a location
+    coordinates = parse_coordinates(request.GET.get('lat'), request.GET.get('lng'))
+    if coordinates:
+        shelters_list = rank_shelters_by_distance(shelters_query, *coordinates)
+    else:
+        shelters_list = shelters_query
+
     context = {
-        'shelters': shelters_query,
-        'total_shelters': total_shelters,
-        'available_shelters': available_shelters,
-        'available_capacity': available_capacity,
+        'shelters': shelters_list,
+        'total_shelters': stats['total_shelters'],
+        'available_shelters': stats['available_shelters'],
+        'available_capacity': stats['available_capacity'] or 0,
         'location_filter': location_filter,
         'capacity_filter': capacity_filter,
-        'availability_filter': availability_filter
+        'availability_filter': availability_filter,
+        'lat': coordinates[0] if coordinates else '',
+        'lng': coordinates[1] if coordinates else '',
     }
 
     return render(request, 'shelters.html', context)
 
+@write_view
 def register(request):
     """User registration view"""
     initial_data = {}
@@ -196,6 +377,7 @@ def register(request):
     return render(request, 'auth/register.html', {'form': form})
 
 @login_required
+@write_view
 def aid_request_create(request):
     """View for citizens to create aid requests"""
     # Check if user has citizen role
@@ -223,11 +405,14 @@ def my_aid_requests(request):
         messages.error(request, 'Only citizens can access this page.')
         return redirect('home')
 
-    aid_requests = AidRequest.objects.filter(requester=request.user).order_by('-requested_at')
+    aid_requests = AidRequest.objects.filter(requester=request.user).select_related(
+        'approved_by', 'shelter'
+    ).order_by('-requested_at')
 
     return render(request, 'my_aid_requests.html', {'aid_requests': aid_requests})
 
 @login_required
+@write_view
 def volunteer_profile(request):
     """View for volunteers to manage their profile and availability"""
     if request.user.user_role != 'volunteer':
@@ -255,7 +440,7 @@ def my_assignments(request):
         messages.error(request, 'Only volunteers can access this page.')
         return redirect('home')
 
-    assignments = request.user.assignments.all().order_by('-assigned_at')
+    assignments = request.user.assignments.select_related('aid_request__requester', 'assigned_by').order_by('-assigned_at')
 
     return render(request, 'my_assignments.html', {'assignments': assignments})
 
@@ -263,31 +448,17 @@ def my_assignments(request):
 @user_passes_test(is_authority)
 def admin_dashboard(request):
     """Admin dashboard for authority users"""
-    # Count statistics
-    total_reports = DisasterReport.objects.count()
-    active_reports = DisasterReport.objects.filter(is_active=True).count()
-    inactive_reports = total_reports - active_reports
-
-    total_aid_requests = AidRequest.objects.count()
-    pending_aid_requests = AidRequest.objects.filter(status='pending').count()
-    volunteers_count = User.objects.filter(user_role='volunteer').count()
-    available_volunteers = VolunteerProfile.objects.filter(availability='available').count()
+    # Count statistics (cached, invalidated by model signals)
+    stats = get_dashboard_stats()
 
     # Filter disaster reports
     filter_type = request.GET.get('filter_type', '')
     filter_severity = request.GET.get('filter_severity', '')
     filter_status = request.GET.get('filter_status', '')
 
-    disaster_reports = DisasterReport.objects.all().order_by('-reported_at')
-
-    if filter_type:
-        disaster_reports = disaster_reports.filter(disaster_type=filter_type)
-    if filter_severity:
-        disaster_reports = disaster_reports.filter(severity=filter_severity)
-    if filter_status == 'active':
-        disaster_reports = disaster_reports.filter(is_active=True)
-    elif filter_status == 'inactive':
-        disaster_reports = disaster_reports.filter(is_active=False)
+    disaster_reports = filter_dashboard_reports(
+        DisasterReport.objects.select_related('reporter').order_by('-reported_at'), request.GET
+    )
 
     # Filter users
     user_filter_role = request.GET.get('user_filter_role', '')
@@ -313,12 +484,12 @@ def admin_dashboard(request):
     aid_filter_type = request.GET.get('aid_filter_type', '')
     aid_filter_status = request.GET.get('aid_filter_status', '')
 
-    aid_requests = AidRequest.objects.all().order_by('-requested_at')
-
-    if aid_filter_type:
-        aid_requests = aid_requests.filter(aid_type=aid_filter_type)
-    if aid_filter_status:
-        aid_requests = aid_requests.filter(status=aid_filter_status)
+    aid_requests = filter_dashboard_aid_requests(
+        AidRequest.objects.select_related('requester').order_by('-requested_at'), request.GET
+    )
+    if aid_filter_status == 'pending':
+        # Pending requests are reviewed in triage order
+        aid_requests = aid_requests.order_by('-triage_priority', '-id')
 
     # Filter shelters
     shelter_filter_status = request.GET.get('shelter_filter_status', '')
@@ -340,7 +511,9 @@ def admin_dashboard(request):
     volunteer_filter_status = request.GET.get('volunteer_filter_status', '')
     volunteer_filter_skill = request.GET.get('volunteer_filter_skill', '')
 
-    volunteers = VolunteerProfile.objects.select_related('user').all()
+    volunteers = VolunteerProfile.objects.select_related('user').prefetch_related('skills').annotate(
+        assignments_count=Count('user__assignments', distinct=True)
+    )
 
     if volunteer_filter_status == 'available':
         volunteers = volunteers.filter(availability='available')
@@ -361,13 +534,8 @@ def admin_dashboard(request):
     user_role_choices = User.USER_ROLES
 
     context = {
-        'total_reports': total_reports,
-        'active_reports': active_reports,
-        'inactive_reports': inactive_reports,
-        'total_aid_requests': total_aid_requests,
-        'pending_aid_requests': pending_aid_requests,
-        'volunteers_count': volunteers_count,
-        'available_volunteers': available_volunteers,
+        **stats,
+        'page_cache_stats': page_cache_stats(),
         'disaster_reports': disaster_reports[:10],  # Limit to 10 for dashboard
         'aid_requests': aid_requests[:10],  # Limit to 10 for dashboard
         'shelters': shelters[:10],  # Limit to 10 for dashboard
@@ -397,6 +565,7 @@ def admin_dashboard(request):
 
     return render(request, 'admin_dashboard.html', context)
 
+@write_view
 def disaster_report_create(request):
     """View for citizens to create disaster reports"""
     # Check if user has citizen role
@@ -410,7 +579,13 @@ def disaster_report_create(request):
             disaster_report = form.save(commit=False)
             disaster_report.reporter = request.user
             disaster_report.save()
-            messages.success(request, 'Disaster report submitted successfully.')
+            incident = link_duplicates(disaster_report)
+            if disaster_report.severity >= HIGH_SEVERITY:
+                publish_report_event(disaster_report, REPORT_SUBMITTED)
+            if incident:
+                messages.success(request, 'Disaster report submitted successfully. Similar reports were made nearby, so authorities will review them together.')
+            else:
+                messages.success(request, 'Disaster report submitted successfully.')
             return redirect('disaster_reports')
     else:
         form = DisasterReportForm()
@@ -418,6 +593,7 @@ def disaster_report_create(request):
     return render(request, 'disaster_report_create.html', {'form': form})
 
 @login_required
+@write_view(methods=('GET', 'POST'))
 def toggle_disaster_report_status(request, report_id):
     """Toggle a disaster report's active status"""
     if request.user.user_role != 'authority':
@@ -427,6 +603,7 @@ def toggle_disaster_report_status(request, report_id):
     report = get_object_or_404(DisasterReport, pk=report_id)
     report.is_active = not report.is_active
     report.save()
+    publish_report_event(report, REPORT_ACTIVATED if report.is_active else REPORT_DEACTIVATED)
 
     status = "activated" if report.is_active else "deactivated"
     messages.success(request, f'Disaster report has been {status}.')
@@ -435,6 +612,7 @@ def toggle_disaster_report_status(request, report_id):
     return redirect(request.META.get('HTTP_REFERER', 'admin_dashboard'))
 
 @login_required
+@write_view(methods=('GET', 'POST'))
 def update_aid_request_status(request, request_id, new_status):
     """Update an aid request's status"""
     if request.user.user_role != 'authority':
@@ -462,7 +640,57 @@ def update_aid_request_status(request, request_id, new_status):
     # Return to the previous page or admin dashboard
     return redirect(request.META.get('HTTP_REFERER', 'admin_dashboard'))
 
+def _bulk_selection(request, queryset, apply_filters):
+    """
+    The rows a bulk action targets: the checked ``ids``, or with
+    ``apply_to=filtered`` every row matching the posted dashboard filters.
+    Returns None when nothing valid was selected.
+    """
+    if request.POST.get('apply_to') == 'filtered':
+        return apply_filters(queryset, request.POST)
+    ids = [value for value in request.POST.getlist('ids') if value.isdigit()]
+    if not ids:
+        return None
+    return queryset.filter(pk__in=ids)
+
+@login_required
+@user_passes_test(is_authority)
+@require_POST
+@write_view
+def bulk_update_disaster_reports(request):
+    """Activate or deactivate many disaster reports in one transaction"""
+    action = request.POST.get('action')
+    reports = _bulk_selection(request, DisasterReport.objects.all(), filter_dashboard_reports)
+    if action not in REPORT_BULK_ACTIONS:
+        messages.error(request, 'Unknown action.')
+    elif reports is None:
+        messages.error(request, 'No disaster reports were selected.')
+    else:
+        changed = set_reports_active(reports, REPORT_BULK_ACTIONS[action])
+        messages.success(request, f'{changed} disaster report(s) have been {action}d.')
+    return redirect(request.META.get('HTTP_REFERER', 'admin_dashboard'))
+
+@login_required
+@user_passes_test(is_authority)
+@require_POST
+@write_view
+def bulk_update_aid_requests(request):
+    """Approve, reject or complete many aid requests in one transaction"""
+    action = request.POST.get('action')
+    aid_requests = _bulk_selection(request, AidRequest.objects.all(), filter_dashboard_aid_requests)
+    if action not in AID_BULK_ACTIONS:
+        messages.error(request, 'Unknown action.')
+    elif aid_requests is None:
+        messages.error(request, 'No aid requests were selected.')
+    else:
+        new_status = AID_BULK_ACTIONS[action]
+        changed = transition_aid_requests(aid_requests, new_status, request.user)
+        allowed = ' or '.join(AID_STATUS_TRANSITIONS[new_status])
+        messages.success(request, f'{changed} aid request(s) have been updated to {new_status}. Selected requests that were not {allowed} were left unchanged.')
+    return redirect(request.META.get('HTTP_REFERER', 'admin_dashboard'))
+
 @login_required
+@write_view
 def shelter_create(request):
     """Create a new shelter (authority only)"""
     if request.user.user_role != 'authority':
@@ -486,6 +714,7 @@ def shelter_create(request):
     return render(request, 'shelter_form.html', context)
 
 @login_required
+@write_view
 def shelter_edit(request, shelter_id):
     """Edit an existing shelter (authority only)"""
     if request.user.user_role != 'authority':
@@ -497,7 +726,9 @@ def shelter_edit(request, shelter_id):
     if request.method == 'POST':
         form = ShelterForm(request.POST, instance=shelter)
         if form.is_valid():
-            form.save()
+            # Write only the edited fields so intake desks' occupancy updates are not overwritten
+            if form.changed_data:
+                form.save(commit=False).save(update_fields=form.changed_data)
             messages.success(request, f'Shelter "{shelter.name}" updated successfully!')
             return redirect('admin_dashboard')
     else:
@@ -512,6 +743,7 @@ def shelter_edit(request, shelter_id):
     return render(request, 'shelter_form.html', context)
 
 @login_required
+@write_view(methods=('GET', 'POST'))
 def toggle_shelter_status(request, shelter_id):
     """Toggle a shelter's active status (authority only)"""
     if request.user.user_role != 'authority':
@@ -528,6 +760,7 @@ def toggle_shelter_status(request, shelter_id):
     return redirect('admin_dashboard')
 
 @login_required
+@write_view
 def assign_volunteer(request, volunteer_id):
     """Go to form to assign a volunteer to tasks"""
     if request.user.user_role != 'authority':
@@ -593,8 +826,92 @@ def assign_volunteer(request, volunteer_id):
         messages.error(request, 'Volunteer profile not found.')
         return redirect('admin_dashboard')
 
+def _shelter_occupancy_data(shelter_id):
+    capacity, occupancy = Shelter.objects.filter(pk=shelter_id).values_list('capacity', 'current_occupancy').get()
+    return {
+        'id': shelter_id,
+        'capacity': capacity,
+        'current_occupancy': occupancy,
+        'availability': max(0, capacity - occupancy),
+        'is_full': occupancy >= capacity,
+    }
+
+def _apply_occupancy_delta(shelter_id, delta):
+    """
+    Atomically add ``delta`` people to a shelter's occupancy.
+
+    The guard lives in the UPDATE's WHERE clause, so concurrent desks cannot
+    push occupancy above capacity or below zero. Returns False if refused.
+    """
+    shelters = Shelter.objects.filter(pk=shelter_id, is_active=True)
+    if delta > 0:
+        shelters = shelters.filter(current_occupancy__lte=F('capacity') - delta)
+    else:
+        shelters = shelters.filter(current_occupancy__gte=-delta)
+    if shelters.update(current_occupancy=F('current_occupancy') + delta, updated_at=timezone.now()) != 1:
+        return False
+    # Queryset updates send no model signals
+    transaction.on_commit(lambda: bump_data_version(SHELTER_DATA))
+    return True
+
+@login_required
+@user_passes_test(is_authority)
+@require_POST
+@write_view
+def api_shelter_occupancy(request, shelter_id, action):
+    """API endpoint to check people in or out of a shelter (POST count, default 1)"""
+    get_object_or_404(Shelter, pk=shelter_id, is_active=True)
+
+    try:
+        count = int(request.POST.get('count', 1))
+    except ValueError:
+        count = 0
+    if count < 1:
+        return JsonResponse({'error': 'count must be a positive integer.'}, status=400)
+
+    delta = count if action == 'check-in' else -count
+    if not _apply_occupancy_delta(shelter_id, delta):
+        data = _shelter_occupancy_data(shelter_id)
+        data['error'] = 'Not enough space in shelter.' if delta > 0 else 'Occupancy cannot go below zero.'
+        return JsonResponse(data, status=409)
+
+    return JsonResponse(_shelter_occupancy_data(shelter_id))
+
 @login_required
 @user_passes_test(is_authority)
+@require_POST
+@write_view
+def api_shelter_occupancy_batch(request, shelter_id):
+    """
+    API endpoint for a desk replaying queued check-ins/outs after being offline.
+
+    Expects a JSON body ``{"deltas": [3, -1, ...]}``; deltas are applied in
+    order, each under the same capacity guard, and refused ones are reported.
+    """
+    get_object_or_404(Shelter, pk=shelter_id, is_active=True)
+
+    try:
+        deltas = json.loads(request.body)['deltas']
+        if not isinstance(deltas, list) or not all(
+            isinstance(delta, int) and not isinstance(delta, bool) for delta in deltas
+        ):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected a JSON body like {"deltas": [3, -1]}.'}, status=400)
+
+    results = []
+    with transaction.atomic():
+        for delta in deltas:
+            results.append({'delta': delta, 'applied': delta == 0 or _apply_occupancy_delta(shelter_id, delta)})
+
+    data = _shelter_occupancy_data(shelter_id)
+    data['results'] = results
+    data['rejected'] = sum(1 for result in results if not result['applied'])
+    return JsonResponse(data)
+
+@login_required
+@user_passes_test(is_authority)
+@write_view
 def assign_volunteer_to_request(request):
     """Process the volunteer assignment form submission"""
     if request.method != 'POST':
@@ -656,6 +973,83 @@ def assign_volunteer_to_request(request):
 
     return redirect('admin_dashboard')
 
+@login_required
+@user_passes_test(is_authority)
+def batch_assign_volunteers(request):
+    """Preview (GET) or commit (POST) a batch matching of volunteers to approved aid requests"""
+    if request.method == 'POST':
+        # Commit exactly the previewed plan; anything changed since then is a conflict
+        try:
+            matches = load_plan(request.POST.get('plan', ''))
+            created = retry_on_lock(commit_assignments, matches, request.user, notes=request.POST.get('notes', ''))
+        except MatchingConflict as e:
+            messages.error(request, f'{e} Please review the preview again.')
+            return redirect('batch_assign_volunteers')
+
+        messages.success(request, f'{len(created)} volunteers have been assigned to aid requests.')
+        return redirect('admin_dashboard')
+
+    # Dry-run preview
+    matches = plan_assignments()
+    aid_requests = AidRequest.objects.in_bulk([match.aid_request_id for match in matches])
+    volunteers = User.objects.in_bulk([match.volunteer_id for match in matches])
+    preview = [
+        {
+            'match': match,
+            'aid_request': aid_requests[match.aid_request_id],
+            'volunteer': volunteers[match.volunteer_id],
+        }
+        for match in matches
+    ]
+
+    context = {
+        'preview': preview,
+        'unmatched_requests': unassigned_approved_requests().count() - len(matches),
+        'skill_matches': sum(1 for match in matches if match.skill_match),
+        'plan': sign_plan(matches),
+    }
+    return render(request, 'batch_assign_volunteers.html', context)
+
+@login_required
+@user_passes_test(is_authority)
+def bulk_import(request):
+    """Upload a CSV/NDJSON file of disaster reports or aid requests (authority only)"""
+    result = None
+    kind = request.POST.get('kind', 'disaster_reports')
+
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, 'Please choose a file to import.')
+        elif kind not in IMPORT_SPECS:
+            messages.error(request, 'Invalid record type.')
+        else:
+            # Large uploads are spooled to a temporary file and read as a stream
+            result = import_records(kind, upload.file, guess_format(upload.name), request.user)
+            if result.stopped:
+                messages.error(request, f'Import stopped after {result.created} records. {result.stopped}')
+            else:
+                messages.success(request, f'Imported {result.created} records, {result.failed} failed.')
+
+    context = {
+        'result': result,
+        'kind': kind,
+        'kinds': [('disaster_reports', 'Disaster Reports'), ('aid_requests', 'Aid Requests')],
+    }
+    return render(request, 'bulk_import.html', context)
+
+@login_required
+@user_passes_test(is_authority)
+def export_data(request, kind, file_format):
+    """Stream a CSV/NDJSON export, filtered with the same parameters as the listings (authority only)"""
+    if kind not in EXPORT_SPECS or file_format not in EXPORT_FORMATS:
+        raise Http404("Unknown export")
+
+    response = StreamingHttpResponse(export_records(kind, file_format, request.GET), content_type=EXPORT_FORMATS[file_format])
+    filename = f'{kind}_{timezone.localtime():%Y%m%d_%H%M}.{file_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 @login_required
 def logout_view(request):
     """Custom logout view that supports both GET and POST requests"""
@@ -679,11 +1073,25 @@ def aid_request_detail(request, request_id):
     return render(request, 'aid_request_detail.html', context)
 
 # API Endpoints
+# JSON endpoints used by the dashboard modals are async: under ASGI they wait
+# on the database without holding a worker thread.
+async def _aget_or_404(queryset, **kwargs):
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+
 @login_required
 @user_passes_test(is_authority)
-def api_aid_request_detail(request, request_id):
+@conditional_view(AID_REQUEST_DATA, USER_DATA)
+async def api_aid_request_detail(request, request_id):
     """API endpoint to get aid request details in JSON format"""
-    aid_request = get_object_or_404(AidRequest, pk=request_id)
+    aid_request = await _aget_or_404(AidRequest.objects.select_related('requester'), pk=request_id)
 
     data = {
         'id': aid_request.id,
@@ -701,40 +1109,193 @@ def api_aid_request_detail(request, request_id):
 
     return JsonResponse(data)
 
+TRIAGE_QUEUE_DEFAULT = 10
+TRIAGE_QUEUE_MAX = 100
+
 @login_required
 @user_passes_test(is_authority)
-def api_available_volunteers(request, request_id):
-    """API endpoint to get available volunteers suitable for an aid request"""
-    aid_request = get_object_or_404(AidRequest, pk=request_id)
+async def api_triage_queue(request):
+    """API endpoint for the next pending aid requests to review, highest triage priority first"""
+    try:
+        limit = min(max(int(request.GET.get('limit', TRIAGE_QUEUE_DEFAULT)), 1), TRIAGE_QUEUE_MAX)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer.'}, status=400)
+
+    now = timezone.now()
+    queue = await _alist(triage_queue(limit).select_related('requester'))
+    return JsonResponse({
+        'aid_requests': [
+            {
+                'id': aid_request.id,
+                'aid_type': aid_request.aid_type,
+                'get_aid_type_display': aid_request.get_aid_type_display(),
+                'location': aid_request.location,
+                'num_people': aid_request.num_people,
+                'requested_at': aid_request.requested_at.strftime('%b %d, %Y %H:%M'),
+                'waiting_hours': round((now - aid_request.requested_at).total_seconds() / 3600, 1),
+                'priority': round(current_score(aid_request.triage_priority, now), 1),
+                'requester_name': aid_request.requester.get_full_name() or aid_request.requester.username,
+            }
+            for aid_request in queue
+        ],
+    })
+
+@login_required
+@user_passes_test(is_authority)
+@conditional_view(AID_REQUEST_DATA, VOLUNTEER_DATA, ASSIGNMENT_DATA, USER_DATA)
+async def api_available_volunteers(request, request_id):
+    """API endpoint to get available volunteers suitable for an aid request, best matches first"""
+    aid_request = await _aget_or_404(AidRequest.objects.only('aid_type'), pk=request_id)
+
+    try:
+        page_size = min(max(int(request.GET.get('limit', API_PAGE_SIZE)), 1), API_MAX_PAGE_SIZE)
+        skill_ids = [int(skill_id) for skill_id in request.GET.getlist('skill')]
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit or skill parameter.'}, status=400)
+
+    skill_links = VolunteerProfile.skills.through.objects.filter(volunteerprofile_id=OuterRef('pk'))
+
+    # Suitability: 1 when any skill name matches a keyword for this aid type
+    keywords = AID_SKILL_KEYWORDS.get(aid_request.aid_type, ())
+    if keywords:
+        keyword_filter = Q()
+        for keyword in keywords:
+            keyword_filter |= Q(skill__name__icontains=keyword)
+        suitability = Case(When(Exists(skill_links.filter(keyword_filter)), then=1), default=0)
+    else:
+        suitability = Value(0)
+
+    assignment_counts = VolunteerAssignment.objects.filter(
+        volunteer_id=OuterRef('user_id')
+    ).order_by().values('volunteer_id').annotate(total=Count('id')).values('total')
 
-    # Get volunteers that are available
-    available_volunteers = VolunteerProfile.objects.filter(
+    volunteers = VolunteerProfile.objects.filter(
         availability='available'
-    ).select_related('user')
+    ).select_related('user').prefetch_related('skills').annotate(
+        suitability=suitability,
+        assignments_count=Coalesce(Subquery(assignment_counts), 0),
+    )
+
+    if skill_ids:
+        volunteers = volunteers.filter(Exists(skill_links.filter(skill_id__in=skill_ids)))
+
+    try:
+        page = await apaginate_keyset(
+            volunteers,
+            ['-suitability', 'assignments_count', 'id'],
+            cursor=request.GET.get('cursor'),
+            page_size=page_size,
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
     volunteers_data = []
-    for volunteer in available_volunteers:
-        skills = [skill.name for skill in volunteer.skills.all()]
+    for volunteer in page:
         volunteers_data.append({
             'id': volunteer.user.id,  # Use user ID for the assignment
             'name': volunteer.user.get_full_name() or volunteer.user.username,
-            'skills': skills,
+            'skills': [skill.name for skill in volunteer.skills.all()],
             'rating': getattr(volunteer, 'rating', None),
-            'assignments_count': VolunteerAssignment.objects.filter(volunteer=volunteer.user).count()
+            'suitable': bool(volunteer.suitability),
+            'assignments_count': volunteer.assignments_count,
         })
 
-    return JsonResponse(volunteers_data, safe=False)
+    return JsonResponse({
+        'aid_type': aid_request.aid_type,
+        'results': volunteers_data,
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    })
+
+@conditional_view(REPORT_DATA, SHELTER_DATA, per_user=True)
+def api_search(request):
+    """API endpoint for ranked full-text search over disaster reports and shelters"""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': 'Missing search query.'}, status=400)
+
+    backend = get_search_backend()
+
+    # Rank only the rows the user may see, so hidden matches cannot crowd out visible ones
+    reports = DisasterReport.objects.all() if is_authority(request.user) else DisasterReport.objects.filter(is_active=True)
+    report_ids = backend.ranked_ids(DisasterReport, query, limit=SEARCH_RESULTS_LIMIT, queryset=reports)
+    reports = DisasterReport.objects.in_bulk(report_ids)
+    visible_reports = [reports[report_id] for report_id in report_ids if report_id in reports]
+
+    shelter_ids = backend.ranked_ids(
+        Shelter, query, limit=SEARCH_RESULTS_LIMIT, queryset=Shelter.objects.filter(is_active=True),
+    )
+    shelters = Shelter.objects.in_bulk(shelter_ids)
+    visible_shelters = [shelters[shelter_id] for shelter_id in shelter_ids if shelter_id in shelters]
+
+    return JsonResponse({
+        'query': query,
+        'disaster_reports': [
+            {
+                'id': report.id,
+                'disaster_type': report.get_disaster_type_display(),
+                'severity': report.get_severity_display(),
+                'location': report.location,
+                'reported_at': report.reported_at.strftime('%b %d, %Y %H:%M'),
+                'url': reverse('disaster_report_detail', args=[report.id]),
+            }
+            for report in visible_reports
+        ],
+        'shelters': [
+            {
+                'id': shelter.id,
+                'name': shelter.name,
+                'address': shelter.address,
+                'availability': shelter.availability,
+            }
+            for shelter in visible_shelters
+        ],
+    })
+
+@conditional_view(REPORT_DATA)
+def api_report_tiles(request):
+    """
+    API endpoint for map layers: active disaster reports aggregated per
+    geohash tile for ``zoom`` inside ``bbox=min_lat,min_lon,max_lat,max_lon``
+    """
+    try:
+        zoom = int(request.GET.get('zoom', 0))
+    except ValueError:
+        return JsonResponse({'error': 'zoom must be an integer.'}, status=400)
+
+    bbox = (-90.0, -180.0, 90.0, 180.0)
+    if request.GET.get('bbox'):
+        parts = request.GET['bbox'].split(',')
+        corners = [parse_coordinates(*parts[i:i + 2]) for i in (0, 2)] if len(parts) == 4 else [None]
+        if None in corners or corners[0][0] > corners[1][0] or corners[0][1] > corners[1][1]:
+            return JsonResponse({'error': 'bbox must be min_lat,min_lon,max_lat,max_lon.'}, status=400)
+        bbox = (*corners[0], *corners[1])
+
+    disaster_type = request.GET.get('disaster_type', '')
+    if disaster_type and disaster_type not in dict(DisasterReport.DISASTER_TYPES):
+        return JsonResponse({'error': 'Unknown disaster type.'}, status=400)
+
+    precision, buckets = report_tile_buckets(zoom, bbox, disaster_type or None)
+    return JsonResponse({
+        'zoom': zoom,
+        'precision': precision,
+        'bbox': bbox,
+        'total': sum(bucket['count'] for bucket in buckets),
+        'buckets': buckets,
+    })
 
 @login_required
 @user_passes_test(is_authority)
-def api_volunteer_profile(request, volunteer_id):
+@conditional_view(VOLUNTEER_DATA, ASSIGNMENT_DATA, AID_REQUEST_DATA, USER_DATA)
+async def api_volunteer_profile(request, volunteer_id):
     """API endpoint to get volunteer profile details in JSON format"""
-    volunteer_profile = get_object_or_404(VolunteerProfile, pk=volunteer_id)
+    volunteer_profile = await _aget_or_404(VolunteerProfile.objects.select_related('user'), pk=volunteer_id)
+    skills = await _alist(Skill.objects.filter(volunteerprofile=volunteer_id).values_list('name', flat=True))
+    assignments = await _alist(
+        VolunteerAssignment.objects.filter(volunteer__volunteer_profile=volunteer_id).select_related('aid_request')
+    )
     user = volunteer_profile.user
 
-    # Get assignments for this volunteer
-    assignments = VolunteerAssignment.objects.filter(volunteer=user).select_related('aid_request')
-
     assignments_data = []
     for assignment in assignments:
         assignments_data.append({
@@ -757,8 +1318,8 @@ def api_volunteer_profile(request, volunteer_id):
         'date_joined': user.date_joined.strftime('%b %d, %Y'),
         'availability': volunteer_profile.availability,
         'availability_display': dict(VolunteerProfile.AVAILABILITY_CHOICES)[volunteer_profile.availability],
-        'skills': [skill.name for skill in volunteer_profile.skills.all()],
-        'assignment_count': assignments.count(),
+        'skills': skills,
+        'assignment_count': len(assignments),
         'assignments': assignments_data,
     }
 
@@ -766,6 +1327,7 @@ def api_volunteer_profile(request, volunteer_id):
 
 @login_required
 @user_passes_test(is_authority)
+@write_view(methods=('GET', 'POST'))
 def toggle_user_status(request, user_id):
     """Toggle a user's active status (authority only)"""
     if user_id == request.user.id:
@@ -783,9 +1345,10 @@ def toggle_user_status(request, user_id):
 
 @login_required
 @user_passes_test(is_authority)
-def api_user_profile(request, user_id):
+@conditional_view(USER_DATA)
+async def api_user_profile(request, user_id):
     """API endpoint to get user details in JSON format"""
-    user = get_object_or_404(User, pk=user_id)
+    user = await _aget_or_404(User.objects.all(), pk=user_id)
 
     data = {
         'id': user.id,
@@ -805,6 +1368,7 @@ def api_user_profile(request, user_id):
     return JsonResponse(data)
 
 @login_required
+@write_view(methods=('GET', 'POST'))
 def update_assignment_status(request, assignment_id, new_status):
     """Update a volunteer assignment's status"""
     # Only volunteers can update their own assignments